@@ -8,6 +8,13 @@ class Settings(BaseSettings):
     data_service_url: str = os.getenv("DATA_SERVICE_URL", "http://data-service:8002")
     logging_service_url: str = os.getenv("LOGGING_SERVICE_URL", "http://logging-service:8003")
     
+    # Локальная проверка JWT по JWKS Auth Service
+    jwks_refresh_interval: float = 300.0
+    # Отзыв access токенов: фильтр Блума из Auth Service, опрос добавленных jti
+    token_revocation_refresh_interval: float = 5.0
+    # Фильтр старше этого срока (или не получен) - каждый jti проверяется через Auth Service
+    token_revocation_max_age: float = 30.0
+    
     # Rate Limiting
     rate_limit_per_second: int = 5
     rate_limit_per_minute: int = 100
@@ -26,6 +33,67 @@ class Settings(BaseSettings):
     # ZTNA настройки
     enable_ztna: bool = True
     ztna_token_header: str = "X-ZTNA-Token"
+    # Проверки ZTNA токенов накапливаются и отправляются в Auth Service пакетом
+    ztna_batch_max_size: int = 100
+    ztna_batch_max_delay_ms: float = 5.0
+    # Подписанные ZTNA токены проверяются локально; список отзыва опрашивается в Auth Service
+    ztna_revocation_refresh_interval: float = 5.0
+    # Список отзыва старше этого срока - подписанные токены проверяются через Auth Service
+    ztna_revocation_max_age: float = 30.0
+    
+    # Ранний отказ по политике доступа (utils/policy.py) без обращения к сервису
+    enable_policy: bool = True
+    
+    # Потоковая проверка HMAC подписи запросов с API ключом (X-API-Signature)
+    enable_request_signing: bool = True
+    request_signing_max_skew: int = 300  # Допустимое расхождение X-API-Timestamp, секунды
+    # Тело изменяющего подписанного запроса до проверки подписи: в памяти до
+    # request_signing_spool_memory байт, дальше во временном файле; 0 - размер не ограничен
+    request_signing_max_body: int = 1024 * 1024 * 1024
+    request_signing_spool_memory: int = 1024 * 1024
+    api_key_cache_ttl: float = 300.0
+    # Удаления ключей: опрос журнала в Auth Service; журнал старше max_age - кеш ключей не используется
+    api_key_deletions_refresh_interval: float = 5.0
+    api_key_deletions_max_age: float = 30.0
+    
+    # Адаптивные таймауты проксирования
+    upstream_timeout_default: float = 30.0  # Пока нет статистики по маршруту
+    upstream_timeout_min: float = 1.0
+    upstream_timeout_max: float = 120.0
+    upstream_timeout_p99_multiplier: float = 3.0
+    upstream_timeout_min_samples: int = 50
+    upstream_timeout_window: int = 1000
+    upstream_timeout_max_routes: int = 1000  # Статистика давно не использовавшихся маршрутов вытесняется
+    # Явные таймауты: {"data:/data/export": 300.0, "data:GET /data/{id}": 2.0}
+    upstream_timeout_overrides: dict = {}
+    
+    # Кеш ответов GET маршрутов
+    enable_response_cache: bool = True
+    response_cache_max_bytes: int = 64 * 1024 * 1024
+    response_cache_max_entry_bytes: int = 1024 * 1024
+    response_cache_default_ttl: float = 5.0  # Если upstream не прислал max-age
+    response_cache_stale_while_revalidate: float = 30.0
+    response_cache_stale_if_error: float = 300.0
+    response_cache_routes: list = ["data:/data", "data:/data/{id}"]
+    
+    # Объединение одинаковых параллельных GET запросов
+    enable_request_coalescing: bool = True
+    request_coalescing_max_waiters: int = 100
+    
+    # Сжатие ответов
+    enable_compression: bool = True
+    compression_encodings: list = ["zstd", "gzip", "deflate"]  # Порядок предпочтения
+    # Сжимаемые типы содержимого (префикс) и минимальный размер ответа в байтах
+    compression_content_types: dict = {
+        "application/json": 1024,
+        "text/": 1024,
+        "application/javascript": 1024,
+        "application/xml": 1024,
+    }
+    # Уровни сжатия: выше - меньше трафика, больше CPU
+    compression_gzip_level: int = 6
+    compression_deflate_level: int = 6
+    compression_zstd_level: int = 3
     
     class Config:
         env_file = ".env"
@@ -6,20 +6,37 @@ from fastapi import FastAPI, Request, Response, HTTPException, status, Header, D
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Optional, Dict
+from typing import AsyncIterator, Optional, Dict, Union
 import httpx
+import asyncio
+import jwt
 import os
 import time
 import json
+import re
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
-from .middleware.waf import WAFMiddleware
-from .middleware.ztna import ZTNAMiddleware
+from .middleware.waf import WAFMiddleware, BodyBlockedError, scan_body_stream
+from .middleware.ztna import ZTNAMiddleware, ztna_batcher, close_auth_client
 from .middleware.logging import LoggingMiddleware
+from .middleware.compression import CompressionMiddleware
 from .utils.rate_limiter import RateLimiter
 from .utils.service_mesh import ServiceMesh
+from .utils.latency_tracker import LatencyTracker
+from .utils.response_cache import ResponseCache, CacheEntry, etag_matches
+from .utils.request_coalescer import RequestCoalescer
+from .utils.identity import sign_identity_headers, strip_identity_headers, require_signing_key
+from .utils.jwks import JWKSClient, JWKSUnavailableError
+from .utils.ztna_revocation import RevocationList
+from .utils.token_revocation import RevocationFilter
+from .utils.policy import policy
+from .utils.request_signing import (
+    api_key_store, canonical_prefix, StreamingVerifier, SpooledBody, APIKeyStoreUnavailableError,
+    RequestBodyTooLargeError, KEY_ID_HEADER, TIMESTAMP_HEADER, SIGNATURE_HEADER, NONCE_HEADER
+)
+from .utils.nonce_store import nonce_store, NONCE_MIN_LENGTH, NONCE_MAX_LENGTH
 from .config import settings
 
 app = FastAPI(
@@ -37,10 +54,44 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 rate_limiter = RateLimiter()
 service_mesh = ServiceMesh()
 logging_middleware = LoggingMiddleware()
+latency_tracker = LatencyTracker(
+    default_timeout=settings.upstream_timeout_default,
+    min_timeout=settings.upstream_timeout_min,
+    max_timeout=settings.upstream_timeout_max,
+    multiplier=settings.upstream_timeout_p99_multiplier,
+    min_samples=settings.upstream_timeout_min_samples,
+    window_size=settings.upstream_timeout_window,
+    max_routes=settings.upstream_timeout_max_routes,
+    overrides=settings.upstream_timeout_overrides
+)
+response_cache = ResponseCache(
+    max_bytes=settings.response_cache_max_bytes,
+    max_entry_bytes=settings.response_cache_max_entry_bytes,
+    default_ttl=settings.response_cache_default_ttl,
+    stale_while_revalidate=settings.response_cache_stale_while_revalidate,
+    stale_if_error=settings.response_cache_stale_if_error,
+    routes=settings.response_cache_routes
+)
+request_coalescer = RequestCoalescer(max_waiters=settings.request_coalescing_max_waiters)
+jwks_client = JWKSClient(
+    f"{settings.auth_service_url}/.well-known/jwks.json",
+    refresh_interval=settings.jwks_refresh_interval
+)
+ztna_revocation_list = RevocationList(
+    settings.auth_service_url,
+    refresh_interval=settings.ztna_revocation_refresh_interval,
+    max_age=settings.ztna_revocation_max_age
+)
+token_revocations = RevocationFilter(
+    settings.auth_service_url,
+    refresh_interval=settings.token_revocation_refresh_interval,
+    max_age=settings.token_revocation_max_age
+)
+_background_tasks = set()
 
 # Добавление middleware
 app.add_middleware(WAFMiddleware)
-app.add_middleware(ZTNAMiddleware)
+app.add_middleware(ZTNAMiddleware, jwks_client=jwks_client, revocation_list=ztna_revocation_list)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -48,6 +99,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
 
 # Маршрутизация сервисов
 SERVICES = {
@@ -56,6 +108,23 @@ SERVICES = {
     "logging": os.getenv("LOGGING_SERVICE_URL", "http://logging-service:8003"),
 }
 
+@app.on_event("startup")
+async def startup():
+    require_signing_key()
+    await jwks_client.start()
+    await ztna_revocation_list.start()
+    await token_revocations.start()
+    await api_key_store.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await jwks_client.stop()
+    await ztna_revocation_list.stop()
+    await token_revocations.stop()
+    await close_auth_client()
+    await api_key_store.close()
+    await nonce_store.close()
+
 @app.get("/health")
 async def health():
     """Health check endpoint"""
@@ -75,6 +144,21 @@ async def root():
         "documentation": "/docs"
     }
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Статистика кеша ответов"""
+    return {
+        "enabled": settings.enable_response_cache,
+        **response_cache.stats(),
+        "coalescing": {"enabled": settings.enable_request_coalescing, **request_coalescer.stats()},
+        "ztna_batching": ztna_batcher.stats(),
+        "ztna_revocation": ztna_revocation_list.stats(),
+        "token_revocation": token_revocations.stats(),
+        "policy": policy.stats(),
+        "api_keys": api_key_store.stats(),
+        "nonces": nonce_store.stats()
+    }
+
 @app.api_route("/{service}/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"])
 @limiter.limit("5/second")
 async def proxy_request(
@@ -105,11 +189,12 @@ async def proxy_request(
         )
     
     # Получение заголовков и тела запроса
-    headers = dict(request.headers)
+    headers = strip_identity_headers(dict(request.headers))
     headers.pop("host", None)
     headers.pop("content-length", None)
     
     # Проверка JWT для защищённых сервисов (кроме auth-service)
+    token_payload: Optional[Dict] = None
     if service != "auth":
         auth_header = headers.get("authorization")
         if not auth_header:
@@ -118,105 +203,501 @@ async def proxy_request(
                 detail="Authorization header required"
             )
         
-        # Проверка токена через Auth Service
+        # Локальная проверка токена по ключам JWKS Auth Service
         token = auth_header.replace("Bearer ", "")
         try:
-            async with httpx.AsyncClient() as client:
-                verify_response = await client.post(
-                    f"{SERVICES['auth']}/verify-token",
-                    json={"token": token},
-                    timeout=5.0
-                )
-                if verify_response.status_code != 200:
-                    raise HTTPException(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="Invalid or expired token"
-                    )
-        except httpx.RequestError:
+            token_payload = await jwks_client.decode(token)
+        except JWKSUnavailableError:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="Auth service unavailable"
             )
+        except jwt.PyJWTError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or expired token"
+            )
+        if await token_revocations.is_revoked(token_payload.get("jti")):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked"
+            )
+    
+    # Политика доступа: заведомо запрещённый запрос отклоняется без обращения к сервису
+    if settings.enable_policy and not await _policy_allows(service, request.method, path, headers, token_payload):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    # Подписанный API ключом запрос: изменяющий выполняется только с проверенным телом
+    # (тело во временном буфере, в upstream - потоком), тело идемпотентного проверяется
+    # по пути в upstream, без буферизации
+    signature = headers.get(SIGNATURE_HEADER) if settings.enable_request_signing else None
+    verifier: Optional[StreamingVerifier] = None
+    spooled: Optional[SpooledBody] = None
+    if signature is not None:
+        identity = token_payload
+        if identity is None:
+            # auth не требует JWT на шлюзе, но владелец ключа проверяется всегда
+            identity = await _bearer_identity(headers)
+        verifier = await _signed_request_verifier(request, service, path, headers, identity)
+        if request.method in _STREAMED_SIGNED_METHODS:
+            body = verifier.wrap(request.stream())
+        else:
+            stream = request.stream()
+            if settings.enable_waf:
+                # WAF не буферизует подписанные загрузки - тело проверяется здесь, по частям
+                stream = scan_body_stream(stream)
+            try:
+                spooled = await verifier.spool(
+                    stream, settings.request_signing_max_body, settings.request_signing_spool_memory
+                )
+            except RequestBodyTooLargeError:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail="Signed request body too large"
+                )
+            except BodyBlockedError:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Request blocked by WAF: suspicious content detected"
+                )
+            try:
+                await _check_signature(request, service, path, headers, verifier, signature, start_time, token_payload)
+            except HTTPException:
+                spooled.close()
+                raise
+            body = spooled.chunks()
+    else:
+        # Получение тела запроса
+        body = await request.body()
     
-    # Получение тела запроса
-    body = await request.body()
+    target_url = f"{service_url}/{path}"
+    
+    # Добавляем query параметры
+    if request.url.query:
+        target_url += f"?{request.url.query}"
+    
+    # Кеш ответов: ключ включает авторизованного субъекта и роль
+    cache_key = None
+    cached = None
+    if (
+        settings.enable_response_cache
+        and token_payload is not None
+        and verifier is None
+        and response_cache.is_cacheable(service, request.method, path)
+    ):
+        cache_key = response_cache.make_key(
+            service, request.method, path, request.url.query,
+            token_payload.get("sub"), token_payload.get("role")
+        )
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            now = time.time()
+            if cached.is_fresh(now):
+                response_cache.hits += 1
+                return await _cached_response(
+                    request, service, path, headers, body, cached, "HIT", start_time, token_payload
+                )
+            if cached.can_serve_while_revalidating(now):
+                response_cache.stale_hits += 1
+                _schedule_revalidation(service, path, target_url, headers, cache_key, cached, token_payload)
+                return await _cached_response(
+                    request, service, path, headers, body, cached, "STALE", start_time, token_payload
+                )
+    
+    upstream_headers = headers
+    if cached is not None and cached.etag and "if-none-match" not in headers:
+        upstream_headers = {**headers, "if-none-match": cached.etag}
+    
+    # Одинаковые параллельные идемпотентные запросы в рамках одного субъекта
+    # объединяются в один запрос к upstream
+    coalesce_key = None
+    if (
+        settings.enable_request_coalescing
+        and token_payload is not None
+        and verifier is None
+        and request.method in ("GET", "HEAD")
+    ):
+        coalesce_key = (
+            service, request.method, path, request.url.query,
+            token_payload.get("sub"), token_payload.get("role"),
+            upstream_headers.get("if-none-match"), headers.get("accept")
+        )
     
     # Проксирование запроса
     try:
-        async with httpx.AsyncClient(timeout=30.0, verify=False) as client:
-            target_url = f"{service_url}/{path}"
-            
-            # Добавляем query параметры
-            if request.url.query:
-                target_url += f"?{request.url.query}"
-            
-            proxy_response = await client.request(
-                method=request.method,
-                url=target_url,
-                headers=headers,
-                content=body if body else None
-            )
-            
-            # Логирование запроса
-            execution_time = (time.time() - start_time) * 1000  # в миллисекундах
-            
-            # Парсинг request body
-            request_body = None
-            if body:
-                try:
-                    request_body = json.loads(body.decode("utf-8"))
-                except:
-                    request_body = None
-            
-            # Парсинг response body
-            response_body = None
-            content_type = proxy_response.headers.get("content-type", "")
-            if "application/json" in content_type:
-                try:
-                    response_body = proxy_response.json()
-                except:
-                    response_body = None
-            
-            await logging_middleware.log_request(
-                service=service,
-                endpoint=path,
-                method=request.method,
-                ip_address=get_remote_address(request),
-                user_agent=headers.get("user-agent"),
-                request_body=request_body,
-                response_status=proxy_response.status_code,
-                response_body=response_body,
-                execution_time_ms=execution_time
+        if coalesce_key is not None:
+            proxy_response = await request_coalescer.run(
+                coalesce_key,
+                lambda: _send_upstream(
+                    service, request.method, path, target_url, upstream_headers, body, token_payload
+                )
             )
-            
-            # Возврат ответа
-            if "application/json" in content_type:
-                try:
-                    return JSONResponse(
-                        content=proxy_response.json(),
-                        status_code=proxy_response.status_code,
-                        headers=dict(proxy_response.headers)
-                    )
-                except:
-                    pass
-            
-            return Response(
-                content=proxy_response.content,
-                status_code=proxy_response.status_code,
-                headers=dict(proxy_response.headers),
-                media_type=content_type
+        else:
+            proxy_response = await _send_upstream(
+                service, request.method, path, target_url, upstream_headers, body, token_payload
             )
-    
     except httpx.TimeoutException:
+        if cached is not None and cached.can_serve_on_error(time.time()):
+            response_cache.stale_hits += 1
+            return await _cached_response(
+                request, service, path, headers, body, cached, "STALE", start_time, token_payload
+            )
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="Service request timeout"
         )
     except Exception as e:
+        if cached is not None and cached.can_serve_on_error(time.time()):
+            response_cache.stale_hits += 1
+            return await _cached_response(
+                request, service, path, headers, body, cached, "STALE", start_time, token_payload
+            )
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail=f"Gateway error: {str(e)}"
         )
+    finally:
+        if spooled is not None:
+            body = spooled.in_memory()
+            spooled.close()
+    
+    if verifier is not None and request.method in _STREAMED_SIGNED_METHODS:
+        # Ответ upstream отдаётся только при совпадении подписи по всему телу
+        await _check_signature(request, service, path, headers, verifier, signature, start_time, token_payload)
+        body = b""  # Тело не сохранялось
+    
+    if cache_key is not None:
+        if proxy_response.status_code == 304 and upstream_headers is not headers:
+            # Наша ревалидация по ETag: содержимое не изменилось
+            entry = response_cache.refresh(cache_key, dict(proxy_response.headers))
+            if entry is not None:
+                return await _cached_response(
+                    request, service, path, headers, body, entry, "REVALIDATED", start_time, token_payload
+                )
+            # Запись вытеснена или инвалидирована во время запроса: клиент не присылал
+            # If-None-Match и 304 не получает - повтор без валидатора
+            try:
+                proxy_response = await _send_upstream(
+                    service, request.method, path, target_url, headers, body, token_payload
+                )
+            except httpx.TimeoutException:
+                raise HTTPException(
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                    detail="Service request timeout"
+                )
+            except Exception as e:
+                raise HTTPException(
+                    status_code=status.HTTP_502_BAD_GATEWAY,
+                    detail=f"Gateway error: {str(e)}"
+                )
+            response_cache.store(
+                cache_key, proxy_response.status_code,
+                dict(proxy_response.headers), proxy_response.content
+            )
+        elif proxy_response.status_code >= 500 and cached is not None and cached.can_serve_on_error(time.time()):
+            response_cache.stale_hits += 1
+            return await _cached_response(
+                request, service, path, headers, body, cached, "STALE", start_time, token_payload
+            )
+        else:
+            response_cache.store(
+                cache_key, proxy_response.status_code,
+                dict(proxy_response.headers), proxy_response.content
+            )
+    elif request.method not in ("GET", "HEAD", "OPTIONS") and proxy_response.status_code < 400:
+        response_cache.invalidate(service, path)
+    
+    content_type = proxy_response.headers.get("content-type", "")
+    await _log_proxied_request(
+        request, service, path, headers, body,
+        proxy_response.status_code, content_type, proxy_response.content, start_time,
+        token_payload
+    )
+    
+    # Возврат ответа
+    if "application/json" in content_type:
+        try:
+            return JSONResponse(
+                content=proxy_response.json(),
+                status_code=proxy_response.status_code,
+                headers=dict(proxy_response.headers)
+            )
+        except:
+            pass
+    
+    return Response(
+        content=proxy_response.content,
+        status_code=proxy_response.status_code,
+        headers=dict(proxy_response.headers),
+        media_type=content_type
+    )
+
+async def _bearer_identity(headers: Dict[str, str]) -> Dict:
+    """Payload bearer токена для запросов к auth (шлюз его не требует)"""
+    token = headers.get("authorization", "").replace("Bearer ", "")
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authorization header required for signed requests"
+        )
+    try:
+        payload = await jwks_client.decode(token)
+    except JWKSUnavailableError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Auth service unavailable"
+        )
+    except jwt.PyJWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token"
+        )
+    if await token_revocations.is_revoked(payload.get("jti")):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked"
+        )
+    return payload
+
+async def _policy_allows(
+    service: str, method: str, path: str, headers: Dict[str, str], token_payload: Optional[Dict]
+) -> bool:
+    """Предварительная проверка политики; токен для auth разбирается только ради неё"""
+    if not policy.governs(service, method, path):
+        return True
+    payload = token_payload
+    if payload is None:
+        token = headers.get("authorization", "").replace("Bearer ", "")
+        if not token:
+            return True  # Auth Service ответит 401
+        try:
+            payload = await jwks_client.decode(token)
+        except (JWKSUnavailableError, jwt.PyJWTError):
+            return True  # Решение за Auth Service
+    return policy.precheck(service, method, path, payload.get("role"), payload.get("sub"))
+
+_KEY_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+# Тело подписанных запросов этих методов не буферизуется
+_STREAMED_SIGNED_METHODS = ("GET", "HEAD", "OPTIONS")
+
+async def _signed_request_verifier(
+    request: Request,
+    service: str,
+    path: str,
+    headers: Dict[str, str],
+    identity: Dict
+) -> StreamingVerifier:
+    """Проверка заголовков подписи и ключа; HMAC тела считается при чтении тела"""
+    key_id = headers.get(KEY_ID_HEADER, "")
+    timestamp = headers.get(TIMESTAMP_HEADER, "")
+    nonce = headers.get(NONCE_HEADER, "")
+    if (
+        not _KEY_ID_RE.match(key_id)
+        or not timestamp.isdigit()
+        or not NONCE_MIN_LENGTH <= len(nonce) <= NONCE_MAX_LENGTH
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid API key signature headers"
+        )
+    if abs(time.time() - int(timestamp)) > settings.request_signing_max_skew:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Request timestamp too old or too far in future"
+        )
+    
+    try:
+        signing_key = await api_key_store.get(key_id)
+    except APIKeyStoreUnavailableError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Auth service unavailable"
+        )
+    if signing_key is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key"
+        )
+    # Ключ должен принадлежать пользователю из JWT
+    if identity.get("sub") != signing_key.username:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="API key does not belong to the authenticated user"
+        )
+    
+    return signing_key.verifier(
+        canonical_prefix(request.method, f"/{service}/{path}", request.url.query, timestamp, key_id, nonce),
+        nonce, int(timestamp)
+    )
+
+async def _check_signature(
+    request: Request,
+    service: str,
+    path: str,
+    headers: Dict[str, str],
+    verifier: StreamingVerifier,
+    signature: str,
+    start_time: float,
+    token_payload: Optional[Dict]
+):
+    """Подпись по всему телу и однократность nonce; nonce учитывается только после проверки подписи"""
+    if not verifier.verify(signature):
+        detail = "Invalid request signature"
+    elif not await nonce_store.check_and_add(verifier.replay_key, verifier.timestamp):
+        detail = "Replayed request"
+    else:
+        return
+    await _log_proxied_request(
+        request, service, path, headers, b"",
+        status.HTTP_401_UNAUTHORIZED, "", b"", start_time, token_payload
+    )
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail)
+
+async def _send_upstream(
+    service: str,
+    method: str,
+    path: str,
+    target_url: str,
+    headers: Dict[str, str],
+    body: Union[bytes, AsyncIterator[bytes]],
+    identity: Optional[Dict] = None
+) -> httpx.Response:
+    """Запрос к upstream сервису с адаптивным таймаутом маршрута"""
+    if identity is not None:
+        # Проверенная шлюзом идентичность: сервису не нужно повторно проверять JWT
+        headers = {
+            **headers,
+            **sign_identity_headers(identity.get("sub"), identity.get("role"), method, f"/{path}")
+        }
+    
+    # Таймаут по наблюдаемым задержкам маршрута (p99 * множитель)
+    upstream_timeout = latency_tracker.get_timeout(service, method, path)
+    
+    async with httpx.AsyncClient(timeout=upstream_timeout, verify=False) as client:
+        upstream_start = time.time()
+        try:
+            proxy_response = await client.request(
+                method=method,
+                url=target_url,
+                headers=headers,
+                content=body if body else None
+            )
+        except httpx.TimeoutException:
+            # Таймауты считаются отдельно: при их избытке таймаут маршрута возвращается к исходному
+            latency_tracker.record_timeout(service, method, path)
+            raise
+        latency_tracker.record(service, method, path, time.time() - upstream_start)
+        return proxy_response
+
+async def _log_proxied_request(
+    request: Request,
+    service: str,
+    path: str,
+    headers: Dict[str, str],
+    body: bytes,
+    status_code: int,
+    content_type: str,
+    content: bytes,
+    start_time: float,
+    identity: Optional[Dict] = None
+):
+    """Логирование проксированного запроса в Logging Service"""
+    execution_time = (time.time() - start_time) * 1000  # в миллисекундах
+    
+    # Парсинг request body
+    request_body = None
+    if body:
+        try:
+            request_body = json.loads(body.decode("utf-8"))
+        except:
+            request_body = None
+    
+    # Парсинг response body
+    response_body = None
+    if "application/json" in content_type:
+        try:
+            response_body = json.loads(content)
+        except:
+            response_body = None
+    
+    await logging_middleware.log_request(
+        service=service,
+        endpoint=path,
+        method=request.method,
+        ip_address=get_remote_address(request),
+        user_agent=headers.get("user-agent"),
+        request_body=request_body,
+        response_status=status_code,
+        response_body=response_body,
+        execution_time_ms=execution_time,
+        identity=identity
+    )
+
+async def _cached_response(
+    request: Request,
+    service: str,
+    path: str,
+    headers: Dict[str, str],
+    body: bytes,
+    entry: CacheEntry,
+    cache_status: str,
+    start_time: float,
+    identity: Optional[Dict]
+) -> Response:
+    """Ответ из кеша (304, если клиент уже имеет актуальную версию)"""
+    response_headers = {**entry.headers, "x-cache": cache_status}
+    if entry.etag and etag_matches(headers.get("if-none-match"), entry.etag):
+        status_code, content = status.HTTP_304_NOT_MODIFIED, b""
+    else:
+        status_code, content = entry.status_code, entry.body
+    
+    content_type = entry.headers.get("content-type", "")
+    await _log_proxied_request(
+        request, service, path, headers, body, status_code, content_type, content, start_time, identity
+    )
+    return Response(content=content, status_code=status_code, headers=response_headers)
+
+def _schedule_revalidation(
+    service: str,
+    path: str,
+    target_url: str,
+    headers: Dict[str, str],
+    cache_key,
+    entry: CacheEntry,
+    identity: Optional[Dict]
+):
+    """Фоновое обновление устаревшей записи (stale-while-revalidate)"""
+    if entry.revalidating:
+        return
+    entry.revalidating = True
+    
+    async def revalidate():
+        upstream_headers = {k: v for k, v in headers.items() if k != "if-none-match"}
+        if entry.etag:
+            upstream_headers["if-none-match"] = entry.etag
+        try:
+            proxy_response = await _send_upstream(
+                service, "GET", path, target_url, upstream_headers, b"", identity
+            )
+            if proxy_response.status_code == 304:
+                response_cache.refresh(cache_key, dict(proxy_response.headers))
+            elif proxy_response.status_code < 500:
+                response_cache.store(
+                    cache_key, proxy_response.status_code,
+                    dict(proxy_response.headers), proxy_response.content
+                )
+        except Exception:
+            # Запись остаётся устаревшей и может быть отдана по stale-if-error
+            pass
+        finally:
+            entry.revalidating = False
+    
+    task = asyncio.create_task(revalidate())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
 @app.get("/services")
 async def list_services():
@@ -226,7 +707,8 @@ async def list_services():
         service_status[name] = {
             "url": url,
             "available": await service_mesh.is_service_available(name),
-            "health": await service_mesh.check_health(url)
+            "health": await service_mesh.check_health(url),
+            "routes": latency_tracker.snapshot(name)
         }
     return service_status
 
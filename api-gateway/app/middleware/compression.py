@@ -0,0 +1,192 @@
+"""Compression Middleware - сжатие ответов по Accept-Encoding (zstd, gzip, deflate)"""
+import zlib
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..config import settings
+
+try:
+    import zstandard
+except ImportError:  # zstd необязателен
+    zstandard = None
+
+# Типы, которые уже сжаты и не выигрывают от повторного сжатия
+_PRECOMPRESSED_TYPES = (
+    "image/", "video/", "audio/", "font/woff",
+    "application/zip", "application/gzip", "application/x-gzip",
+    "application/zstd", "application/octet-stream", "application/pdf",
+)
+
+
+class _Encoder:
+    """Потоковый компрессор с единым интерфейсом"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(
+                level=settings.compression_zstd_level
+            ).compressobj()
+        elif encoding == "gzip":
+            self._compressor = zlib.compressobj(
+                settings.compression_gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+            )
+        else:
+            self._compressor = zlib.compressobj(settings.compression_deflate_level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+def supported_encodings() -> List[str]:
+    """Поддерживаемые кодировки в порядке предпочтения сервера"""
+    return [
+        encoding for encoding in settings.compression_encodings
+        if encoding in ("gzip", "deflate") or (encoding == "zstd" and zstandard is not None)
+    ]
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Выбор кодировки по Accept-Encoding с учётом q-значений"""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, *params = [p.strip() for p in part.split(";")]
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        weights[name.lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def minimum_size_for(content_type: str) -> Optional[int]:
+    """Порог сжатия для типа содержимого или None, если тип не сжимается"""
+    content_type = content_type.split(";", 1)[0].strip().lower()
+    if not content_type or content_type.startswith(_PRECOMPRESSED_TYPES):
+        return None
+    best_prefix = None
+    for prefix in settings.compression_content_types:
+        if content_type.startswith(prefix) and (best_prefix is None or len(prefix) > len(best_prefix)):
+            best_prefix = prefix
+    if best_prefix is None:
+        return None
+    return settings.compression_content_types[best_prefix]
+
+
+class CompressionMiddleware:
+    """ASGI middleware: сжимает ответы потоково, не буферизуя тело целиком"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not settings.enable_compression or scope.get("method") == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self.app, encoding)
+        await responder(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str):
+        self.app = app
+        self.encoding = encoding
+        self.send: Optional[Send] = None
+        self.initial_message: Optional[Message] = None
+        self.minimum_size: Optional[int] = None
+        self.passthrough = False
+        self.encoder: Optional[_Encoder] = None
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def _should_compress(self, message: Message) -> bool:
+        headers = Headers(raw=message["headers"])
+        if message["status"] < 200 or message["status"] in (204, 206, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        if "no-transform" in headers.get("cache-control", "").lower():
+            return False
+        self.minimum_size = minimum_size_for(headers.get("content-type", ""))
+        return self.minimum_size is not None
+
+    async def send_compressed(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.initial_message = message
+            self.passthrough = not self._should_compress(message)
+            if self.passthrough:
+                await self.send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            # Копим начало тела, пока не станет ясно, достигнут ли порог сжатия
+            self.pending.append(body)
+            self.pending_size += len(body)
+            if self.pending_size < self.minimum_size:
+                if more_body:
+                    return
+                self.passthrough = True
+                await self.send(self.initial_message)
+                await self.send({"type": "http.response.body", "body": b"".join(self.pending)})
+                return
+
+            self.encoder = _Encoder(self.encoding)
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # Сжатое представление отличается побайтно - strong ETag становится weak
+                headers["ETag"] = "W/" + etag
+
+            compressed = self.encoder.compress(b"".join(self.pending))
+            self.pending = []
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                compressed += self.encoder.flush()
+                headers["Content-Length"] = str(len(compressed))
+            await self.send(self.initial_message)
+            await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            return
+
+        compressed = self.encoder.compress(body)
+        if not more_body:
+            compressed += self.encoder.flush()
+        if compressed or not more_body:
+            await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
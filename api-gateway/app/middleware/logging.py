@@ -3,6 +3,8 @@ import httpx
 import os
 from typing import Optional, Dict, Any
 
+from ..utils.identity import sign_identity_headers
+
 LOGGING_SERVICE_URL = os.getenv("LOGGING_SERVICE_URL", "http://logging-service:8003")
 
 class LoggingMiddleware:
@@ -18,13 +20,19 @@ class LoggingMiddleware:
         request_body: Optional[Dict[str, Any]],
         response_status: int,
         response_body: Optional[Dict[str, Any]],
-        execution_time_ms: float
+        execution_time_ms: float,
+        identity: Optional[Dict[str, Any]] = None
     ):
         """Отправка лога в Logging Service"""
+        # Пользователь записи передаётся подписанными заголовками, а не телом
+        headers = None
+        if identity is not None:
+            headers = sign_identity_headers(identity.get("sub"), identity.get("role"), "POST", "/logs")
         try:
             async with httpx.AsyncClient() as client:
                 await client.post(
                     f"{LOGGING_SERVICE_URL}/logs",
+                    headers=headers,
                     json={
                         "service": service,
                         "endpoint": endpoint,
@@ -4,9 +4,41 @@ from starlette.requests import Request
 from starlette.responses import JSONResponse
 from starlette.types import Message
 from fastapi import status
+import codecs
 import re
+from typing import AsyncIterator
 from ..config import settings
 
+# Хвост предыдущей части тела, в котором продолжается поиск при потоковой проверке
+_STREAM_SCAN_OVERLAP = 4096
+
+
+class BodyBlockedError(Exception):
+    """Тело запроса содержит запрещённый шаблон"""
+
+
+def _blocked(text: str) -> bool:
+    return any(re.search(pattern, text, re.IGNORECASE) for pattern in settings.blocked_patterns)
+
+
+def is_signed_upload(request: Request) -> bool:
+    """Тело подписанного запроса не буферизуется здесь: шлюз проверяет его потоком (scan_body_stream)"""
+    return settings.enable_request_signing and "x-api-signature" in request.headers
+
+
+async def scan_body_stream(stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Потоковая проверка тела: совпадение ищется в части и хвосте предыдущей
+    (_STREAM_SCAN_OVERLAP символов); BodyBlockedError - до передачи части дальше
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    tail = ""
+    async for chunk in stream:
+        text = tail + decoder.decode(chunk)
+        if _blocked(text):
+            raise BodyBlockedError()
+        tail = text[-_STREAM_SCAN_OVERLAP:]
+        yield chunk
+
 
 async def _clone_request_with_body(request: Request, body: bytes) -> Request:
     """Re-create request with preserved body so downstream middleware can consume it."""
@@ -37,16 +69,15 @@ class WAFMiddleware(BaseHTTPMiddleware):
         cloned_request = request
 
         # Проверка тела запроса
-        if request.method in ["POST", "PUT", "PATCH"]:
+        if request.method in ["POST", "PUT", "PATCH"] and not is_signed_upload(request):
             body = await request.body()
             body_str = body.decode("utf-8", errors="ignore")
 
-            for pattern in settings.blocked_patterns:
-                if re.search(pattern, body_str, re.IGNORECASE):
-                    return JSONResponse(
-                        status_code=status.HTTP_403_FORBIDDEN,
-                        content={"detail": "Request blocked by WAF: suspicious content detected"}
-                    )
+            if _blocked(body_str):
+                return JSONResponse(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    content={"detail": "Request blocked by WAF: suspicious content detected"}
+                )
 
             cloned_request = await _clone_request_with_body(request, body)
         
@@ -4,13 +4,68 @@ from starlette.requests import Request
 from starlette.responses import JSONResponse
 from fastapi import status
 import httpx
+import jwt
 import os
+from typing import Optional
 from ..config import settings
+from ..utils.token_batcher import TokenBatcher, BatchVerificationError
+from ..utils.jwks import JWKSClient, JWKSUnavailableError
+from ..utils.tokens import ztna_codec
+from ..utils.ztna_revocation import RevocationList
 
 AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8001")
 
+_auth_client: Optional[httpx.AsyncClient] = None
+
+def _get_auth_client() -> httpx.AsyncClient:
+    """Постоянный клиент Auth Service (соединения переиспользуются между пакетами)"""
+    global _auth_client
+    if _auth_client is None:
+        _auth_client = httpx.AsyncClient(base_url=AUTH_SERVICE_URL, timeout=5.0)
+    return _auth_client
+
+async def close_auth_client():
+    global _auth_client
+    if _auth_client is not None:
+        await _auth_client.aclose()
+        _auth_client = None
+
+ztna_batcher = TokenBatcher(
+    _get_auth_client,
+    max_batch_size=settings.ztna_batch_max_size,
+    max_delay=settings.ztna_batch_max_delay_ms / 1000
+)
+
 class ZTNAMiddleware(BaseHTTPMiddleware):
-    """Middleware для Zero Trust Network Access - проверка динамических токенов"""
+    """Middleware для Zero Trust Network Access - проверка динамических токенов
+    
+    Подписанные токены проверяются локально (JWKS + список отзыва), непрозрачные
+    токены прежнего формата - через Auth Service.
+    """
+    
+    def __init__(self, app, jwks_client: Optional[JWKSClient] = None,
+                 revocation_list: Optional[RevocationList] = None):
+        super().__init__(app)
+        self.jwks_client = jwks_client
+        self.revocation_list = revocation_list
+    
+    async def _verify_signed(self, ztna_token: str) -> Optional[bool]:
+        """True/False - результат локальной проверки, None - нужна проверка в Auth Service
+        (ключи недоступны или список отзыва устарел)
+        """
+        try:
+            payload = await self.jwks_client.decode(ztna_token, ztna_codec)
+        except JWKSUnavailableError:
+            return None
+        except jwt.PyJWTError:
+            return False
+        if self.revocation_list is None:
+            return True
+        if self.revocation_list.is_revoked(payload["jti"]):
+            return False
+        if not self.revocation_list.is_fresh():
+            return None
+        return True
     
     async def dispatch(self, request: Request, call_next):
         if not settings.enable_ztna:
@@ -23,24 +78,35 @@ class ZTNAMiddleware(BaseHTTPMiddleware):
         # Проверка динамического токена
         ztna_token = request.headers.get(settings.ztna_token_header)
         
+        # Подписанный токен (формат JWT) - без обращения к Auth Service
+        signed = ztna_token is not None and self.jwks_client is not None and ztna_token.count(".") == 2
+        if signed:
+            valid = await self._verify_signed(ztna_token)
+            if valid:
+                return await call_next(request)
+            if valid is False:
+                return JSONResponse(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    content={"detail": "Invalid or expired ZTNA token"}
+                )
+        
         if ztna_token:
             try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        f"{AUTH_SERVICE_URL}/verify-dynamic-token",
-                        json={"token": ztna_token},
-                        timeout=5.0
+                result = await ztna_batcher.verify(ztna_token, "dynamic")
+                if result.get("valid"):
+                    # Токен валиден, продолжаем
+                    return await call_next(request)
+                return JSONResponse(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    content={"detail": "Invalid or expired ZTNA token"}
+                )
+            except BatchVerificationError:
+                if signed:
+                    # Отзыв подписанного токена не проверить ни локально, ни в Auth Service
+                    return JSONResponse(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        content={"detail": "ZTNA token status unavailable"}
                     )
-                    
-                    if response.status_code == 200:
-                        # Токен валиден, продолжаем
-                        return await call_next(request)
-                    else:
-                        return JSONResponse(
-                            status_code=status.HTTP_401_UNAUTHORIZED,
-                            content={"detail": "Invalid or expired ZTNA token"}
-                        )
-            except httpx.RequestError:
                 # Если Auth Service недоступен, пропускаем проверку ZTNA
                 # В production здесь должна быть более строгая логика
                 pass
@@ -0,0 +1,76 @@
+# Общий модуль: правится в shared/, копии в сервисах обновляет scripts/sync_shared.py
+"""Фильтр Блума для списка отозванных токенов
+
+Одинаковый модуль в Auth Service и проверяющих сервисах: позиции битов
+вычисляются одинаково, поэтому фильтр передаётся как есть (base64 битов).
+Отрицательный ответ обычно стоит одной-двух проверок бита; положительный
+требует точной проверки.
+"""
+import base64
+import binascii
+import hashlib
+import math
+from typing import Any, Dict, Optional, Tuple
+
+
+def _positions(item: str) -> Tuple[int, int]:
+    # Двойное хеширование: k позиций из двух 64-битных половин дайджеста
+    digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    __slots__ = ("size", "hashes", "bits", "count")
+
+    def __init__(self, size: int, hashes: int, bits: Optional[bytearray] = None, count: int = 0):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+        self.count = count
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float) -> "BloomFilter":
+        capacity = max(1, capacity)
+        size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        return cls(size, max(1, round(size / capacity * math.log(2))))
+
+    def add(self, item: str):
+        h1, h2 = _positions(item)
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        h1, h2 = _positions(item)
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "hashes": self.hashes,
+            "count": self.count,
+            "bits": base64.b64encode(bytes(self.bits)).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BloomFilter":
+        """Разбор снимка; ValueError при несогласованных данных"""
+        try:
+            size, hashes = int(data["size"]), int(data["hashes"])
+            bits = bytearray(base64.b64decode(data["bits"], validate=True))
+        except (KeyError, TypeError, binascii.Error) as e:
+            raise ValueError(f"Invalid bloom filter: {e}")
+        if size < 8 or hashes < 1 or len(bits) != (size + 7) // 8:
+            raise ValueError("Invalid bloom filter size")
+        return cls(size, hashes, bits, int(data.get("count", 0)))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
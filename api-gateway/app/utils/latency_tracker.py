@@ -0,0 +1,221 @@
+"""Адаптивные таймауты проксирования на основе наблюдаемых задержек"""
+import re
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+_ID_SEGMENT = re.compile(
+    r"^(\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9a-fA-F]{24,})$"
+)
+
+
+def route_template(path: str) -> str:
+    """Шаблон маршрута: идентификаторы в пути заменяются на {id}"""
+    segments = [s for s in path.strip("/").split("/") if s]
+    return "/" + "/".join("{id}" if _ID_SEGMENT.match(s) else s for s in segments)
+
+
+class P2Quantile:
+    """Потоковая оценка квантиля алгоритмом P² (Jain & Chlamtac), O(1) память"""
+
+    def __init__(self, p: float):
+        self.p = p
+        self.count = 0
+        self._heights: List[float] = []
+        self._positions = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self._desired = [1.0, 1.0 + 2 * p, 1.0 + 4 * p, 3.0 + 2 * p, 5.0]
+        self._increments = [0.0, p / 2, p, (1.0 + p) / 2, 1.0]
+
+    def add(self, x: float):
+        self.count += 1
+        q = self._heights
+
+        if self.count <= 5:
+            q.append(x)
+            q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        n = self._positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1.0 if d > 0 else -1.0
+                candidate = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if q[i - 1] < candidate < q[i + 1]:
+                    q[i] = candidate
+                else:
+                    j = i + int(d)
+                    q[i] = q[i] + d * (q[j] - q[i]) / (n[j] - n[i])
+                n[i] += d
+
+    def value(self) -> Optional[float]:
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            index = min(int(self.p * self.count), self.count - 1)
+            return self._heights[index]
+        return self._heights[2]
+
+
+class _RouteStats:
+    """Статистика задержек маршрута в скользящих окнах; таймауты считаются отдельно"""
+
+    def __init__(self, window_size: int):
+        self.window_size = window_size
+        self.current = (P2Quantile(0.5), P2Quantile(0.99))
+        self.previous: Optional[Tuple[P2Quantile, P2Quantile]] = None
+        self.current_timeouts = 0
+        self.previous_timeouts = 0
+        self.total = 0
+        self.timeouts = 0
+
+    def _rotate(self):
+        if self.current[1].count + self.current_timeouts >= self.window_size:
+            self.previous = self.current
+            self.previous_timeouts = self.current_timeouts
+            self.current = (P2Quantile(0.5), P2Quantile(0.99))
+            self.current_timeouts = 0
+
+    def add(self, latency: float):
+        self._rotate()
+        self.current[0].add(latency)
+        self.current[1].add(latency)
+        self.total += 1
+
+    def add_timeout(self):
+        self._rotate()
+        self.current_timeouts += 1
+        self.timeouts += 1
+
+    def estimators(self, min_samples: int) -> Optional[Tuple[P2Quantile, P2Quantile]]:
+        """Окно с достаточным количеством наблюдений (текущее или предыдущее)"""
+        if self.current[1].count >= min_samples:
+            return self.current
+        return self.previous
+
+    def window_timeouts(self, estimators: Tuple[P2Quantile, P2Quantile]) -> int:
+        return self.current_timeouts if estimators is self.current else self.previous_timeouts
+
+
+class LatencyTracker:
+    """Отслеживание задержек по сервису, методу и шаблону маршрута, расчёт таймаутов
+
+    Шаблон маршрута строится из пути клиента (имена, slug, несуществующие пути
+    не сворачиваются), поэтому число маршрутов ограничено max_routes: давно не
+    использовавшиеся вытесняются и возвращаются к таймауту по умолчанию.
+    """
+
+    def __init__(
+        self,
+        default_timeout: float = 30.0,
+        min_timeout: float = 1.0,
+        max_timeout: float = 120.0,
+        multiplier: float = 3.0,
+        min_samples: int = 50,
+        window_size: int = 1000,
+        max_routes: int = 1000,
+        overrides: Optional[Dict[str, float]] = None
+    ):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.window_size = window_size
+        self.max_routes = max_routes
+        self.overrides: Dict[str, float] = dict(overrides or {})
+        self._stats: "OrderedDict[Tuple[str, str, str], _RouteStats]" = OrderedDict()
+        self._lock = Lock()
+        self.evicted = 0
+
+    def _override(self, service: str, method: str, route: str) -> Optional[float]:
+        """Явный таймаут маршрута: "service:METHOD /route" или "service:/route" """
+        for key in (f"{service}:{method} {route}", f"{service}:{route}"):
+            if key in self.overrides:
+                return float(self.overrides[key])
+        return None
+
+    def _timeout(self, service: str, method: str, route: str) -> float:
+        """Вызывается под self._lock"""
+        override = self._override(service, method, route)
+        if override is not None:
+            return override
+
+        stats = self._stats.get((service, method, route))
+        if stats is None:
+            return self.default_timeout
+        estimators = stats.estimators(self.min_samples)
+        if estimators is None:
+            return self.default_timeout
+
+        p99 = estimators[1].value()
+        timeout = max(self.min_timeout, min(self.max_timeout, p99 * self.multiplier))
+        # Таймаутов больше 1% окна: p99 по успешным ответам занижен, таймаут не ниже исходного
+        if stats.window_timeouts(estimators) > estimators[1].count * (1 - estimators[1].p):
+            timeout = max(timeout, min(self.max_timeout, self.default_timeout))
+        return timeout
+
+    def get_timeout(self, service: str, method: str, path: str) -> float:
+        """Таймаут запроса: явное значение или p99 * множитель в заданных границах"""
+        route = route_template(path)
+        with self._lock:
+            return self._timeout(service, method.upper(), route)
+
+    def _route_stats(self, service: str, method: str, path: str) -> _RouteStats:
+        """Вызывается под self._lock"""
+        key = (service, method.upper(), route_template(path))
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = _RouteStats(self.window_size)
+            while len(self._stats) > self.max_routes:
+                self._stats.popitem(last=False)
+                self.evicted += 1
+        else:
+            self._stats.move_to_end(key)
+        return stats
+
+    def record(self, service: str, method: str, path: str, latency: float):
+        """Регистрация задержки ответа (в секундах)"""
+        with self._lock:
+            self._route_stats(service, method, path).add(latency)
+
+    def record_timeout(self, service: str, method: str, path: str):
+        """Запрос не дождался ответа: не наблюдение задержки, а отдельный счётчик"""
+        with self._lock:
+            self._route_stats(service, method, path).add_timeout()
+
+    def snapshot(self, service: str) -> Dict[str, Dict]:
+        """Текущие перцентили и таймауты маршрутов сервиса ("METHOD /route")"""
+        result = {}
+        with self._lock:
+            for (name, method, route), stats in self._stats.items():
+                if name != service:
+                    continue
+                estimators = stats.estimators(1) or stats.current
+                result[f"{method} {route}"] = {
+                    "samples": stats.total,
+                    "timeouts": stats.timeouts,
+                    "p50_ms": round((estimators[0].value() or 0.0) * 1000, 2),
+                    "p99_ms": round((estimators[1].value() or 0.0) * 1000, 2),
+                    "timeout_s": round(self._timeout(service, method, route), 3),
+                }
+        return result
@@ -0,0 +1,64 @@
+"""Объединение одинаковых параллельных запросов (single-flight)"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Flight:
+    """Выполняющийся запрос и количество присоединившихся ожидающих"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Future"):
+        self.task = task
+        self.waiters = 0
+
+
+def _consume_result(task: "asyncio.Future"):
+    # Помечаем исключение как полученное, даже если все ожидающие отменены
+    if not task.cancelled():
+        task.exception()
+
+
+class RequestCoalescer:
+    """Одинаковые одновременные запросы выполняются один раз, результат раздаётся всем"""
+
+    def __init__(self, max_waiters: int = 100):
+        self.max_waiters = max_waiters
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.overflow = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполнение запроса или присоединение к уже выполняющемуся с тем же ключом"""
+        flight = self._flights.get(key)
+        if flight is not None:
+            if flight.waiters < self.max_waiters:
+                flight.waiters += 1
+                self.coalesced += 1
+                return await asyncio.shield(flight.task)
+            # Лимит ожидающих исчерпан - выполняем запрос отдельно
+            self.overflow += 1
+            return await factory()
+
+        task = asyncio.ensure_future(factory())
+        flight = _Flight(task)
+        self._flights[key] = flight
+        self.leaders += 1
+
+        def finish(done: "asyncio.Future"):
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            _consume_result(done)
+
+        task.add_done_callback(finish)
+        # shield: отмена запроса инициатора не прерывает остальных ожидающих
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "overflow": self.overflow,
+        }
@@ -0,0 +1,285 @@
+"""Потоковая проверка HMAC подписи запросов с API ключом
+
+Ключ подписи производный: HMAC-SHA256(secret_key, "msa-gateway-request-signing-v1"),
+hex; шлюз получает из Auth Service только его. Подписывается канонический
+запрос и тело:
+    f"{METHOD}\\n{path}\\n{query}\\n{timestamp}\\n{key_id}\\n{nonce}\\n" + body
+(HMAC-SHA256, hex в X-API-Signature). X-API-Nonce обязателен, повтор пары
+key_id + nonce в окне timestamp отклоняется.
+
+Тело изменяющих запросов (POST, PUT, PATCH, DELETE) по мере получения
+проходит через HMAC и складывается в SpooledBody: до
+request_signing_spool_memory байт в памяти, дальше во временном файле.
+В upstream оно уходит потоком только после проверки подписи; общий размер
+ограничен request_signing_max_body (0 - без ограничения). Тело идемпотентных запросов не буферизуется: чанки проходят через
+инкрементальный HMAC по пути в upstream, ответ отдаётся клиенту только после
+совпадения подписи.
+"""
+import asyncio
+import hashlib
+import hmac
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from ..config import settings
+from .identity import GATEWAY_SUBJECT, sign_identity_headers
+
+KEY_ID_HEADER = "x-api-key-id"
+TIMESTAMP_HEADER = "x-api-timestamp"
+SIGNATURE_HEADER = "x-api-signature"
+NONCE_HEADER = "x-api-nonce"
+_SPOOL_CHUNK_SIZE = 64 * 1024
+
+
+class APIKeyStoreUnavailableError(Exception):
+    """Не удалось получить ключ из Auth Service"""
+
+
+class RequestBodyTooLargeError(Exception):
+    """Тело подписанного запроса больше допустимого для буферизации"""
+
+
+def canonical_prefix(method: str, path: str, query: str, timestamp: str, key_id: str, nonce: str) -> bytes:
+    return f"{method.upper()}\n{path}\n{query}\n{timestamp}\n{key_id}\n{nonce}\n".encode()
+
+
+class StreamingVerifier:
+    """Инкрементальный HMAC по мере прохождения тела запроса"""
+
+    def __init__(self, mac, replay_key: str = "", timestamp: int = 0):
+        self._mac = mac
+        self.replay_key = replay_key  # key_id:nonce для хранилища nonce
+        self.timestamp = timestamp
+        self.complete = False
+        self.size = 0
+
+    async def wrap(self, stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in stream:
+            if chunk:
+                self._mac.update(chunk)
+                self.size += len(chunk)
+                yield chunk
+        self.complete = True
+
+    async def spool(self, stream: AsyncIterator[bytes], max_size: int, max_memory: int) -> "SpooledBody":
+        """Тело целиком (для проверки до отправки в upstream); max_size=0 - без ограничения"""
+        body = SpooledBody(max_memory)
+        try:
+            async for chunk in self.wrap(stream):
+                if max_size and self.size > max_size:
+                    raise RequestBodyTooLargeError(f"Signed request body exceeds {max_size} bytes")
+                await body.write(chunk)
+        except BaseException:
+            body.close()
+            raise
+        return body
+
+    def verify(self, signature: str) -> bool:
+        """Только после полной передачи тела"""
+        return self.complete and hmac.compare_digest(self._mac.hexdigest(), signature)
+
+
+class SpooledBody:
+    """Тело запроса: в памяти до max_memory байт, дальше во временном файле
+
+    Операции с файлом выполняются в потоке, чтобы не блокировать event loop.
+    """
+
+    def __init__(self, max_memory: int):
+        self.max_memory = max_memory
+        self.size = 0
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+
+    @property
+    def on_disk(self) -> bool:
+        return self.size > self.max_memory
+
+    async def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.on_disk:
+            await asyncio.to_thread(self._file.write, chunk)
+        else:
+            self._file.write(chunk)
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        self._file.seek(0)
+        while True:
+            if self.on_disk:
+                chunk = await asyncio.to_thread(self._file.read, _SPOOL_CHUNK_SIZE)
+            else:
+                chunk = self._file.read(_SPOOL_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def in_memory(self) -> bytes:
+        """Тело для журнала запросов; b"", если оно во временном файле"""
+        if self.on_disk:
+            return b""
+        self._file.seek(0)
+        return self._file.read()
+
+    def close(self):
+        self._file.close()
+
+
+class SigningKey:
+    __slots__ = ("key_id", "username", "user_id", "permissions", "expires_at", "_mac")
+
+    def __init__(self, key_id: str, signing_key: str, username: str, user_id: int,
+                 permissions: List[str], expires_at: float):
+        self.key_id = key_id
+        self.username = username
+        self.user_id = user_id
+        self.permissions = permissions
+        self.expires_at = expires_at
+        self._mac = hmac.new(signing_key.encode(), digestmod=hashlib.sha256)
+
+    def verifier(self, prefix: bytes, nonce: str, timestamp: int) -> StreamingVerifier:
+        mac = self._mac.copy()
+        mac.update(prefix)
+        return StreamingVerifier(mac, f"{self.key_id}:{nonce}", timestamp)
+
+
+_DELETIONS_PATH = "/internal/api-key-deletions"
+
+
+class APIKeyStore:
+    """Ключи подписи из внутреннего эндпоинта Auth Service с кешем подготовленных HMAC
+
+    Удаление ключа доходит до кеша опросом журнала удалений (как список отзыва
+    ZTNA). Пока журнал не получен или устарел больше max_age, кеш не
+    используется: ключ запрашивается на каждый запрос.
+    """
+
+    def __init__(self, auth_service_url: str, ttl: float, max_entries: int = 10000,
+                 refresh_interval: float = 5.0, max_age: float = 30.0):
+        self.auth_service_url = auth_service_url
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self._entries: "OrderedDict[str, SigningKey]" = OrderedDict()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._generation: Optional[str] = None
+        self._version: Optional[int] = None
+        self.last_success = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.deleted = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.auth_service_url, timeout=5.0)
+        return self._client
+
+    async def start(self):
+        await self.refresh()
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    async def refresh(self) -> bool:
+        """Удалённые с прошлого опроса ключи убираются из кеша; reset - кеш очищается"""
+        params = {}
+        if self._generation is not None:
+            params = {"generation": self._generation, "since": self._version}
+        headers = sign_identity_headers(GATEWAY_SUBJECT, "service", "GET", _DELETIONS_PATH)
+        try:
+            response = await self.client.get(_DELETIONS_PATH, params=params, headers=headers)
+        except httpx.RequestError:
+            return False
+
+        if response.status_code == 304:
+            self.last_success = time.time()
+            return True
+        if response.status_code != 200:
+            return False
+        try:
+            data = response.json()
+            if data.get("reset"):
+                self._entries.clear()
+            else:
+                for key_id in data["deleted"]:
+                    if self._entries.pop(key_id, None) is not None:
+                        self.deleted += 1
+            self._generation = data["generation"]
+            self._version = int(data["version"])
+        except (ValueError, KeyError, TypeError):
+            return False
+        self.last_success = time.time()
+        return True
+
+    def is_fresh(self) -> bool:
+        return time.time() - self.last_success <= self.max_age
+
+    async def get(self, key_id: str) -> Optional[SigningKey]:
+        """Ключ по key_id или None, если ключ не существует"""
+        fresh = self.is_fresh()
+        entry = self._entries.get(key_id)
+        if fresh and entry is not None and time.monotonic() < entry.expires_at:
+            self._entries.move_to_end(key_id)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        version = self._version
+
+        path = f"/internal/api-keys/{key_id}"
+        try:
+            response = await self.client.get(
+                path, headers=sign_identity_headers(GATEWAY_SUBJECT, "service", "GET", path)
+            )
+        except httpx.RequestError as e:
+            raise APIKeyStoreUnavailableError(f"Auth service unavailable: {str(e)}")
+        if response.status_code == 404:
+            self._entries.pop(key_id, None)
+            return None
+        if response.status_code != 200:
+            raise APIKeyStoreUnavailableError(f"Auth service error: HTTP {response.status_code}")
+
+        data = response.json()
+        entry = SigningKey(
+            data["key_id"], data["signing_key"], data["username"], data["user_id"],
+            data.get("permissions") or [], time.monotonic() + self.ttl
+        )
+        # Журнал удалений изменился во время запроса: ответ мог устареть, в кеш не кладём
+        if fresh and self._version == version:
+            self._entries[key_id] = entry
+            self._entries.move_to_end(key_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "deleted": self.deleted,
+            "fresh": self.is_fresh(),
+        }
+
+
+api_key_store = APIKeyStore(
+    settings.auth_service_url,
+    ttl=settings.api_key_cache_ttl,
+    refresh_interval=settings.api_key_deletions_refresh_interval,
+    max_age=settings.api_key_deletions_max_age
+)
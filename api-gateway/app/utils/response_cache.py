@@ -0,0 +1,216 @@
+"""In-memory кеш ответов для GET маршрутов (LRU, ограничение по размеру в байтах)"""
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from .latency_tracker import route_template
+
+# Заголовки, которые не сохраняются в кеше (тело хранится уже декодированным)
+_SKIP_HEADERS = {
+    "content-length", "content-encoding", "transfer-encoding",
+    "connection", "keep-alive", "date", "set-cookie",
+}
+
+CacheKey = Tuple[str, str, str, str, str, str]
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Разбор заголовка Cache-Control в словарь директив"""
+    directives: Dict[str, Optional[str]] = {}
+    if not value:
+        return directives
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, arg = part.partition("=")
+        directives[name.strip().lower()] = arg.strip().strip('"') or None
+    return directives
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Слабое сравнение ETag для If-None-Match (W/ префикс игнорируется)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    normalized = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == normalized:
+            return True
+    return False
+
+
+def _seconds(value: Optional[str], default: float) -> float:
+    try:
+        return float(value) if value is not None else default
+    except ValueError:
+        return default
+
+
+class CacheEntry:
+    """Сохранённый ответ upstream сервиса"""
+
+    __slots__ = (
+        "status_code", "headers", "body", "etag", "stored_at",
+        "ttl", "stale_while_revalidate", "stale_if_error", "size", "revalidating"
+    )
+
+    def __init__(self, status_code: int, headers: Dict[str, str], body: bytes,
+                 ttl: float, stale_while_revalidate: float, stale_if_error: float):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.etag = headers.get("etag")
+        self.stored_at = time.time()
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers.items())
+        self.revalidating = False
+
+    def age(self, now: float) -> float:
+        return now - self.stored_at
+
+    def is_fresh(self, now: float) -> bool:
+        return self.age(now) < self.ttl
+
+    def can_serve_while_revalidating(self, now: float) -> bool:
+        return self.age(now) < self.ttl + self.stale_while_revalidate
+
+    def can_serve_on_error(self, now: float) -> bool:
+        return self.age(now) < self.ttl + self.stale_if_error
+
+
+class ResponseCache:
+    """LRU кеш ответов с учётом Cache-Control/ETag, stale-while-revalidate и stale-if-error"""
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entry_bytes: int = 1024 * 1024,
+        default_ttl: float = 5.0,
+        stale_while_revalidate: float = 30.0,
+        stale_if_error: float = 300.0,
+        routes: Optional[Iterable[str]] = None
+    ):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.default_ttl = default_ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        self.routes: Set[str] = set(routes or [])
+        self._entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        self._groups: Dict[Tuple[str, str], Set[CacheKey]] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def is_cacheable(self, service: str, method: str, path: str) -> bool:
+        """Кешируются только GET запросы к маршрутам из конфигурации"""
+        return method == "GET" and f"{service}:{route_template(path)}" in self.routes
+
+    @staticmethod
+    def make_key(service: str, method: str, path: str, query: str,
+                 identity: Optional[str], role: Optional[str]) -> CacheKey:
+        """Ключ кеша: метод, путь, нормализованный query и авторизованный субъект"""
+        normalized_query = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+        return (service, method, "/" + path.strip("/"), normalized_query, identity or "", role or "")
+
+    @staticmethod
+    def _group(key: CacheKey) -> Tuple[str, str]:
+        return key[0], key[2].strip("/").split("/", 1)[0]
+
+    def get(self, key: CacheKey) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def store(self, key: CacheKey, status_code: int, headers: Dict[str, str],
+              body: bytes) -> Optional[CacheEntry]:
+        """Сохранение ответа, если это разрешено Cache-Control"""
+        if status_code != 200:
+            return None
+        directives = parse_cache_control(headers.get("cache-control"))
+        if "no-store" in directives:
+            return None
+
+        ttl = _seconds(directives.get("s-maxage", directives.get("max-age")), self.default_ttl)
+        if "no-cache" in directives:
+            ttl = 0.0
+        stored_headers = {k.lower(): v for k, v in headers.items() if k.lower() not in _SKIP_HEADERS}
+        if ttl <= 0 and "etag" not in stored_headers:
+            # Без ETag ответ с нулевой свежестью нельзя повторно проверить
+            return None
+
+        entry = CacheEntry(
+            status_code=status_code,
+            headers=stored_headers,
+            body=body,
+            ttl=ttl,
+            stale_while_revalidate=_seconds(
+                directives.get("stale-while-revalidate"), self.stale_while_revalidate
+            ),
+            stale_if_error=_seconds(directives.get("stale-if-error"), self.stale_if_error)
+        )
+        if entry.size > self.max_entry_bytes:
+            return None
+
+        self._remove(key)
+        self._entries[key] = entry
+        self._groups.setdefault(self._group(key), set()).add(key)
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+        return entry
+
+    def refresh(self, key: CacheKey, headers: Dict[str, str]) -> Optional[CacheEntry]:
+        """Продление свежести записи после ответа 304 Not Modified"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        directives = parse_cache_control(headers.get("cache-control") or entry.headers.get("cache-control"))
+        entry.ttl = 0.0 if "no-cache" in directives else _seconds(
+            directives.get("s-maxage", directives.get("max-age")), self.default_ttl
+        )
+        entry.stored_at = time.time()
+        return entry
+
+    def invalidate(self, service: str, path: str):
+        """Сброс записей ресурса после изменяющего запроса (POST/PUT/PATCH/DELETE)"""
+        group = (service, path.strip("/").split("/", 1)[0])
+        for key in list(self._groups.get(group, ())):
+            self._remove(key)
+
+    def _remove(self, key: CacheKey):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        group = self._groups.get(self._group(key))
+        if group is not None:
+            group.discard(key)
+            if not group:
+                self._groups.pop(self._group(key), None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,81 @@
+"""Список отозванных ZTNA токенов, получаемый из Auth Service"""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from .identity import GATEWAY_SUBJECT, sign_identity_headers
+
+_REVOKED_PATH = "/internal/ztna/revoked"
+
+
+class RevocationList:
+    """Фоновый опрос с If-None-Match: без изменений Auth Service отвечает 304"""
+
+    def __init__(self, auth_service_url: str, refresh_interval: float = 5.0, max_age: float = 30.0):
+        self.auth_service_url = auth_service_url
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self._revoked: Dict[str, float] = {}
+        self._etag: Optional[str] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self.last_success = 0.0
+
+    async def refresh(self) -> bool:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.auth_service_url, timeout=5.0)
+        headers = sign_identity_headers(GATEWAY_SUBJECT, "service", "GET", _REVOKED_PATH)
+        if self._etag:
+            headers["if-none-match"] = self._etag
+        try:
+            response = await self._client.get(_REVOKED_PATH, headers=headers)
+        except httpx.RequestError:
+            return False
+
+        if response.status_code == 304:
+            self.last_success = time.time()
+            return True
+        if response.status_code != 200:
+            return False
+        try:
+            revoked = response.json()["revoked"]
+        except (ValueError, KeyError):
+            return False
+        # Замена целиком: проверки всегда видят согласованный набор
+        self._revoked = {jti: float(exp) for jti, exp in revoked.items()}
+        self._etag = response.headers.get("etag")
+        self.last_success = time.time()
+        return True
+
+    async def start(self):
+        await self.refresh()
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    def is_fresh(self) -> bool:
+        """Список получен не раньше max_age назад; устаревшему списку проверка не доверяет"""
+        return time.time() - self.last_success <= self.max_age
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "revoked": len(self._revoked),
+            "fresh": self.is_fresh(),
+            "age_seconds": round(time.time() - self.last_success, 1) if self.last_success else -1,
+        }
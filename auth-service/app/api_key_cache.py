@@ -0,0 +1,157 @@
+"""Кеш API ключей с заранее подготовленным HMAC контекстом
+
+hmac.new(secret) при каждом запросе заново кодирует секрет и хеширует блоки
+ipad/opad; в кеше хранится уже инициализированный объект, для запроса
+делается .copy() и update(message).
+Бенчмарк: python -m app.api_key_cache
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .models import APIKey
+
+API_KEY_CACHE_TTL_SECONDS = float(os.getenv("API_KEY_CACHE_TTL_SECONDS", "300"))
+API_KEY_CACHE_MAX_ENTRIES = int(os.getenv("API_KEY_CACHE_MAX_ENTRIES", "10000"))
+API_KEY_DELETIONS_MAX = int(os.getenv("API_KEY_DELETIONS_MAX", "1000"))
+
+
+class CachedAPIKey:
+    __slots__ = ("key_id", "user_id", "permissions", "expires_at", "_mac")
+
+    def __init__(self, key_id: str, secret_key: str, user_id: int, permissions: List[str], expires_at: float):
+        self.key_id = key_id
+        self.user_id = user_id
+        self.permissions = permissions
+        self.expires_at = expires_at
+        self._mac = hmac.new(secret_key.encode(), digestmod=hashlib.sha256)
+
+    def signature(self, message: bytes) -> str:
+        mac = self._mac.copy()
+        mac.update(message)
+        return mac.hexdigest()
+
+    def verify(self, message: bytes, signature: str) -> bool:
+        return hmac.compare_digest(self.signature(message), signature)
+
+
+class APIKeyCache:
+    """key_id -> CachedAPIKey: TTL, ограничение размера, инвалидация при изменении ключа"""
+
+    def __init__(self, ttl: float = API_KEY_CACHE_TTL_SECONDS, max_entries: int = API_KEY_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedAPIKey]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key_id: str) -> Optional[CachedAPIKey]:
+        entry = self._entries.get(key_id)
+        if entry is not None:
+            if time.monotonic() < entry.expires_at:
+                self._entries.move_to_end(key_id)
+                self.hits += 1
+                return entry
+            del self._entries[key_id]
+        self.misses += 1
+        return None
+
+    def put(self, api_key: APIKey) -> CachedAPIKey:
+        entry = CachedAPIKey(
+            api_key.key_id,
+            api_key.secret_key,
+            api_key.user_id,
+            list(api_key.permissions or []),
+            time.monotonic() + self.ttl
+        )
+        if self.ttl > 0:
+            self._entries[entry.key_id] = entry
+            self._entries.move_to_end(entry.key_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, key_id: str):
+        """Вызывается при изменении или удалении ключа"""
+        if self._entries.pop(key_id, None) is not None:
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class DeletedAPIKeys:
+    """Журнал удалённых ключей для кеша ключей подписи в API Gateway
+
+    Версии растут внутри поколения (процесса). Клиент с другим поколением или
+    отставший дальше журнала получает reset и очищает кеш целиком.
+    """
+
+    def __init__(self, max_entries: int = API_KEY_DELETIONS_MAX):
+        self.max_entries = max_entries
+        self._generation = secrets.token_hex(4)
+        self._version = 0
+        self._log: List[Tuple[int, str]] = []
+
+    def add(self, key_id: str):
+        self._version += 1
+        self._log.append((self._version, key_id))
+        if len(self._log) > self.max_entries:
+            del self._log[:len(self._log) - self.max_entries]
+
+    def changes(self, generation: Optional[str], since: Optional[int]) -> Optional[Dict[str, Any]]:
+        """Удалённые с версии since; None - изменений нет"""
+        if generation == self._generation and since is not None:
+            if since == self._version:
+                return None
+            if since < self._version and self._log and self._log[0][0] <= since + 1:
+                return {
+                    "generation": self._generation,
+                    "version": self._version,
+                    "deleted": [key_id for version, key_id in self._log if version > since],
+                }
+        return {"generation": self._generation, "version": self._version, "reset": True}
+
+
+api_key_cache = APIKeyCache()
+deleted_api_keys = DeletedAPIKeys()
+
+
+def benchmark(iterations: int = 200000):
+    """Проверок подписи в секунду: hmac.new на каждый запрос против .copy() подготовленного"""
+    import secrets
+
+    secret_key = secrets.token_urlsafe(32)
+    key_id = secrets.token_urlsafe(16)
+    message = f"{int(time.time())}{key_id}".encode()
+    signature = hmac.new(secret_key.encode(), message, hashlib.sha256).hexdigest()
+
+    def naive():
+        expected = hmac.new(secret_key.encode(), message, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    cached = CachedAPIKey(key_id, secret_key, 1, ["read"], float("inf"))
+
+    for name, check in (("hmac.new на запрос", naive), ("подготовленный .copy()", lambda: cached.verify(message, signature))):
+        assert check()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            check()
+        rate = iterations / (time.perf_counter() - start)
+        print(f"{name:<26} {rate:>12.0f} проверок/с")
+
+
+if __name__ == "__main__":
+    benchmark()
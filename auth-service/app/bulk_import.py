@@ -0,0 +1,252 @@
+"""Массовый импорт пользователей
+
+Тело - JSON массив объектов или NDJSON (пользователь на строку); разбирается
+по мере получения, без чтения целиком. Строки обрабатываются пакетами по
+BULK_IMPORT_CHUNK_SIZE: проверка полей, дубликаты внутри импорта, занятые
+username/email - одним запросом на пакет, хеширование паролей в пуле
+процессов, вставка пакета одной транзакцией. Результат - отчёт по строкам.
+"""
+import codecs
+import json
+import os
+from typing import Any, AsyncIterator, Dict, List, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+
+from .database import async_session
+from .hashing import bulk_hashing_pool
+from .models import User
+from .schemas import BulkUserCreate
+
+BULK_IMPORT_CHUNK_SIZE = int(os.getenv("BULK_IMPORT_CHUNK_SIZE", "500"))
+BULK_IMPORT_MAX_ROWS = int(os.getenv("BULK_IMPORT_MAX_ROWS", "100000"))
+BULK_IMPORT_MAX_ROW_BYTES = int(os.getenv("BULK_IMPORT_MAX_ROW_BYTES", "65536"))
+
+_WHITESPACE = " \t\r\n"
+
+
+class BulkImportError(ValueError):
+    """Тело импорта не разбирается; строки до ошибки уже обработаны"""
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """(номер строки, объект или BulkImportError для неразборчивой строки)"""
+    buffer = b""
+    number = 0
+
+    def parse(line: bytes):
+        try:
+            return json.loads(line)
+        except ValueError:
+            return BulkImportError("Malformed JSON")
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > BULK_IMPORT_MAX_ROW_BYTES:
+            raise BulkImportError(f"Row {number + len(lines) + 1} is too large")
+        for line in lines:
+            number += 1
+            if line.strip():
+                yield number, parse(line)
+    if buffer.strip():
+        yield number + 1, parse(buffer)
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """(номер элемента, объект) из JSON массива; синтаксическая ошибка прерывает разбор"""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")(errors="strict")
+    buffer = ""
+    state = "start"  # start -> first -> (sep -> item)* -> end
+    number = 0
+
+    def skip(position: int) -> int:
+        while position < len(buffer) and buffer[position] in _WHITESPACE:
+            position += 1
+        return position
+
+    def drain(final: bool):
+        """Разобранные элементы и ошибка разбора (элементы до ошибки не теряются)"""
+        nonlocal buffer, state, number
+        position = 0
+        items = []
+        try:
+            while True:
+                position = skip(position)
+                if position >= len(buffer):
+                    break
+                char = buffer[position]
+                if state == "start":
+                    if char != "[":
+                        raise BulkImportError("Expected a JSON array")
+                    state, position = "first", position + 1
+                elif state in ("first", "item"):
+                    if state == "first" and char == "]":
+                        state, position = "end", position + 1
+                        continue
+                    try:
+                        item, position = decoder.raw_decode(buffer, position)
+                    except json.JSONDecodeError:
+                        if final or len(buffer) - position > BULK_IMPORT_MAX_ROW_BYTES:
+                            raise BulkImportError(f"Malformed JSON at row {number + 1}")
+                        break  # Элемент ещё не получен целиком
+                    number += 1
+                    items.append((number, item))
+                    state = "sep"
+                elif state == "sep":
+                    if char not in ",]":
+                        raise BulkImportError(f"Malformed JSON after row {number}")
+                    state, position = ("item" if char == "," else "end"), position + 1
+                else:
+                    raise BulkImportError("Unexpected data after the array")
+        except BulkImportError as e:
+            return items, e
+        buffer = buffer[position:]
+        return items, None
+
+    try:
+        async for chunk in chunks:
+            buffer += text_decoder.decode(chunk)
+            items, error = drain(final=False)
+            for item in items:
+                yield item
+            if error is not None:
+                raise error
+        buffer += text_decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise BulkImportError("Body is not valid UTF-8")
+    items, error = drain(final=True)
+    for item in items:
+        yield item
+    if error is not None:
+        raise error
+    if state != "end":
+        raise BulkImportError("Unterminated JSON array")
+
+
+class UserImporter:
+    """Накопление строк в пакеты и отчёт по каждой строке"""
+
+    def __init__(self, chunk_size: int = BULK_IMPORT_CHUNK_SIZE, max_rows: int = BULK_IMPORT_MAX_ROWS):
+        self.chunk_size = chunk_size
+        self.max_rows = max_rows
+        self.results: List[Dict[str, Any]] = []
+        self._usernames: Set[str] = set()
+        self._emails: Set[str] = set()
+        self.created = 0
+
+    async def run(self, rows: AsyncIterator[Tuple[int, Any]]) -> Dict[str, Any]:
+        chunk: List[Tuple[int, Any]] = []
+        aborted = None
+        try:
+            async for number, row in rows:
+                if number > self.max_rows:
+                    aborted = f"Row limit of {self.max_rows} exceeded"
+                    break
+                chunk.append((number, row))
+                if len(chunk) >= self.chunk_size:
+                    await self._import_chunk(chunk)
+                    chunk = []
+        except BulkImportError as e:
+            aborted = str(e)
+        if chunk:
+            await self._import_chunk(chunk)
+
+        self.results.sort(key=lambda result: result["row"])
+        return {
+            "created": self.created,
+            "failed": len(self.results) - self.created,
+            "aborted": aborted,
+            "results": self.results,
+        }
+
+    def _fail(self, number: int, status: str, detail: str):
+        self.results.append({"row": number, "status": status, "detail": detail})
+
+    async def _import_chunk(self, chunk: List[Tuple[int, Any]]):
+        candidates: List[Tuple[int, BulkUserCreate]] = []
+        for number, row in chunk:
+            if isinstance(row, Exception):
+                self._fail(number, "invalid", str(row))
+                continue
+            try:
+                user = BulkUserCreate.model_validate(row)
+            except ValidationError as e:
+                error = e.errors()[0]
+                location = ".".join(str(part) for part in error["loc"])
+                self._fail(number, "invalid", f"{location}: {error['msg']}" if location else error["msg"])
+                continue
+            if user.username in self._usernames or user.email in self._emails:
+                self._fail(number, "duplicate", "Username or email repeated in this import")
+                continue
+            self._usernames.add(user.username)
+            self._emails.add(user.email)
+            candidates.append((number, user))
+
+        candidates = await self._without_existing(candidates)
+        if not candidates:
+            return
+        hashes = await bulk_hashing_pool.hash_many([user.password for _, user in candidates])
+        hashed = list(zip(candidates, hashes))
+
+        # Пользователь мог быть создан параллельно (например, /register): одна повторная попытка
+        for attempt in range(2):
+            users = [
+                User(
+                    username=user.username,
+                    email=user.email,
+                    hashed_password=password_hash,
+                    role=user.role,
+                    is_active=user.is_active
+                )
+                for (_, user), password_hash in hashed
+            ]
+            async with async_session() as session:
+                session.add_all(users)
+                try:
+                    await session.commit()
+                except IntegrityError:
+                    await session.rollback()
+                    if attempt == 0:
+                        remaining = {number for number, _ in await self._without_existing([c for c, _ in hashed])}
+                        hashed = [(c, h) for c, h in hashed if c[0] in remaining]
+                        if hashed:
+                            continue
+                        return
+                    for (number, _), _ in hashed:
+                        self._fail(number, "failed", "Conflicting user created concurrently")
+                    return
+            for ((number, _), _), user in zip(hashed, users):
+                self.results.append({"row": number, "status": "created", "id": user.id, "username": user.username})
+            self.created += len(users)
+            return
+
+    async def _without_existing(
+        self, candidates: List[Tuple[int, BulkUserCreate]]
+    ) -> List[Tuple[int, BulkUserCreate]]:
+        """Занятые username/email - одним запросом на пакет"""
+        if not candidates:
+            return []
+        usernames = [user.username for _, user in candidates]
+        emails = [user.email for _, user in candidates]
+        async with async_session() as session:
+            result = await session.execute(
+                select(User.username, User.email)
+                .where(or_(User.username.in_(usernames), User.email.in_(emails)))
+            )
+            taken_usernames: Set[str] = set()
+            taken_emails: Set[str] = set()
+            for username, email in result:
+                taken_usernames.add(username)
+                taken_emails.add(email)
+
+        remaining = []
+        for number, user in candidates:
+            if user.username in taken_usernames or user.email in taken_emails:
+                self._fail(number, "exists", "Username or email already registered")
+            else:
+                remaining.append((number, user))
+        return remaining
@@ -0,0 +1,238 @@
+"""Индекс активных динамических токенов (ZTNA) в памяти
+
+Проверка токена - поиск в словаре. Истечение отслеживается кучей по
+expires_at: фоновая задача снимает истёкшие токены и деактивирует их в БД
+одним UPDATE, вместо записи при каждой проверке.
+
+Индекс авторитетен: проверка не обращается к БД, промах - недействительный
+токен. Создание, отзыв и истечение на этом экземпляре меняют индекс сразу
+после записи в БД (write-through). Токены, созданные и отозванные другими
+экземплярами, подтягиваются фоновой синхронизацией раз в
+DYNAMIC_TOKEN_SYNC_SECONDS: новые - по id больше последнего известного,
+отозванные - среди неактивных и ещё не истёкших. До первой загрузки (или
+если она не удалась) проверки идут в БД.
+"""
+import asyncio
+import heapq
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import jwt
+from sqlalchemy import select, update
+
+from .database import async_session
+from .models import DynamicToken
+from .tokens import ztna_codec
+from .ztna_revocation import revoked_tokens
+
+DYNAMIC_TOKEN_SWEEP_SECONDS = float(os.getenv("DYNAMIC_TOKEN_SWEEP_SECONDS", "30"))
+# Наибольшая задержка, с которой видны создание и отзыв токена на другом экземпляре
+DYNAMIC_TOKEN_SYNC_SECONDS = float(os.getenv("DYNAMIC_TOKEN_SYNC_SECONDS", "5"))
+
+logger = logging.getLogger(__name__)
+
+
+class IndexedToken:
+    __slots__ = ("id", "token", "user_id", "expires_at")
+
+    def __init__(self, id: int, token: str, user_id: int, expires_at: datetime):
+        self.id = id
+        self.token = token
+        self.user_id = user_id
+        self.expires_at = expires_at
+
+
+class DynamicTokenIndex:
+    """token -> IndexedToken и куча (expires_at, id, token) для массового истечения"""
+
+    def __init__(
+        self,
+        sweep_interval: float = DYNAMIC_TOKEN_SWEEP_SECONDS,
+        sync_interval: float = DYNAMIC_TOKEN_SYNC_SECONDS
+    ):
+        self.sweep_interval = sweep_interval
+        self.sync_interval = sync_interval
+        self._by_token: Dict[str, IndexedToken] = {}
+        self._heap: List[Tuple[datetime, int, str]] = []
+        self._expired_ids: List[int] = []
+        # Наибольший id, прочитанный из БД; свои токены в нём не учитываются, иначе
+        # токен другого экземпляра с меньшим id, записанный до нашего, был бы пропущен
+        self._synced_id = 0
+        self._loaded = False
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.db_fallbacks = 0
+        self.synced = 0
+        self.revoked_elsewhere = 0
+        self.expired = 0
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush_expired()
+
+    async def _run(self):
+        next_sweep = time.monotonic() + self.sweep_interval
+        while True:
+            try:
+                if self._loaded:
+                    await self.sync()
+                else:
+                    await self.load()
+            except Exception:
+                logger.exception("dynamic token index sync failed")
+            if time.monotonic() >= next_sweep:
+                next_sweep = time.monotonic() + self.sweep_interval
+                try:
+                    self._expire_due(datetime.utcnow())
+                    await self.flush_expired()
+                except Exception:
+                    logger.exception("dynamic token sweep failed")
+            await asyncio.sleep(self.sync_interval)
+
+    async def load(self):
+        """Загрузка активных токенов; уже истёкшие деактивируются одним UPDATE"""
+        now = datetime.utcnow()
+        async with async_session() as session:
+            await session.execute(
+                update(DynamicToken)
+                .where(DynamicToken.is_active == True, DynamicToken.expires_at < now)
+                .values(is_active=False)
+            )
+            await session.commit()
+            result = await session.execute(
+                select(DynamicToken.id, DynamicToken.token, DynamicToken.user_id, DynamicToken.expires_at)
+                .where(DynamicToken.is_active == True)
+            )
+            for row in result:
+                self._add(IndexedToken(*row))
+                self._synced_id = max(self._synced_id, row.id)
+        self._loaded = True
+
+    async def sync(self):
+        """Токены, созданные и отозванные другими экземплярами с прошлой синхронизации"""
+        now = datetime.utcnow()
+        async with async_session() as session:
+            created = await session.execute(
+                select(DynamicToken.id, DynamicToken.token, DynamicToken.user_id, DynamicToken.expires_at)
+                .where(DynamicToken.id > self._synced_id, DynamicToken.is_active == True)
+            )
+            for row in created:
+                self._synced_id = max(self._synced_id, row.id)
+                if row.token not in self._by_token:
+                    self._add(IndexedToken(*row))
+                    self.synced += 1
+            revoked = await session.execute(
+                select(DynamicToken.token)
+                .where(DynamicToken.is_active == False, DynamicToken.expires_at > now)
+            )
+            for (token,) in revoked:
+                entry = self._by_token.get(token)
+                if entry is not None:
+                    self._revoked_elsewhere(entry)
+
+    def _add(self, entry: IndexedToken):
+        self._by_token[entry.token] = entry
+        heapq.heappush(self._heap, (entry.expires_at, entry.id, entry.token))
+
+    def add(self, dynamic_token: DynamicToken):
+        """Вызывается после записи токена в БД"""
+        self._add(IndexedToken(
+            dynamic_token.id, dynamic_token.token, dynamic_token.user_id, dynamic_token.expires_at
+        ))
+
+    def remove(self, token: str):
+        """Токен деактивирован; запись в куче удалится при истечении"""
+        self._by_token.pop(token, None)
+
+    def _expire_due(self, now: datetime):
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, token_id, token = heapq.heappop(heap)
+            entry = self._by_token.get(token)
+            if entry is not None and entry.id == token_id:
+                del self._by_token[token]
+                self._expired_ids.append(token_id)
+                self.expired += 1
+
+    async def flush_expired(self):
+        """Деактивация всех истёкших токенов одним UPDATE"""
+        expired_ids, self._expired_ids = self._expired_ids, []
+        if not expired_ids:
+            return
+        try:
+            async with async_session() as session:
+                await session.execute(
+                    update(DynamicToken)
+                    .where(DynamicToken.id.in_(expired_ids))
+                    .values(is_active=False)
+                )
+                await session.commit()
+        except Exception:
+            self._expired_ids.extend(expired_ids)
+            raise
+
+    async def lookup(self, token: str) -> Optional[IndexedToken]:
+        """Активный токен (возможно, уже истёкший - проверяет вызывающий) или None"""
+        found = await self.lookup_many([token])
+        return found.get(token)
+
+    async def lookup_many(self, tokens: Iterable[str]) -> Dict[str, IndexedToken]:
+        if not self._loaded:
+            return await self._lookup_db(list(tokens))
+        found = {}
+        for token in tokens:
+            entry = self._by_token.get(token)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                found[token] = entry
+        return found
+
+    async def _lookup_db(self, tokens: List[str]) -> Dict[str, IndexedToken]:
+        """Индекс ещё не загружен: проверка по БД одним запросом"""
+        self.db_fallbacks += 1
+        async with async_session() as session:
+            result = await session.execute(
+                select(DynamicToken.id, DynamicToken.token, DynamicToken.user_id, DynamicToken.expires_at)
+                .where(DynamicToken.token.in_(tokens), DynamicToken.is_active == True)
+            )
+            return {row.token: IndexedToken(*row) for row in result}
+
+    def _revoked_elsewhere(self, entry: IndexedToken):
+        """Токен деактивирован другим экземпляром: снять с индекса и передать jti шлюзам"""
+        self.remove(entry.token)
+        self.revoked_elsewhere += 1
+        if entry.expires_at <= datetime.utcnow():
+            return
+        try:
+            jti = ztna_codec.get_unverified_claims(entry.token).get("jti")
+        except jwt.PyJWTError:
+            return  # Непрозрачный токен старого формата
+        if jti and jti not in revoked_tokens:
+            revoked_tokens.add(jti, entry.expires_at)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "tokens": len(self._by_token),
+            "heap": len(self._heap),
+            "hits": self.hits,
+            "misses": self.misses,
+            "db_fallbacks": self.db_fallbacks,
+            "synced": self.synced,
+            "revoked_elsewhere": self.revoked_elsewhere,
+            "expired": self.expired,
+            "pending_deactivation": len(self._expired_ids),
+        }
+
+
+dynamic_token_index = DynamicTokenIndex()
@@ -0,0 +1,311 @@
+"""Хеширование паролей: политика схем и стоимости, пул потоков с ограниченной очередью
+
+Стоимость (rounds) схемы по умолчанию подбирается при старте под целевое
+время проверки на текущем железе; хеши с другой схемой или стоимостью вне
+полосы ±1 от подобранной пересчитываются при успешном входе. bcrypt и
+hashlib.scrypt освобождают GIL, поэтому пул потоков не блокирует event loop
+и параллелит хеширование.
+При переполнении очереди запрос сразу отклоняется (HashingOverloadedError ->
+503 с Retry-After), вместо того чтобы копиться.
+Массовое хеширование (импорт пользователей) идёт в отдельном пуле процессов,
+чтобы не занимать потоки, обслуживающие вход.
+Бенчмарк: python -m app.hashing
+"""
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from passlib.context import CryptContext
+
+# Первая схема - для новых хешей, остальные принимаются и пересчитываются при входе
+PASSWORD_SCHEMES = [s.strip() for s in os.getenv("PASSWORD_SCHEMES", "bcrypt").split(",") if s.strip()]
+PASSWORD_HASH_TARGET_MS = float(os.getenv("PASSWORD_HASH_TARGET_MS", "250"))
+# Фиксированная стоимость вместо калибровки
+PASSWORD_HASH_ROUNDS = os.getenv("PASSWORD_HASH_ROUNDS")
+
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Сколько операций может ожидать свободный поток сверх выполняющихся
+HASH_QUEUE_MAX = int(os.getenv("HASH_QUEUE_MAX", "32"))
+HASH_RETRY_AFTER_SECONDS = int(os.getenv("HASH_RETRY_AFTER_SECONDS", "1"))
+BULK_HASH_PROCESSES = int(os.getenv("BULK_HASH_PROCESSES", str(min(4, os.cpu_count() or 1))))
+_LATENCY_WINDOW = 1000
+
+
+# Допустимые rounds (log2 стоимости) и значение для замера; scrypt ограничен по памяти (2^rounds КиБ)
+_ROUNDS_LIMITS = {
+    "bcrypt": (4, 20, 8),
+    "scrypt": (10, 17, 12),
+}
+
+
+class HashingOverloadedError(Exception):
+    """Очередь хеширования заполнена"""
+
+
+class PasswordPolicy:
+    """CryptContext с откалиброванной стоимостью схемы по умолчанию"""
+
+    def __init__(
+        self,
+        schemes: List[str] = PASSWORD_SCHEMES,
+        target_ms: float = PASSWORD_HASH_TARGET_MS,
+        rounds: Optional[int] = int(PASSWORD_HASH_ROUNDS) if PASSWORD_HASH_ROUNDS else None
+    ):
+        unknown = [scheme for scheme in schemes if scheme not in _ROUNDS_LIMITS]
+        if unknown or not schemes:
+            raise ValueError(f"Unsupported password schemes: {unknown or schemes}")
+        self.schemes = list(schemes)
+        self.scheme = self.schemes[0]
+        self.target_ms = target_ms
+        self.rounds = rounds
+        self.calibrated = False
+        self.measured_ms: Optional[float] = None
+        self.context = self._build_context()
+
+    def accepted_rounds(self) -> Optional[Tuple[int, Optional[int]]]:
+        """Стоимость, при которой хеш не пересчитывается: (min, max); max=None - без ограничения"""
+        if self.rounds is None:
+            return None
+        if not self.calibrated:
+            # Заданная стоимость - нижняя граница: пересчитываются только более слабые хеши
+            return self.rounds, None
+        # Замер на разных экземплярах расходится на единицу: хеши в полосе ±1 не
+        # пересчитываются, иначе реплики бесконечно переписывают хеши друг друга
+        low, high, _ = _ROUNDS_LIMITS[self.scheme]
+        return max(low, self.rounds - 1), min(high, self.rounds + 1)
+
+    def _build_context(self) -> CryptContext:
+        options = {}
+        accepted = self.accepted_rounds()
+        if accepted is not None:
+            options[f"{self.scheme}__default_rounds"] = self.rounds
+            options[f"{self.scheme}__min_rounds"] = accepted[0]
+            if accepted[1] is not None:
+                options[f"{self.scheme}__max_rounds"] = accepted[1]
+        return CryptContext(schemes=self.schemes, deprecated="auto", **options)
+
+    def _measure(self, rounds: int) -> float:
+        context = CryptContext(schemes=[self.scheme], **{f"{self.scheme}__default_rounds": rounds})
+        start = time.perf_counter()
+        context.hash("calibration-password")
+        return (time.perf_counter() - start) * 1000
+
+    def calibrate(self) -> int:
+        """Подбор rounds под target_ms: время растёт вдвое на каждый rounds"""
+        if self.rounds is None:
+            low, high, probe = _ROUNDS_LIMITS[self.scheme]
+            self._measure(probe)  # Прогрев backend
+            elapsed = max(self._measure(probe), 0.01)
+            rounds = probe + round(math.log2(self.target_ms / elapsed))
+            self.rounds = min(high, max(low, rounds))
+            self.calibrated = True
+            self.context = self._build_context()
+        self.measured_ms = round(self._measure(self.rounds), 2)
+        return self.rounds
+
+    def hash(self, password: str) -> str:
+        return self.context.hash(password)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self.context.verify(plain_password, hashed_password)
+
+    def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Проверка пароля и новый хеш, если текущий не соответствует политике"""
+        return self.context.verify_and_update(plain_password, hashed_password)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "scheme": self.scheme,
+            "accepted_schemes": self.schemes,
+            "rounds": self.rounds,
+            "accepted_rounds": self.accepted_rounds(),
+            "target_ms": self.target_ms,
+            "measured_ms": self.measured_ms,
+        }
+
+
+password_policy = PasswordPolicy()
+
+
+class HashingPool:
+    """Ограниченный пул для verify/hash с метриками очереди и задержек"""
+
+    def __init__(self, workers: int = HASH_POOL_WORKERS, max_queue: int = HASH_QUEUE_MAX):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._pending = 0
+        self._hash_times = deque(maxlen=_LATENCY_WINDOW)  # Время самой операции
+        self._wait_times = deque(maxlen=_LATENCY_WINDOW)  # Ожидание в очереди
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._pending - self.workers)
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        if self._pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HashingOverloadedError("Password hashing queue is full")
+
+        self._pending += 1
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self._wait_times.append(started - submitted)
+                self._hash_times.append(time.perf_counter() - started)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self._pending -= 1
+            self.completed += 1
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self.run(password_policy.verify_and_update, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self.run(password_policy.hash, password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    @staticmethod
+    def _percentiles(samples: deque) -> Dict[str, float]:
+        if not samples:
+            return {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(samples)
+        return {
+            "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_progress": min(self._pending, self.workers),
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "hash_latency": self._percentiles(self._hash_times),
+            "queue_wait": self._percentiles(self._wait_times),
+            "policy": password_policy.describe(),
+        }
+
+
+hashing_pool = HashingPool()
+
+
+_worker_context: Optional[CryptContext] = None
+
+
+def _init_bulk_worker(context_config: str):
+    global _worker_context
+    _worker_context = CryptContext.from_string(context_config)
+
+
+def _hash_in_worker(passwords: List[str]) -> List[str]:
+    return [_worker_context.hash(password) for password in passwords]
+
+
+class BulkHashingPool:
+    """Пул процессов для массового хеширования с параметрами текущей политики
+
+    Создаётся при первом использовании (после калибровки) и пересоздаётся,
+    если политика изменилась. Процессы запускаются через spawn: fork
+    процесса с event loop и потоками небезопасен.
+    """
+
+    def __init__(self, processes: int = BULK_HASH_PROCESSES):
+        self.processes = max(1, processes)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._config: Optional[str] = None
+        self.hashed = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        config = password_policy.context.to_string()
+        if self._executor is None or config != self._config:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_bulk_worker,
+                initargs=(config,)
+            )
+            self._config = config
+        return self._executor
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """Хеши в исходном порядке; список делится поровну между процессами"""
+        if not passwords:
+            return []
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+        size = math.ceil(len(passwords) / self.processes)
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(executor, _hash_in_worker, passwords[start:start + size])
+            for start in range(0, len(passwords), size)
+        ))
+        self.hashed += len(passwords)
+        return [hashed for part in parts for hashed in part]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"processes": self.processes, "started": self._executor is not None, "hashed": self.hashed}
+
+
+bulk_hashing_pool = BulkHashingPool()
+
+
+def benchmark(seconds: float = 3.0):
+    """Хешей в секунду на ядро и на все ядра для каждой схемы при текущей политике"""
+    cores = os.cpu_count() or 1
+    for scheme in PASSWORD_SCHEMES:
+        policy = PasswordPolicy([scheme])
+        rounds = policy.calibrate()
+
+        count = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            policy.hash("benchmark-password")
+            count += 1
+        per_core = count / (time.perf_counter() - start)
+
+        def worker(_):
+            done = 0
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                policy.hash("benchmark-password")
+                done += 1
+            return done
+
+        with ThreadPoolExecutor(max_workers=cores) as executor:
+            start = time.perf_counter()
+            total = sum(executor.map(worker, range(cores)))
+            all_cores = total / (time.perf_counter() - start)
+
+        print(
+            f"{scheme:<8} rounds={rounds:<3} {policy.measured_ms:>8.1f} мс/хеш   "
+            f"{per_core:>7.1f}/с на ядро   {all_cores:>7.1f}/с на {cores} ядр."
+        )
+
+
+if __name__ == "__main__":
+    benchmark()
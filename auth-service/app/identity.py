@@ -0,0 +1,96 @@
+# Общий модуль: правится в shared/, копии в сервисах обновляет scripts/sync_shared.py
+"""Подписанная передача идентичности от API Gateway во внутренние сервисы
+
+Шлюз подписывает X-Identity-* заголовки общим ключом INTERNAL_SIGNING_KEY,
+сервисы проверяют подпись (привязана к методу и пути запроса). Ключ
+обязателен: без него (или со значением из старых примеров) сервис не
+запускается - см. require_signing_key.
+"""
+import hashlib
+import hmac
+import os
+import time
+from typing import Dict, Optional
+
+from fastapi import Request
+
+INTERNAL_SIGNING_KEY = os.getenv("INTERNAL_SIGNING_KEY", "")
+# Минимальная длина и публично известные значения из прежних конфигураций
+INTERNAL_SIGNING_KEY_MIN_LENGTH = 32
+_KNOWN_SIGNING_KEYS = ("internal-signing-key-change-in-production",)
+IDENTITY_MAX_SKEW_SECONDS = int(os.getenv("IDENTITY_MAX_SKEW_SECONDS", "30"))
+# Субъект, которым API Gateway подписывает собственные запросы
+GATEWAY_SUBJECT = "api-gateway"
+
+IDENTITY_HEADER_PREFIX = "x-identity-"
+SUBJECT_HEADER = "x-identity-subject"
+ROLE_HEADER = "x-identity-role"
+TIMESTAMP_HEADER = "x-identity-timestamp"
+SIGNATURE_HEADER = "x-identity-signature"
+
+_signing_key = INTERNAL_SIGNING_KEY.encode()
+
+
+def require_signing_key():
+    """Вызывается при старте сервиса: с известным или коротким ключом любой может подписать идентичность"""
+    if INTERNAL_SIGNING_KEY in _KNOWN_SIGNING_KEYS or len(INTERNAL_SIGNING_KEY) < INTERNAL_SIGNING_KEY_MIN_LENGTH:
+        raise RuntimeError(
+            f"INTERNAL_SIGNING_KEY must be set to a random value of at least "
+            f"{INTERNAL_SIGNING_KEY_MIN_LENGTH} characters (e.g. openssl rand -hex 32)"
+        )
+
+
+def identity_signature(subject: str, role: str, timestamp: str, method: str, path: str) -> str:
+    """HMAC-SHA256 подпись идентичности, привязанная к методу и пути запроса"""
+    message = f"{subject}\n{role}\n{timestamp}\n{method.upper()}\n{path}".encode()
+    return hmac.new(_signing_key, message, hashlib.sha256).hexdigest()
+
+
+def sign_identity_headers(subject: str, role: Optional[str], method: str, path: str) -> Dict[str, str]:
+    """Заголовки с проверенной шлюзом идентичностью для upstream запроса"""
+    role = role or ""
+    timestamp = str(int(time.time()))
+    return {
+        SUBJECT_HEADER: subject,
+        ROLE_HEADER: role,
+        TIMESTAMP_HEADER: timestamp,
+        SIGNATURE_HEADER: identity_signature(subject, role, timestamp, method, path),
+    }
+
+
+def strip_identity_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    """Удаление клиентских X-Identity-* заголовков (защита от подделки)"""
+    return {k: v for k, v in headers.items() if not k.lower().startswith(IDENTITY_HEADER_PREFIX)}
+
+
+def verify_gateway_identity(request: Request) -> Optional[dict]:
+    """Идентичность из X-Identity-* заголовков или None, если подпись отсутствует/неверна"""
+    headers = request.headers
+    signature = headers.get(SIGNATURE_HEADER)
+    subject = headers.get(SUBJECT_HEADER)
+    timestamp = headers.get(TIMESTAMP_HEADER)
+    if not signature or not subject or not timestamp:
+        return None
+    
+    try:
+        if abs(time.time() - int(timestamp)) > IDENTITY_MAX_SKEW_SECONDS:
+            return None
+    except ValueError:
+        return None
+    
+    role = headers.get(ROLE_HEADER, "")
+    expected = identity_signature(subject, role, timestamp, request.method, request.url.path)
+    if not hmac.compare_digest(expected, signature):
+        return None
+    
+    return {
+        "username": subject,
+        "role": role or None,
+        "user_id": subject  # Используем username как user_id для упрощения
+    }
+
+
+def is_gateway_request(request: Request) -> bool:
+    """Запрос подписан самим API Gateway (а не от имени пользователя)"""
+    identity = verify_gateway_identity(request)
+    return identity is not None and identity["username"] == GATEWAY_SUBJECT
@@ -0,0 +1,170 @@
+"""Ключи подписи JWT: EdDSA (Ed25519) с kid, JWKS и ротацией с перекрытием"""
+import asyncio
+import json
+import logging
+import os
+import secrets
+import time
+from typing import Dict, List, Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from jwt.algorithms import OKPAlgorithm
+
+from .tokens import ALGORITHM, codec, ztna_codec
+
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR", "./jwt_keys")
+JWT_KEY_ROTATION_DAYS = float(os.getenv("JWT_KEY_ROTATION_DAYS", "30"))
+# Сколько предыдущий ключ остаётся в JWKS после ротации (не меньше времени жизни токенов)
+JWT_KEY_RETENTION_MINUTES = float(os.getenv("JWT_KEY_RETENTION_MINUTES", "60"))
+# Период проверки срока ротации (и ключей, созданных другими экземплярами)
+JWT_KEY_CHECK_SECONDS = float(os.getenv("JWT_KEY_CHECK_SECONDS", "3600"))
+
+logger = logging.getLogger(__name__)
+
+
+class SigningKey:
+    """Пара ключей Ed25519; kid содержит время создания ключа"""
+
+    __slots__ = ("kid", "private_key", "public_key", "created_at")
+
+    def __init__(self, kid: str, private_key: Ed25519PrivateKey):
+        self.kid = kid
+        self.private_key = private_key
+        self.public_key: Ed25519PublicKey = private_key.public_key()
+        self.created_at = int(kid.split("-", 1)[0])
+
+    def to_jwk(self) -> Dict[str, str]:
+        jwk = json.loads(OKPAlgorithm.to_jwk(self.public_key))
+        jwk.update({"kid": self.kid, "use": "sig", "alg": ALGORITHM})
+        return jwk
+
+
+class KeyManager:
+    """Хранение ключей в каталоге, выбор активного ключа и публикация JWKS"""
+
+    def __init__(self, keys_dir: str = JWT_KEYS_DIR, check_interval: float = JWT_KEY_CHECK_SECONDS):
+        self.keys_dir = keys_dir
+        self.check_interval = check_interval
+        self._keys: List[SigningKey] = []  # По возрастанию времени создания
+        self._jwks_kids: Optional[tuple] = None
+        self._jwks_body: bytes = b""
+        self._task: Optional[asyncio.Task] = None
+
+    def load(self):
+        """Загрузка ключей из каталога; при отсутствии создаётся первый ключ"""
+        os.makedirs(self.keys_dir, exist_ok=True)
+        known = {signing_key.kid: signing_key for signing_key in self._keys}
+        keys = []
+        for filename in os.listdir(self.keys_dir):
+            if not filename.endswith(".pem"):
+                continue
+            kid = filename[:-4]
+            if kid in known:
+                keys.append(known[kid])
+                continue
+            with open(os.path.join(self.keys_dir, filename), "rb") as f:
+                private_key = serialization.load_pem_private_key(f.read(), password=None)
+            keys.append(SigningKey(kid, private_key))
+        self._keys = sorted(keys, key=lambda k: k.created_at)
+        if not self._keys:
+            self._generate()
+        self.rotate_if_due()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        """Плановая ротация без перезапуска сервиса"""
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                self.load()
+                self._prune()
+            except Exception:
+                logger.exception("signing key rotation check failed")
+
+    def _generate(self) -> SigningKey:
+        kid = f"{int(time.time())}-{secrets.token_hex(4)}"
+        signing_key = SigningKey(kid, Ed25519PrivateKey.generate())
+        pem = signing_key.private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+        path = os.path.join(self.keys_dir, f"{kid}.pem")
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(pem)
+        self._keys.append(signing_key)
+        return signing_key
+
+    @property
+    def active(self) -> SigningKey:
+        """Ключ для подписи новых токенов (самый новый)"""
+        if not self._keys:
+            self.load()
+        return self._keys[-1]
+
+    def rotate(self) -> SigningKey:
+        """Создание нового активного ключа; старые остаются в JWKS на период перекрытия"""
+        os.makedirs(self.keys_dir, exist_ok=True)
+        new_key = self._generate()
+        self._prune()
+        return new_key
+
+    def rotate_if_due(self) -> Optional[SigningKey]:
+        if time.time() - self.active.created_at >= JWT_KEY_ROTATION_DAYS * 86400:
+            return self.rotate()
+        return None
+
+    def published(self) -> List[SigningKey]:
+        """Активный ключ и предыдущие, чей период перекрытия ещё не истёк"""
+        now = time.time()
+        retention = JWT_KEY_RETENTION_MINUTES * 60
+        result = []
+        for index, signing_key in enumerate(self._keys):
+            successor = self._keys[index + 1] if index + 1 < len(self._keys) else None
+            if successor is None or successor.created_at + retention > now:
+                result.append(signing_key)
+        return result
+
+    def _prune(self):
+        """Удаление ключей, которые больше не публикуются"""
+        published = self.published()
+        if len(published) == len(self._keys):
+            return
+        for signing_key in self._keys:
+            if signing_key not in published:
+                try:
+                    os.remove(os.path.join(self.keys_dir, f"{signing_key.kid}.pem"))
+                except FileNotFoundError:
+                    pass
+        self._keys = published
+        # Токены удалённых ключей не должны проверяться по кешу
+        codec.clear_cache()
+        ztna_codec.clear_cache()
+
+    def get_public_key(self, kid: Optional[str]) -> Optional[Ed25519PublicKey]:
+        """Публичный ключ по kid (только среди опубликованных)"""
+        for signing_key in reversed(self.published()):
+            if signing_key.kid == kid:
+                return signing_key.public_key
+        return None
+
+    def jwks_json(self) -> bytes:
+        """Сериализованный JWKS; пересчитывается только при изменении набора ключей"""
+        published = self.published()
+        kids = tuple(k.kid for k in published)
+        if kids != self._jwks_kids:
+            self._jwks_body = json.dumps({"keys": [k.to_jwk() for k in published]}).encode()
+            self._jwks_kids = kids
+        return self._jwks_body
+
+
+key_manager = KeyManager()
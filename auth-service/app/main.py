@@ -2,40 +2,60 @@
 Auth Service - Микросервис для аутентификации и авторизации
 Предоставляет JWT токены, проверку ролей, API ключи с HMAC, динамические токены
 """
-from fastapi import FastAPI, Depends, HTTPException, status, Header
+from fastapi import FastAPI, Depends, HTTPException, status, Header, Form, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime, timedelta
 from typing import Optional, List
+import asyncio
 import secrets
 import hmac
 import hashlib
 import base64
+import os
 import jwt
 from jwt import PyJWT
 
-from .models import User, Base, UserRole, APIKey, DynamicToken
+from .models import User, Base, UserRole, APIKey, DynamicToken, RefreshToken, ServiceClient, SERVICE_SUBJECT_PREFIX
 from .schemas import (
-    UserCreate, UserResponse, Token, TokenData,
-    TokenVerifyRequest, DynamicTokenVerifyRequest,
+    UserCreate, UserResponse, Token, TokenData, RefreshTokenRequest, TokenRevokeRequest,
+    ClientToken, ServiceClientCreate, ServiceClientResponse,
+    TokenVerifyRequest, DynamicTokenVerifyRequest, TokenBatchVerifyRequest,
     APIKeyCreate, APIKeyResponse, DynamicTokenResponse,
     HMACSignature
 )
 from .database import get_db
+from .keys import key_manager
+from .user_cache import user_cache
+from .api_key_cache import api_key_cache, deleted_api_keys
+from .identity import is_gateway_request, require_signing_key
+from .nonce_store import nonce_store, NONCE_WINDOW_SECONDS, NONCE_MIN_LENGTH, NONCE_MAX_LENGTH
+from .usage_tracker import usage_tracker
+from .dynamic_token_index import dynamic_token_index
+from .token_sweeper import token_sweeper, create_indexes
+from .ztna_revocation import revoked_tokens
+from .token_revocation import access_token_revocations
+from .policy import policy
+from .tokens import ztna_codec
+from .hashing import hashing_pool, bulk_hashing_pool, password_policy, HashingOverloadedError, HASH_RETRY_AFTER_SECONDS
+from .bulk_import import UserImporter, iter_json_array, iter_ndjson
 from .utils import (
-    verify_password, get_password_hash,
-    create_access_token, verify_token,
+    create_access_token, verify_token, decode_access_token,
     get_current_user, get_current_active_user,
-    generate_api_key, verify_hmac_signature,
-    generate_dynamic_token
+    generate_api_key, verify_hmac_signature, derive_request_signing_key,
+    generate_dynamic_token, generate_refresh_token, hash_refresh_token,
+    generate_service_client, hash_client_secret, verify_client_secret,
+    require_client_secret_pepper
 )
 
 # Конфигурация
-SECRET_KEY = "your-secret-key-change-in-production-use-env-variable"
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+CLIENT_TOKEN_EXPIRE_MINUTES = int(os.getenv("CLIENT_TOKEN_EXPIRE_MINUTES", "30"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+VERIFY_BATCH_MAX_TOKENS = int(os.getenv("VERIFY_BATCH_MAX_TOKENS", "500"))
 
 app = FastAPI(
     title="Auth Service",
@@ -51,14 +71,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(HashingOverloadedError)
+async def hashing_overloaded_handler(request: Request, exc: HashingOverloadedError):
+    """Очередь хеширования паролей заполнена - быстрый отказ вместо ожидания"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication service is busy, retry later"},
+        headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)}
+    )
+
 # Инициализация базы данных
 engine = create_async_engine("sqlite+aiosqlite:///./auth.db", echo=True)
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 @app.on_event("startup")
 async def startup():
+    require_signing_key()
+    require_client_secret_pepper()
+    # Ключи подписи JWT (создаются при первом запуске)
+    key_manager.load()
+    await key_manager.start()
+    # Стоимость хеширования паролей под целевое время на этом железе
+    await hashing_pool.run(password_policy.calibrate)
+    
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_indexes)
+    
+    await usage_tracker.start()
+    await dynamic_token_index.start()
+    await token_sweeper.start()
+    await revoked_tokens.load()
+    await revoked_tokens.start()
+    await access_token_revocations.load()
     
     # Создание тестовых пользователей
     async with async_session() as session:
@@ -72,7 +117,7 @@ async def startup():
             admin = User(
                 username="admin",
                 email="admin@example.com",
-                hashed_password=get_password_hash("admin123"),
+                hashed_password=await hashing_pool.hash("admin123"),
                 role=UserRole.ADMIN,
                 is_active=True
             )
@@ -80,7 +125,7 @@ async def startup():
             user = User(
                 username="user",
                 email="user@example.com",
-                hashed_password=get_password_hash("user123"),
+                hashed_password=await hashing_pool.hash("user123"),
                 role=UserRole.USER,
                 is_active=True
             )
@@ -90,7 +135,16 @@ async def startup():
 
 @app.on_event("shutdown")
 async def shutdown():
+    # Накопленные отметки last_used записываются до закрытия соединений
+    await usage_tracker.stop()
+    await dynamic_token_index.stop()
+    await token_sweeper.stop()
+    await revoked_tokens.stop()
+    await key_manager.stop()
     await engine.dispose()
+    hashing_pool.shutdown()
+    bulk_hashing_pool.shutdown()
+    await nonce_store.close()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -112,7 +166,7 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     new_user = User(
         username=user_data.username,
         email=user_data.email,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await hashing_pool.hash(user_data.password),
         role=UserRole.USER,
         is_active=True
     )
@@ -134,31 +188,292 @@ async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_db)
 ):
-    """Получение JWT токена"""
+    """Получение JWT токена и refresh токена"""
     from sqlalchemy import select
     result = await db.execute(select(User).where(User.username == form_data.username))
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    verified, new_hash = (False, None)
+    if user:
+        verified, new_hash = await hashing_pool.verify_and_update(form_data.password, user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if new_hash:
+        # Хеш по устаревшей схеме или стоимости - сохраняем пересчитанный (коммит ниже)
+        user.hashed_password = new_hash
+        user_cache.invalidate(user.username)
+    
     if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Inactive user"
         )
     
+    return await issue_tokens(user, db, family_id=secrets.token_hex(16))
+
+@app.post("/token/refresh", response_model=Token)
+async def refresh_access_token(
+    request: RefreshTokenRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Новая пара токенов по refresh токену, без проверки пароля"""
+    from sqlalchemy import select, update
+    from sqlalchemy.orm import joinedload
+    
+    invalid_token = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    
+    # Единственный поиск: по уникальному индексу token_hash вместе с пользователем
+    result = await db.execute(
+        select(RefreshToken)
+        .options(joinedload(RefreshToken.user))
+        .where(RefreshToken.token_hash == hash_refresh_token(request.refresh_token))
+    )
+    stored = result.scalar_one_or_none()
+    
+    if stored is None or stored.revoked:
+        raise invalid_token
+    
+    now = datetime.utcnow()
+    reused = stored.used_at is not None
+    if not reused:
+        # Условное обновление: из двух параллельных обменов выигрывает один
+        marked = await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.id == stored.id, RefreshToken.used_at.is_(None))
+            .values(used_at=now)
+        )
+        reused = marked.rowcount == 0
+    
+    if reused:
+        # Повторное использование уже обменянного токена - цепочка скомпрометирована, отзываем её целиком
+        await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.family_id == stored.family_id)
+            .values(revoked=True)
+        )
+        await db.commit()
+        raise invalid_token
+    
+    if stored.expires_at < now:
+        await db.commit()
+        raise invalid_token
+    
+    if not stored.user.is_active:
+        await db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Inactive user"
+        )
+    
+    return await issue_tokens(stored.user, db, family_id=stored.family_id)
+
+async def issue_tokens(user: User, db: AsyncSession, family_id: str) -> Token:
+    """Access токен и новый refresh токен в цепочке family_id"""
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.username, "role": user.role},
         expires_delta=access_token_expires
     )
     
-    return Token(access_token=access_token, token_type="bearer")
+    refresh_token, token_hash, expires_at = generate_refresh_token(REFRESH_TOKEN_EXPIRE_DAYS)
+    db.add(RefreshToken(
+        token_hash=token_hash,
+        family_id=family_id,
+        user_id=user.id,
+        expires_at=expires_at
+    ))
+    await db.commit()
+    
+    return Token(access_token=access_token, token_type="bearer", refresh_token=refresh_token)
+
+@app.post("/token/client", response_model=ClientToken)
+async def client_credentials_token(
+    grant_type: str = Form(...),
+    client_id: str = Form(...),
+    client_secret: str = Form(...),
+    scope: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Client credentials grant: JWT для сервисного клиента со scope в claims"""
+    if grant_type != "client_credentials":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported grant type"
+        )
+    
+    from sqlalchemy import select
+    result = await db.execute(select(ServiceClient).where(ServiceClient.client_id == client_id))
+    client = result.scalar_one_or_none()
+    
+    # HMAC проверка занимает микросекунды - в пул хеширования не отправляется
+    if not client or not client.is_active or not verify_client_secret(client_secret, client.secret_hash):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid client credentials"
+        )
+    
+    allowed_scopes = client.scopes or []
+    if scope:
+        requested = scope.split()
+        if not set(requested) <= set(allowed_scopes):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid scope"
+            )
+        granted = list(dict.fromkeys(requested))
+    else:
+        granted = allowed_scopes
+    
+    granted_scope = " ".join(granted)
+    access_token = create_access_token(
+        data={
+            "sub": f"{SERVICE_SUBJECT_PREFIX}{client.client_id}",
+            "role": UserRole.SERVICE.value,
+            "client_id": client.client_id,
+            "scope": granted_scope
+        },
+        expires_delta=timedelta(minutes=CLIENT_TOKEN_EXPIRE_MINUTES)
+    )
+    
+    return ClientToken(
+        access_token=access_token,
+        token_type="bearer",
+        expires_in=CLIENT_TOKEN_EXPIRE_MINUTES * 60,
+        scope=granted_scope
+    )
+
+@app.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_access_token(
+    request: TokenRevokeRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Отзыв access токена до истечения: свой токен или любой (админ)"""
+    try:
+        payload = decode_access_token(request.token)
+    except jwt.PyJWTError:
+        # Истёкший, поддельный или уже отозванный токен и так не принимается
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    
+    if not policy.allows(
+        "auth", "POST", "/token/revoke", current_user.role, current_user.username, owner=payload.get("sub")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    if not payload.get("jti"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Token has no jti and cannot be revoked"
+        )
+    
+    await access_token_revocations.revoke(payload["jti"], datetime.utcfromtimestamp(payload["exp"]))
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@app.post("/service-clients", response_model=ServiceClientResponse, status_code=status.HTTP_201_CREATED)
+async def create_service_client(
+    client_data: ServiceClientCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Регистрация сервисного клиента (только для админов)"""
+    if not policy.allows("auth", "POST", "/service-clients", current_user.role):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    client_id, client_secret = generate_service_client()
+    client = ServiceClient(
+        client_id=client_id,
+        secret_hash=hash_client_secret(client_secret),
+        name=client_data.name,
+        scopes=client_data.scopes
+    )
+    
+    db.add(client)
+    await db.commit()
+    await db.refresh(client)
+    
+    return ServiceClientResponse(
+        client_id=client.client_id,
+        client_secret=client_secret,  # Показываем только при создании
+        name=client.name,
+        scopes=client.scopes,
+        is_active=client.is_active,
+        created_at=client.created_at
+    )
+
+@app.get("/service-clients", response_model=List[ServiceClientResponse])
+async def list_service_clients(
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Список сервисных клиентов (только для админов)"""
+    if not policy.allows("auth", "GET", "/service-clients", current_user.role):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    from sqlalchemy import select
+    result = await db.execute(select(ServiceClient))
+    
+    return [
+        ServiceClientResponse(
+            client_id=client.client_id,
+            client_secret="***hidden***",
+            name=client.name,
+            scopes=client.scopes,
+            is_active=client.is_active,
+            created_at=client.created_at
+        )
+        for client in result.scalars().all()
+    ]
+
+_NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+_bulk_import_lock = asyncio.Lock()
+
+@app.post("/users/bulk")
+async def bulk_import_users(
+    request: Request,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Массовый импорт пользователей (только для админов): JSON массив или NDJSON, отчёт по строкам"""
+    if not policy.allows("auth", "POST", "/users/bulk", current_user.role):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in _NDJSON_TYPES:
+        rows = iter_ndjson(request.stream())
+    elif content_type == "application/json":
+        rows = iter_json_array(request.stream())
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Expected application/json or application/x-ndjson"
+        )
+    
+    # Один импорт за раз: пул процессов и так занят целиком
+    if _bulk_import_lock.locked():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Bulk import already in progress"
+        )
+    async with _bulk_import_lock:
+        return await UserImporter().run(rows)
 
 @app.get("/users/me", response_model=UserResponse)
 async def read_users_me(current_user: User = Depends(get_current_active_user)):
@@ -178,7 +493,7 @@ async def get_user(
     db: AsyncSession = Depends(get_db)
 ):
     """Получение информации о пользователе (только для админов)"""
-    if current_user.role != UserRole.ADMIN.value:
+    if not policy.allows("auth", "GET", "/users/{username}", current_user.role):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
@@ -214,6 +529,84 @@ async def verify_jwt_token(request: TokenVerifyRequest):
             detail=f"Invalid token: {str(e)}"
         )
 
+@app.post("/verify-tokens")
+async def verify_tokens_batch(request: TokenBatchVerifyRequest):
+    """Пакетная проверка JWT и динамических токенов, результаты в порядке запроса"""
+    if len(request.tokens) > VERIFY_BATCH_MAX_TOKENS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many tokens in batch (max {VERIFY_BATCH_MAX_TOKENS})"
+        )
+    
+    results = [None] * len(request.tokens)
+    dynamic_indexes = {}
+    for index, item in enumerate(request.tokens):
+        if item.type == "dynamic":
+            dynamic_indexes.setdefault(item.token, []).append(index)
+            continue
+        try:
+            results[index] = {"valid": True, "payload": decode_access_token(item.token)}
+        except jwt.PyJWTError as e:
+            results[index] = {"valid": False, "error": f"Invalid token: {str(e)}"}
+    
+    if dynamic_indexes:
+        # Индекс в памяти авторитетен: промах - недействительный токен
+        found = await dynamic_token_index.lookup_many(dynamic_indexes)
+        
+        now = datetime.utcnow()
+        for token, indexes in dynamic_indexes.items():
+            dynamic_token = found.get(token)
+            if dynamic_token is None:
+                verdict = {"valid": False, "error": "Invalid or inactive token"}
+            elif dynamic_token.expires_at < now:
+                # Деактивация в БД - при очередном проходе по куче истечений
+                verdict = {"valid": False, "error": "Token expired"}
+            else:
+                usage_tracker.touch_dynamic_token(dynamic_token.id)
+                verdict = {
+                    "valid": True,
+                    "user_id": dynamic_token.user_id,
+                    "expires_at": dynamic_token.expires_at
+                }
+            for index in indexes:
+                results[index] = verdict
+    
+    return {"results": results}
+
+@app.get("/.well-known/jwks.json")
+async def jwks():
+    """Публичные ключи проверки JWT (JWKS) для локальной проверки токенов в сервисах"""
+    return Response(
+        content=key_manager.jwks_json(),
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=300"}
+    )
+
+@app.get("/revocations")
+async def token_revocations(generation: Optional[str] = None, since: Optional[int] = None):
+    """Фильтр Блума отозванных jti или добавленные с версии since; 304 - без изменений"""
+    changes = access_token_revocations.changes(generation, since)
+    if changes is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    return changes
+
+@app.get("/revocations/{jti}")
+async def token_revocation_status(jti: str):
+    """Точная проверка jti (после совпадения в фильтре Блума)"""
+    return {"jti": jti, "revoked": jti in access_token_revocations}
+
+@app.post("/keys/rotate")
+async def rotate_signing_key(current_user: User = Depends(get_current_active_user)):
+    """Ротация ключа подписи JWT (только для админов)"""
+    if not policy.allows("auth", "POST", "/keys/rotate", current_user.role):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    new_key = key_manager.rotate()
+    return {"kid": new_key.kid, "published": [k.kid for k in key_manager.published()]}
+
 # API Keys Management
 @app.post("/api-keys", response_model=APIKeyResponse)
 async def create_api_key(
@@ -269,46 +662,156 @@ async def list_api_keys(
         for key in keys
     ]
 
+@app.delete("/api-keys/{key_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_api_key(
+    key_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Удаление API ключа (владелец или админ)"""
+    from sqlalchemy import select
+    result = await db.execute(select(APIKey).where(APIKey.key_id == key_id))
+    api_key = result.scalar_one_or_none()
+    
+    if not api_key or not policy.allows(
+        "auth", "DELETE", "/api-keys/{key_id}", current_user.role, current_user.id, owner=api_key.user_id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="API key not found"
+        )
+    
+    await db.delete(api_key)
+    await db.commit()
+    api_key_cache.invalidate(key_id)
+    deleted_api_keys.add(key_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @app.post("/verify-api-key")
 async def verify_api_key_with_hmac(
     key_id: str = Header(..., alias="X-API-Key-ID"),
     signature: str = Header(..., alias="X-API-Signature"),
     timestamp: str = Header(..., alias="X-API-Timestamp"),
+    nonce: Optional[str] = Header(None, alias="X-API-Nonce"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Проверка API ключа с HMAC подписью"""
-    from sqlalchemy import select
-    result = await db.execute(select(APIKey).where(APIKey.key_id == key_id))
-    api_key = result.scalar_one_or_none()
+    """Проверка API ключа с HMAC подписью (подписывается f"{timestamp}{key_id}{nonce}")
     
-    if not api_key:
+    Протокол v2: X-API-Nonce обязателен - случайная строка, уникальная для ключа
+    в пределах окна timestamp; каждая пара (ключ, nonce) принимается один раз.
+    """
+    if not nonce or not NONCE_MIN_LENGTH <= len(nonce) <= NONCE_MAX_LENGTH:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid API key"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"X-API-Nonce of {NONCE_MIN_LENGTH}-{NONCE_MAX_LENGTH} characters is required"
         )
     
-    # Проверка временной метки (защита от replay атак)
+    # Проверка временной метки (защита от replay атак) - до обращения к ключу
     try:
         ts = int(timestamp)
-        current_ts = int(datetime.utcnow().timestamp())
-        if abs(current_ts - ts) > 300:  # 5 минут
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Request timestamp too old or too far in future"
-            )
     except ValueError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid timestamp"
         )
+    current_ts = int(datetime.utcnow().timestamp())
+    if abs(current_ts - ts) > NONCE_WINDOW_SECONDS:  # 5 минут
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Request timestamp too old or too far in future"
+        )
+    
+    cached_key = api_key_cache.get(key_id)
+    if cached_key is None:
+        from sqlalchemy import select
+        result = await db.execute(select(APIKey).where(APIKey.key_id == key_id))
+        api_key = result.scalar_one_or_none()
+        
+        if not api_key:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid API key"
+            )
+        cached_key = api_key_cache.put(api_key)
+    
+    if not cached_key.verify(f"{timestamp}{key_id}{nonce}".encode(), signature):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid signature"
+        )
+    
+    # Только после проверки подписи: неподписанный мусор не занимает хранилище
+    if not await nonce_store.check_and_add(f"{key_id}:{nonce}", ts):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Replayed request"
+        )
+    
+    usage_tracker.touch_api_key(key_id)
     
     return {
         "valid": True,
         "key_id": key_id,
+        "user_id": cached_key.user_id,
+        "permissions": cached_key.permissions
+    }
+
+@app.get("/internal/api-keys/{key_id}")
+async def internal_get_api_key(
+    key_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Производный ключ подписи запросов для API Gateway (только для шлюза)
+
+    secret_key не покидает Auth Service: по ключу подписи нельзя подписать
+    запрос к /verify-api-key.
+    """
+    if not is_gateway_request(request):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Internal endpoint"
+        )
+    
+    from sqlalchemy import select
+    from sqlalchemy.orm import joinedload
+    result = await db.execute(
+        select(APIKey).options(joinedload(APIKey.user)).where(APIKey.key_id == key_id)
+    )
+    api_key = result.scalar_one_or_none()
+    
+    if not api_key:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="API key not found"
+        )
+    
+    return {
+        "key_id": api_key.key_id,
+        "signing_key": derive_request_signing_key(api_key.secret_key),
         "user_id": api_key.user_id,
+        "username": api_key.user.username,
         "permissions": api_key.permissions
     }
 
+@app.get("/internal/api-key-deletions")
+async def internal_api_key_deletions(
+    request: Request,
+    generation: Optional[str] = None,
+    since: Optional[int] = None
+):
+    """Удалённые API ключи с версии since для кеша API Gateway; 304 - без изменений"""
+    if not is_gateway_request(request):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Internal endpoint"
+        )
+    
+    changes = deleted_api_keys.changes(generation, since)
+    if changes is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    return changes
+
 # Dynamic Tokens (ZTNA)
 @app.post("/dynamic-tokens", response_model=DynamicTokenResponse)
 async def create_dynamic_token(
@@ -316,7 +819,7 @@ async def create_dynamic_token(
     db: AsyncSession = Depends(get_db)
 ):
     """Создание динамического токена для ZTNA (Zero Trust Network Access)"""
-    token_value, expires_at = generate_dynamic_token()
+    token_value, jti, expires_at = generate_dynamic_token(current_user.id)
     
     dynamic_token = DynamicToken(
         token=token_value,
@@ -328,6 +831,7 @@ async def create_dynamic_token(
     db.add(dynamic_token)
     await db.commit()
     await db.refresh(dynamic_token)
+    dynamic_token_index.add(dynamic_token)
     
     return DynamicTokenResponse(
         id=dynamic_token.id,
@@ -336,21 +840,60 @@ async def create_dynamic_token(
         is_active=dynamic_token.is_active
     )
 
-@app.post("/verify-dynamic-token")
-async def verify_dynamic_token(
-    request: DynamicTokenVerifyRequest,
+@app.delete("/dynamic-tokens/{token_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_dynamic_token(
+    token_id: int,
+    current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Проверка динамического токена"""
+    """Отзыв динамического токена (владелец или админ); шлюзы получают jti в списке отзыва"""
     from sqlalchemy import select
-    result = await db.execute(
-        select(DynamicToken).where(
-            DynamicToken.token == request.token,
-            DynamicToken.is_active == True
-        )
-    )
+    result = await db.execute(select(DynamicToken).where(DynamicToken.id == token_id))
     dynamic_token = result.scalar_one_or_none()
     
+    if not dynamic_token or not policy.allows(
+        "auth", "DELETE", "/dynamic-tokens/{token_id}", current_user.role, current_user.id, owner=dynamic_token.user_id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Token not found"
+        )
+    
+    if dynamic_token.is_active:
+        dynamic_token.is_active = False
+        await db.commit()
+        dynamic_token_index.remove(dynamic_token.token)
+        try:
+            jti = ztna_codec.get_unverified_claims(dynamic_token.token).get("jti")
+        except jwt.PyJWTError:
+            jti = None  # Непрозрачный токен старого формата проверяется только в Auth Service
+        if jti:
+            revoked_tokens.add(jti, dynamic_token.expires_at)
+    
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@app.get("/internal/ztna/revoked")
+async def internal_revoked_dynamic_tokens(
+    request: Request,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Отозванные динамические токены (jti -> exp) для API Gateway"""
+    if not is_gateway_request(request):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Internal endpoint"
+        )
+    
+    etag, body = revoked_tokens.snapshot()
+    if if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+@app.post("/verify-dynamic-token")
+async def verify_dynamic_token(request: DynamicTokenVerifyRequest):
+    """Проверка динамического токена (индекс в памяти)"""
+    dynamic_token = await dynamic_token_index.lookup(request.token)
+    
     if not dynamic_token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -358,14 +901,13 @@ async def verify_dynamic_token(
         )
     
     if dynamic_token.expires_at < datetime.utcnow():
-        # Деактивируем истёкший токен
-        dynamic_token.is_active = False
-        await db.commit()
+        # Деактивация в БД - при очередном проходе по куче истечений
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token expired"
         )
     
+    usage_tracker.touch_dynamic_token(dynamic_token.id)
     return {
         "valid": True,
         "user_id": dynamic_token.user_id,
@@ -377,3 +919,20 @@ async def health():
     """Health check endpoint"""
     return {"status": "healthy", "service": "auth-service"}
 
+@app.get("/metrics")
+async def metrics():
+    """Метрики сервиса: хеширование паролей, кеши и индексы, защита от повторов"""
+    return {
+        "hashing": hashing_pool.stats(),
+        "bulk_hashing": bulk_hashing_pool.stats(),
+        "user_cache": user_cache.stats(),
+        "api_key_cache": api_key_cache.stats(),
+        "nonce_store": nonce_store.stats(),
+        "usage_tracking": usage_tracker.stats(),
+        "dynamic_tokens": dynamic_token_index.stats(),
+        "dynamic_token_sweeper": token_sweeper.stats(),
+        "ztna_revocation": revoked_tokens.stats(),
+        "token_revocation": access_token_revocations.stats(),
+        "policy": policy.stats()
+    }
+
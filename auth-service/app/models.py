@@ -1,5 +1,5 @@
 """Модели данных для Auth Service"""
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -11,6 +11,11 @@ class UserRole(str, enum.Enum):
     ADMIN = "admin"
     USER = "user"
     READONLY = "readonly"
+    SERVICE = "service"  # Сервисные клиенты (client credentials)
+
+# sub токенов сервисных клиентов: "service:<client_id>", не пересекается с username
+SERVICE_SUBJECT_PREFIX = "service:"
+SERVICE_CLIENT_ID_PREFIX = "svc_"
 
 class User(Base):
     __tablename__ = "users"
@@ -25,6 +30,7 @@ class User(Base):
     
     api_keys = relationship("APIKey", back_populates="user", cascade="all, delete-orphan")
     dynamic_tokens = relationship("DynamicToken", back_populates="user", cascade="all, delete-orphan")
+    refresh_tokens = relationship("RefreshToken", back_populates="user", cascade="all, delete-orphan")
 
 class APIKey(Base):
     __tablename__ = "api_keys"
@@ -52,4 +58,48 @@ class DynamicToken(Base):
     last_used = Column(DateTime, nullable=True)
     
     user = relationship("User", back_populates="dynamic_tokens")
+    
+    __table_args__ = (
+        # Очистка истёкших токенов пакетами по expires_at
+        Index("ix_dynamic_tokens_expires_at", "expires_at"),
+        # Частичный индекс: только активные токены (проверка, загрузка индекса при старте)
+        Index(
+            "ix_dynamic_tokens_active",
+            "token", "expires_at",
+            sqlite_where=is_active == True,
+            postgresql_where=is_active == True
+        ),
+    )
+
 
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    token_hash = Column(String, unique=True, index=True, nullable=False)  # SHA-256, сам токен не хранится
+    family_id = Column(String, index=True, nullable=False)  # Цепочка ротаций одного входа
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)  # Токен уже обменян на новый
+    revoked = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    user = relationship("User", back_populates="refresh_tokens")
+
+class RevokedAccessToken(Base):
+    __tablename__ = "revoked_access_tokens"
+    
+    jti = Column(String, primary_key=True)
+    expires_at = Column(DateTime, index=True, nullable=False)  # После exp запись не нужна
+    revoked_at = Column(DateTime, default=datetime.utcnow)
+
+class ServiceClient(Base):
+    __tablename__ = "service_clients"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    client_id = Column(String, unique=True, index=True, nullable=False)
+    secret_hash = Column(String, nullable=False)  # HMAC-SHA256 с pepper, не bcrypt: секрет случайный
+    name = Column(String, nullable=False)
+    scopes = Column(JSON, default=list)  # Разрешённые scope
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,198 @@
+# Общий модуль: правится в shared/, копии в сервисах обновляет scripts/sync_shared.py
+"""Защита от повторного воспроизведения подписанных запросов
+
+Запрос принимается только при |now - timestamp| <= окна, поэтому хранить
+идентификаторы нужно только за окно. Хранилища делятся на корзины по
+timestamp запроса: повтор имеет тот же timestamp и попадает в ту же корзину,
+поэтому проверка-и-вставка - O(1), а устаревшие корзины удаляются целиком.
+Корзины создаются только после проверки подписи; timestamp в пределах
+±окна даёт не больше 2 * window / bucket_seconds + 1 корзин.
+
+    memory - множества 16-байтных дайджестов (точно, память растёт с трафиком)
+    bloom  - фильтры Блума фиксированного размера (память ограничена заранее,
+             редкие ложные срабатывания отклоняют легитимный запрос); по
+             умолчанию 100 000 запросов за окно - около 36 КиБ на корзину,
+             меньше 1 МиБ на все корзины
+    redis  - SET NX EX в общем Redis для нескольких реплик (пакет redis)
+"""
+import hashlib
+import math
+import os
+import time
+from typing import Dict, Optional
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # redis необязателен
+    redis_asyncio = None
+
+NONCE_STORE_BACKEND = os.getenv("NONCE_STORE_BACKEND", "bloom")
+NONCE_WINDOW_SECONDS = int(os.getenv("NONCE_WINDOW_SECONDS", "300"))  # Как допустимое расхождение timestamp
+NONCE_BUCKET_SECONDS = int(os.getenv("NONCE_BUCKET_SECONDS", "30"))
+# Ожидаемое число подписанных запросов за окно и доля ложных повторов для bloom
+NONCE_BLOOM_CAPACITY = int(os.getenv("NONCE_BLOOM_CAPACITY", "100000"))
+NONCE_BLOOM_ERROR_RATE = float(os.getenv("NONCE_BLOOM_ERROR_RATE", "0.000001"))
+NONCE_REDIS_URL = os.getenv("NONCE_REDIS_URL", "redis://localhost:6379/0")
+# Допустимая длина X-API-Nonce (например, secrets.token_hex(16))
+NONCE_MIN_LENGTH = 16
+NONCE_MAX_LENGTH = 128
+
+
+def _digest(nonce: str) -> bytes:
+    return hashlib.blake2b(nonce.encode(), digest_size=16).digest()
+
+
+class _BloomFilter:
+    __slots__ = ("bits", "size", "hashes", "count")
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, digest: bytes) -> bool:
+        """Добавление; False, если элемент (вероятно) уже был"""
+        # Двойное хеширование: k позиций из двух 64-битных половин дайджеста
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        bits, size = self.bits, self.size
+        added = False
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class BucketedNonceStore:
+    """Корзины по timestamp запроса: множества дайджестов или фильтры Блума"""
+
+    def __init__(
+        self,
+        window: int = NONCE_WINDOW_SECONDS,
+        bucket_seconds: int = NONCE_BUCKET_SECONDS,
+        bloom_capacity: Optional[int] = None,
+        bloom_error_rate: float = NONCE_BLOOM_ERROR_RATE
+    ):
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self._buckets: Dict[int, object] = {}
+        self.accepted = 0
+        self.replays = 0
+
+    @property
+    def backend(self) -> str:
+        return "bloom" if self.bloom_capacity else "memory"
+
+    def _new_bucket(self):
+        if self.bloom_capacity:
+            # Запросы окна распределяются по window / bucket_seconds корзинам
+            per_bucket = math.ceil(self.bloom_capacity * self.bucket_seconds / self.window)
+            return _BloomFilter(per_bucket, self.bloom_error_rate)
+        return set()
+
+    def _expire(self, now: float):
+        # Корзины, все timestamp которых уже вне окна
+        oldest = int((now - self.window) // self.bucket_seconds)
+        for index in [index for index in self._buckets if index < oldest]:
+            del self._buckets[index]
+
+    async def check_and_add(self, nonce: str, timestamp: int) -> bool:
+        """True - впервые, False - повтор (или timestamp вне окна)"""
+        now = time.time()
+        if abs(now - timestamp) > self.window:
+            return False
+        self._expire(now)
+        index = timestamp // self.bucket_seconds
+        bucket = self._buckets.get(index)
+        if bucket is None:
+            bucket = self._buckets[index] = self._new_bucket()
+
+        digest = _digest(nonce)
+        if isinstance(bucket, _BloomFilter):
+            fresh = bucket.add(digest)
+        else:
+            fresh = digest not in bucket
+            if fresh:
+                bucket.add(digest)
+
+        if fresh:
+            self.accepted += 1
+        else:
+            self.replays += 1
+        return fresh
+
+    async def close(self):
+        self._buckets.clear()
+
+    def stats(self) -> Dict[str, object]:
+        entries = 0
+        memory = 0
+        for bucket in self._buckets.values():
+            if isinstance(bucket, _BloomFilter):
+                entries += bucket.count
+                memory += bucket.nbytes
+            else:
+                entries += len(bucket)
+                memory += len(bucket) * 100  # Оценка: bytes(16) + слот множества
+        return {
+            "backend": self.backend,
+            "buckets": len(self._buckets),
+            "entries": entries,
+            "memory_bytes": memory,
+            "accepted": self.accepted,
+            "replays": self.replays,
+        }
+
+
+class RedisNonceStore:
+    """Общее хранилище для нескольких реплик сервиса"""
+
+    def __init__(self, url: str = NONCE_REDIS_URL, window: int = NONCE_WINDOW_SECONDS):
+        if redis_asyncio is None:
+            raise RuntimeError("NONCE_STORE_BACKEND=redis requires the redis package")
+        self.window = window
+        self._redis = redis_asyncio.from_url(url)
+        self.accepted = 0
+        self.replays = 0
+
+    async def check_and_add(self, nonce: str, timestamp: int) -> bool:
+        # Ключ живёт, пока timestamp запроса может попасть в окно
+        ttl = max(1, int(timestamp + self.window - time.time()) + 1)
+        fresh = bool(await self._redis.set(b"nonce:" + _digest(nonce), b"1", nx=True, ex=ttl))
+        if fresh:
+            self.accepted += 1
+        else:
+            self.replays += 1
+        return fresh
+
+    async def close(self):
+        await self._redis.close()
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": "redis", "accepted": self.accepted, "replays": self.replays}
+
+
+def create_nonce_store(backend: str = NONCE_STORE_BACKEND):
+    if backend == "redis":
+        return RedisNonceStore()
+    if backend == "bloom":
+        return BucketedNonceStore(bloom_capacity=NONCE_BLOOM_CAPACITY)
+    if backend == "memory":
+        return BucketedNonceStore()
+    raise ValueError(f"Unknown NONCE_STORE_BACKEND: {backend}")
+
+
+nonce_store = create_nonce_store()
@@ -0,0 +1,176 @@
+# Общий модуль: правится в shared/, копии в сервисах обновляет scripts/sync_shared.py
+"""Декларативная политика доступа (RBAC) для всех сервисов
+
+Одинаковый модуль в API Gateway и сервисах: шлюз отклоняет заведомо
+запрещённые запросы до обращения к сервису, сервисы проверяют те же правила
+(включая владельца ресурса, известного только им). Правила компилируются при
+импорте в таблицы: статические маршруты - словарь, маршруты с параметрами -
+списки по числу сегментов; решение для пары (правило, роль) вычисляется заранее,
+сопоставление пути кешируется.
+
+Маршруты без правила политикой не ограничиваются (проверяет обработчик).
+"""
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
+
+ANY_ROLE = "*"
+ROLES = ("admin", "user", "readonly", "service")
+# Владелец ресурса известен только сервису (например, owner_id записи в БД)
+RESOURCE_OWNER = True
+
+ALLOW = "allow"
+DENY = "deny"
+OWNER = "owner"
+
+_MATCH_CACHE_SIZE = 4096
+
+
+class Rule:
+    """roles - роли с полным доступом; остальным при owner - доступ к своему ресурсу
+
+    owner: имя параметра пути с владельцем (проверяется и на шлюзе)
+    или RESOURCE_OWNER.
+    """
+    __slots__ = ("method", "route", "roles", "owner")
+
+    def __init__(
+        self,
+        method: str,
+        route: str,
+        roles: Union[str, Tuple[str, ...]] = ANY_ROLE,
+        owner: Union[None, bool, str] = None
+    ):
+        self.method = method.upper()
+        self.route = route
+        self.roles = roles
+        self.owner = owner
+
+    def decide(self, role: str) -> Tuple[str, Union[None, bool, str]]:
+        if self.roles == ANY_ROLE or role in self.roles:
+            return ALLOW, None
+        if self.owner:
+            return OWNER, self.owner
+        return DENY, None
+
+
+POLICY: Dict[str, List[Rule]] = {
+    "auth": [
+        Rule("GET", "/users/me"),  # Статический маршрут проверяется раньше шаблона
+        Rule("GET", "/users/{username}", roles=("admin",)),
+        Rule("POST", "/users/bulk", roles=("admin",)),
+        Rule("POST", "/service-clients", roles=("admin",)),
+        Rule("GET", "/service-clients", roles=("admin",)),
+        Rule("POST", "/keys/rotate", roles=("admin",)),
+        Rule("POST", "/token/revoke", roles=("admin",), owner=RESOURCE_OWNER),
+        Rule("DELETE", "/api-keys/{key_id}", roles=("admin",), owner=RESOURCE_OWNER),
+        Rule("DELETE", "/dynamic-tokens/{token_id}", roles=("admin",), owner=RESOURCE_OWNER),
+    ],
+    "data": [
+        Rule("GET", "/data"),
+        Rule("POST", "/data"),
+        Rule("GET", "/data/{item_id}", roles=("admin",), owner=RESOURCE_OWNER),
+        Rule("PUT", "/data/{item_id}", roles=("admin",), owner=RESOURCE_OWNER),
+        Rule("DELETE", "/data/{item_id}", roles=("admin",)),
+    ],
+}
+
+
+def _segments(path: str) -> Tuple[str, ...]:
+    return tuple(segment for segment in path.split("/") if segment)
+
+
+class CompiledPolicy:
+    def __init__(self, policy: Dict[str, List[Rule]]):
+        self._rules: List[Rule] = []
+        # (service, method, path) -> номер правила
+        self._static: Dict[Tuple[str, str, Tuple[str, ...]], int] = {}
+        # (service, method, число сегментов) -> [(сегменты, {позиция: параметр}, номер правила)]
+        self._patterns: Dict[Tuple[str, str, int], List[Tuple[Tuple[str, ...], Dict[int, str], int]]] = {}
+        # Номер правила -> решение по роли; ANY_ROLE - для прочих ролей
+        self._decisions: List[Dict[str, Tuple[str, Union[None, bool, str]]]] = []
+
+        for service, rules in policy.items():
+            for rule in rules:
+                index = len(self._rules)
+                self._rules.append(rule)
+                segments = _segments(rule.route)
+                params = {
+                    position: segment[1:-1]
+                    for position, segment in enumerate(segments)
+                    if segment.startswith("{") and segment.endswith("}")
+                }
+                if params:
+                    key = (service, rule.method, len(segments))
+                    self._patterns.setdefault(key, []).append((segments, params, index))
+                else:
+                    self._static[(service, rule.method, segments)] = index
+                decisions = {role: rule.decide(role) for role in ROLES}
+                decisions[ANY_ROLE] = rule.decide(ANY_ROLE)
+                self._decisions.append(decisions)
+
+        self._match = lru_cache(maxsize=_MATCH_CACHE_SIZE)(self._match_uncached)
+
+    def _match_uncached(self, service: str, method: str, path: str) -> Optional[Tuple[int, Dict[str, str]]]:
+        segments = _segments(path)
+        index = self._static.get((service, method, segments))
+        if index is not None:
+            return index, {}
+        for pattern, params, index in self._patterns.get((service, method, len(segments)), ()):
+            if all(
+                position in params or segment == pattern[position]
+                for position, segment in enumerate(segments)
+            ):
+                return index, {name: segments[position] for position, name in params.items()}
+        return None
+
+    def _decide(self, service: str, method: str, path: str, role: Optional[str]):
+        match = self._match(service, method.upper(), path)
+        if match is None:
+            return None, None, {}
+        index, params = match
+        decisions = self._decisions[index]
+        effect, owner = decisions.get(role) or decisions[ANY_ROLE]
+        return effect, owner, params
+
+    def governs(self, service: str, method: str, path: str) -> bool:
+        return self._match(service, method.upper(), path) is not None
+
+    def allows(
+        self,
+        service: str,
+        method: str,
+        path: str,
+        role: Optional[str],
+        subject: Optional[str] = None,
+        owner: Optional[str] = None
+    ) -> bool:
+        """Окончательное решение в сервисе; owner - владелец ресурса (если известен)"""
+        effect, owner_rule, params = self._decide(service, method, path, role)
+        if effect is None or effect == ALLOW:
+            return True
+        if effect == DENY:
+            return False
+        if owner is None and owner_rule is not RESOURCE_OWNER:
+            owner = params.get(owner_rule)
+        return subject is not None and owner is not None and str(subject) == str(owner)
+
+    def precheck(self, service: str, method: str, path: str, role: Optional[str], subject: Optional[str] = None) -> bool:
+        """Проверка на шлюзе: False - запрос точно запрещён; владелец ресурса проверяется сервисом"""
+        effect, owner_rule, params = self._decide(service, method, path, role)
+        if effect == DENY:
+            return False
+        if effect == OWNER and owner_rule is not RESOURCE_OWNER:
+            return subject is not None and params.get(owner_rule) == str(subject)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        info = self._match.cache_info()
+        return {
+            "rules": len(self._rules),
+            "match_cache_hits": info.hits,
+            "match_cache_misses": info.misses,
+            "match_cache_size": info.currsize,
+        }
+
+
+policy = CompiledPolicy(POLICY)
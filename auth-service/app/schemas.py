@@ -1,14 +1,27 @@
 """Pydantic схемы для валидации данных"""
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, field_validator
+from typing import Optional, List, Literal
 from datetime import datetime
-from .models import UserRole
+from .models import UserRole, SERVICE_CLIENT_ID_PREFIX
 
 class UserCreate(BaseModel):
     username: str
     email: EmailStr
     password: str
 
+    @field_validator("username")
+    @classmethod
+    def username_not_reserved(cls, value: str) -> str:
+        """Имена сервисных клиентов и субъектов с ":" зарезервированы"""
+        if value.startswith(SERVICE_CLIENT_ID_PREFIX) or ":" in value:
+            raise ValueError("Username is reserved")
+        return value
+
+class BulkUserCreate(UserCreate):
+    """Строка массового импорта"""
+    role: Literal["admin", "user", "readonly"] = "user"
+    is_active: bool = True
+
 class UserResponse(BaseModel):
     id: int
     username: str
@@ -22,6 +35,34 @@ class UserResponse(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+class TokenRevokeRequest(BaseModel):
+    token: str
+
+class ClientToken(BaseModel):
+    access_token: str
+    token_type: str
+    expires_in: int
+    scope: str
+
+class ServiceClientCreate(BaseModel):
+    name: str
+    scopes: List[str] = []
+
+class ServiceClientResponse(BaseModel):
+    client_id: str
+    client_secret: str
+    name: str
+    scopes: List[str]
+    is_active: bool
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -33,6 +74,13 @@ class TokenVerifyRequest(BaseModel):
 class DynamicTokenVerifyRequest(BaseModel):
     token: str
 
+class TokenBatchItem(BaseModel):
+    token: str
+    type: Literal["jwt", "dynamic"] = "jwt"
+
+class TokenBatchVerifyRequest(BaseModel):
+    tokens: List[TokenBatchItem]
+
 class APIKeyCreate(BaseModel):
     name: str
     permissions: Optional[List[str]] = None
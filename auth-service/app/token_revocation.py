@@ -0,0 +1,134 @@
+"""Отзыв access токенов (JWT) до истечения срока
+
+Каждый access токен содержит jti. Отозванные jti хранятся в БД (до exp
+токена) и в памяти; Auth Service проверяет их точно, а проверяющие сервисы
+получают фильтр Блума по GET /revocations и дальше - только добавленные jti
+(delta по версии). Проверка jti, не попавшего в фильтр, не требует запросов;
+совпадение уточняется запросом GET /revocations/{jti}.
+
+Из фильтра Блума нельзя удалять, поэтому истёкшие записи вычищаются
+перестроением: новое поколение (generation) - клиенты загружают фильтр заново.
+"""
+import os
+import secrets
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from .bloom import BloomFilter
+from .database import async_session
+from .models import RevokedAccessToken
+
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "10000"))
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.0001"))
+REVOCATION_DELTA_MAX = int(os.getenv("REVOCATION_DELTA_MAX", "1000"))
+REVOCATION_REBUILD_SECONDS = float(os.getenv("REVOCATION_REBUILD_SECONDS", "300"))
+
+
+def _unix(value: datetime) -> float:
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+class AccessTokenRevocations:
+    """jti -> exp, фильтр Блума текущего поколения и журнал добавлений"""
+
+    def __init__(
+        self,
+        capacity: int = REVOCATION_BLOOM_CAPACITY,
+        error_rate: float = REVOCATION_BLOOM_ERROR_RATE,
+        delta_max: int = REVOCATION_DELTA_MAX,
+        rebuild_interval: float = REVOCATION_REBUILD_SECONDS
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.delta_max = delta_max
+        self.rebuild_interval = rebuild_interval
+        self._revoked: Dict[str, float] = {}
+        self._version = 0
+        self._delta: List[Tuple[int, str]] = []
+        self._rebuild()
+
+    def _rebuild(self):
+        """Новое поколение фильтра без истёкших записей"""
+        now = time.time()
+        self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+        # Запас вдвое: фильтр не перестраивается сразу после загрузки
+        self._filter_capacity = max(self.capacity, 2 * len(self._revoked))
+        self._filter = BloomFilter.for_capacity(self._filter_capacity, self.error_rate)
+        for jti in self._revoked:
+            self._filter.add(jti)
+        self._generation = secrets.token_hex(4)
+        self._version += 1
+        self._delta = []
+        self._rebuilt_at = now
+
+    async def load(self):
+        async with async_session() as session:
+            result = await session.execute(
+                select(RevokedAccessToken.jti, RevokedAccessToken.expires_at)
+                .where(RevokedAccessToken.expires_at > datetime.utcnow())
+            )
+            for jti, expires_at in result:
+                self._revoked[jti] = _unix(expires_at)
+        self._rebuild()
+
+    async def revoke(self, jti: str, expires_at: datetime):
+        if jti in self._revoked:
+            return
+        async with async_session() as session:
+            await session.merge(RevokedAccessToken(jti=jti, expires_at=expires_at))
+            await session.commit()
+        self._revoked[jti] = _unix(expires_at)
+        if self._filter.count >= self._filter_capacity:
+            self._rebuild()  # Фильтр заполнен: доля ложных совпадений растёт
+            return
+        self._filter.add(jti)
+        self._version += 1
+        self._delta.append((self._version, jti))
+        if len(self._delta) > self.delta_max:
+            del self._delta[:len(self._delta) - self.delta_max]
+
+    def __contains__(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def _maybe_rebuild(self):
+        if time.time() - self._rebuilt_at < self.rebuild_interval:
+            return
+        now = time.time()
+        if any(exp <= now for exp in self._revoked.values()):
+            self._rebuild()
+        else:
+            self._rebuilt_at = now
+
+    def changes(self, generation: Optional[str], since: Optional[int]) -> Optional[Dict[str, Any]]:
+        """Изменения для клиента с (generation, since); None - изменений нет"""
+        self._maybe_rebuild()
+        if generation == self._generation and since is not None:
+            if since == self._version:
+                return None
+            # Журнал непрерывен внутри поколения; обрезанный - только полный снимок
+            if self._delta and self._delta[0][0] <= since + 1 and since < self._version:
+                return {
+                    "generation": self._generation,
+                    "version": self._version,
+                    "added": [jti for version, jti in self._delta if version > since],
+                }
+        return {
+            "generation": self._generation,
+            "version": self._version,
+            "filter": self._filter.to_dict(),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "revoked": len(self._revoked),
+            "generation": self._generation,
+            "version": self._version,
+            "filter_bytes": self._filter.nbytes,
+            "delta": len(self._delta),
+        }
+
+
+access_token_revocations = AccessTokenRevocations()
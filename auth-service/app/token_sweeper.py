@@ -0,0 +1,114 @@
+"""Фоновая очистка истёкших динамических токенов
+
+Таблица dynamic_tokens растёт с каждым выданным токеном. Истёкшие токены
+(активные или отозванные) удаляются пакетами по индексу expires_at: каждый
+пакет - отдельная короткая транзакция, поэтому блокировка БД не держится
+дольше одного пакета, а число пакетов за проход ограничено. Токены хранятся
+ещё DYNAMIC_TOKEN_RETENTION_HOURS после истечения (last_used для аудита).
+Заодно удаляются записи об отозванных access токенах, срок которых истёк.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select
+
+from .database import async_session
+from .models import DynamicToken, RevokedAccessToken
+
+DYNAMIC_TOKEN_PURGE_SECONDS = float(os.getenv("DYNAMIC_TOKEN_PURGE_SECONDS", "300"))
+DYNAMIC_TOKEN_PURGE_BATCH = int(os.getenv("DYNAMIC_TOKEN_PURGE_BATCH", "1000"))
+DYNAMIC_TOKEN_PURGE_MAX_BATCHES = int(os.getenv("DYNAMIC_TOKEN_PURGE_MAX_BATCHES", "100"))
+DYNAMIC_TOKEN_RETENTION_HOURS = float(os.getenv("DYNAMIC_TOKEN_RETENTION_HOURS", "24"))
+
+logger = logging.getLogger(__name__)
+
+_dynamic_tokens = DynamicToken.__table__
+_revoked_access_tokens = RevokedAccessToken.__table__
+
+
+def create_indexes(connection):
+    """Индексы для уже существующей таблицы (create_all создаёт их только с таблицей)"""
+    for index in _dynamic_tokens.indexes:
+        index.create(connection, checkfirst=True)
+
+
+class ExpiredTokenSweeper:
+    """Удаление истёкших токенов пакетами ограниченного размера"""
+
+    def __init__(
+        self,
+        interval: float = DYNAMIC_TOKEN_PURGE_SECONDS,
+        batch_size: int = DYNAMIC_TOKEN_PURGE_BATCH,
+        max_batches: int = DYNAMIC_TOKEN_PURGE_MAX_BATCHES,
+        retention_hours: float = DYNAMIC_TOKEN_RETENTION_HOURS
+    ):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.retention = timedelta(hours=retention_hours)
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.deleted = 0
+        self.last_run_deleted = 0
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("dynamic token purge failed")
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self, now: Optional[datetime] = None) -> int:
+        """Один проход; остаток (больше max_batches пакетов) - в следующем"""
+        now = now or datetime.utcnow()
+        cutoff = now - self.retention
+        batch = (
+            select(_dynamic_tokens.c.id)
+            .where(_dynamic_tokens.c.expires_at < cutoff)
+            .limit(self.batch_size)
+        )
+        total = 0
+        for _ in range(self.max_batches):
+            async with async_session() as session:
+                result = await session.execute(
+                    delete(_dynamic_tokens).where(_dynamic_tokens.c.id.in_(batch))
+                )
+                await session.commit()
+            total += result.rowcount
+            if result.rowcount < self.batch_size:
+                break
+            await asyncio.sleep(0)  # Запросы проверки выполняются между пакетами
+
+        # Отзывов мало (только за время жизни access токена) - одним запросом
+        async with async_session() as session:
+            await session.execute(
+                delete(_revoked_access_tokens).where(_revoked_access_tokens.c.expires_at < now)
+            )
+            await session.commit()
+
+        self.runs += 1
+        self.deleted += total
+        self.last_run_deleted = total
+        return total
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "runs": self.runs,
+            "deleted": self.deleted,
+            "last_run_deleted": self.last_run_deleted,
+        }
+
+
+token_sweeper = ExpiredTokenSweeper()
@@ -0,0 +1,103 @@
+"""Отложенная запись last_used для API ключей и динамических токенов
+
+Проверка ключа только запоминает время в памяти; фоновая задача периодически
+записывает последние значения одним пакетным UPDATE (executemany в одной
+транзакции). При остановке сервиса накопленное сбрасывается.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, update
+
+from .database import async_session
+from .models import APIKey, DynamicToken
+
+USAGE_FLUSH_INTERVAL_SECONDS = float(os.getenv("USAGE_FLUSH_INTERVAL_SECONDS", "10"))
+
+logger = logging.getLogger(__name__)
+
+_api_keys = APIKey.__table__
+_dynamic_tokens = DynamicToken.__table__
+
+
+class UsageTracker:
+    """Последнее время использования по ключу; запись в БД пакетами"""
+
+    def __init__(self, flush_interval: float = USAGE_FLUSH_INTERVAL_SECONDS):
+        self.flush_interval = flush_interval
+        self._api_keys: Dict[str, datetime] = {}
+        self._dynamic_tokens: Dict[int, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.flushes = 0
+        self.rows_written = 0
+
+    def touch_api_key(self, key_id: str):
+        # Повторные обращения перезаписывают значение: в БД попадёт только последнее
+        self._api_keys[key_id] = datetime.utcnow()
+
+    def touch_dynamic_token(self, token_id: int):
+        self._dynamic_tokens[token_id] = datetime.utcnow()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("last_used flush failed")
+
+    async def flush(self):
+        async with self._lock:
+            api_keys, self._api_keys = self._api_keys, {}
+            dynamic_tokens, self._dynamic_tokens = self._dynamic_tokens, {}
+            if not api_keys and not dynamic_tokens:
+                return
+            try:
+                async with async_session() as session:
+                    if api_keys:
+                        await session.execute(
+                            update(_api_keys)
+                            .where(_api_keys.c.key_id == bindparam("b_key_id"))
+                            .values(last_used=bindparam("b_last_used")),
+                            [{"b_key_id": k, "b_last_used": t} for k, t in api_keys.items()]
+                        )
+                    if dynamic_tokens:
+                        await session.execute(
+                            update(_dynamic_tokens)
+                            .where(_dynamic_tokens.c.id == bindparam("b_id"))
+                            .values(last_used=bindparam("b_last_used")),
+                            [{"b_id": i, "b_last_used": t} for i, t in dynamic_tokens.items()]
+                        )
+                    await session.commit()
+            except Exception:
+                # Возвращаем несохранённое, не затирая более свежие отметки
+                for key_id, used_at in api_keys.items():
+                    self._api_keys.setdefault(key_id, used_at)
+                for token_id, used_at in dynamic_tokens.items():
+                    self._dynamic_tokens.setdefault(token_id, used_at)
+                raise
+            self.flushes += 1
+            self.rows_written += len(api_keys) + len(dynamic_tokens)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._api_keys) + len(self._dynamic_tokens),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+        }
+
+
+usage_tracker = UsageTracker()
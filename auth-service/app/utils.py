@@ -1,8 +1,7 @@
 """Утилиты для работы с паролями, токенами, HMAC"""
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -10,24 +9,43 @@ import secrets
 import hmac
 import hashlib
 import base64
+import os
 
-from .models import User, UserRole
+from .models import User, UserRole, SERVICE_CLIENT_ID_PREFIX, SERVICE_SUBJECT_PREFIX
 from .database import get_db
+from .keys import key_manager
+from .tokens import codec, ztna_codec
+from .hashing import password_policy
+from .user_cache import user_cache
+from .token_revocation import access_token_revocations
 
-# Конфигурация
-SECRET_KEY = "your-secret-key-change-in-production-use-env-variable"
-ALGORITHM = "HS256"
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Pepper для хешей секретов сервисных клиентов (хранится вне БД)
+CLIENT_SECRET_PEPPER = os.getenv("CLIENT_SECRET_PEPPER", "")
+CLIENT_SECRET_PEPPER_MIN_LENGTH = 32
+# Публично известные значения из прежних конфигураций
+_KNOWN_CLIENT_SECRET_PEPPERS = ("client-secret-pepper-change-in-production",)
+_client_secret_pepper = CLIENT_SECRET_PEPPER.encode()
+
+def require_client_secret_pepper():
+    """Вызывается при старте сервиса: с известным pepper хеши секретов клиентов перебираются по утёкшей БД"""
+    if (
+        CLIENT_SECRET_PEPPER in _KNOWN_CLIENT_SECRET_PEPPERS
+        or len(CLIENT_SECRET_PEPPER) < CLIENT_SECRET_PEPPER_MIN_LENGTH
+    ):
+        raise RuntimeError(
+            f"CLIENT_SECRET_PEPPER must be set to a random value of at least "
+            f"{CLIENT_SECRET_PEPPER_MIN_LENGTH} characters (e.g. openssl rand -hex 32)"
+        )
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Проверка пароля"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Проверка пароля (синхронно; в обработчиках - через hashing_pool)"""
+    return password_policy.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    """Хеширование пароля"""
-    return pwd_context.hash(password)
+    """Хеширование пароля (синхронно; в обработчиках - через hashing_pool)"""
+    return password_policy.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Создание JWT токена"""
@@ -36,21 +54,34 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    # jti - идентификатор для отзыва токена до exp
+    to_encode.update({"exp": expire, "jti": secrets.token_urlsafe(12)})
+    signing_key = key_manager.active
+    encoded_jwt = codec.encode(to_encode, signing_key.private_key, signing_key.kid)
     return encoded_jwt
 
+def decode_access_token(token: str) -> dict:
+    """Декодирование JWT по ключу из заголовка kid (jwt.PyJWTError при ошибке)"""
+    kid = codec.get_header(token).get("kid")
+    public_key = key_manager.get_public_key(kid)
+    if public_key is None:
+        raise jwt.InvalidTokenError("Unknown signing key")
+    payload = codec.decode(token, public_key)
+    if payload.get("jti") in access_token_revocations:
+        raise jwt.InvalidTokenError("Token has been revoked")
+    return payload
+
 def verify_token(token: str):
     """Проверка JWT токена, возвращает исходный payload"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         if payload.get("sub") is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials"
             )
         return payload
-    except JWTError:
+    except jwt.PyJWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
@@ -68,13 +99,20 @@ async def get_current_user(
     )
     
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-    except JWTError:
+        # Токен сервисного клиента не представляет пользователя
+        if payload.get("role") == UserRole.SERVICE.value or username.startswith(SERVICE_SUBJECT_PREFIX):
+            raise credentials_exception
+    except jwt.PyJWTError:
         raise credentials_exception
     
+    user = user_cache.get(username)
+    if user is not None:
+        return user
+    
     from sqlalchemy import select
     result = await db.execute(select(User).where(User.username == username))
     user = result.scalar_one_or_none()
@@ -82,6 +120,9 @@ async def get_current_user(
     if user is None:
         raise credentials_exception
     
+    # Отсоединяем от сессии запроса: объект в кеше общий и только для чтения
+    db.expunge(user)
+    user_cache.put(user)
     return user
 
 async def get_current_active_user(
@@ -122,9 +163,49 @@ def generate_hmac_signature(secret_key: str, message: str) -> str:
         hashlib.sha256
     ).hexdigest()
 
-def generate_dynamic_token(expires_minutes: int = 60) -> tuple[str, datetime]:
-    """Генерация динамического токена для ZTNA"""
+# Контекст производного ключа подписи запросов через API Gateway
+REQUEST_SIGNING_KEY_CONTEXT = "msa-gateway-request-signing-v1"
+
+def derive_request_signing_key(secret_key: str) -> str:
+    """Ключ подписи запросов через шлюз; сам secret_key шлюзу не передаётся"""
+    return generate_hmac_signature(secret_key, REQUEST_SIGNING_KEY_CONTEXT)
+
+def generate_service_client() -> tuple[str, str]:
+    """Генерация учётных данных сервисного клиента (client_id, client_secret)"""
+    client_id = f"{SERVICE_CLIENT_ID_PREFIX}{secrets.token_urlsafe(12)}"
+    client_secret = secrets.token_urlsafe(32)
+    return client_id, client_secret
+
+def hash_client_secret(client_secret: str) -> str:
+    """HMAC-SHA256 секрета с pepper: для 256-битных случайных секретов медленный хеш не нужен"""
+    return hmac.new(_client_secret_pepper, client_secret.encode(), hashlib.sha256).hexdigest()
+
+def verify_client_secret(client_secret: str, secret_hash: str) -> bool:
+    """Проверка секрета сервисного клиента за постоянное время"""
+    return hmac.compare_digest(hash_client_secret(client_secret), secret_hash)
+
+def hash_refresh_token(token: str) -> str:
+    """Хеш refresh токена для хранения и поиска (токен случайный, соль не нужна)"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def generate_refresh_token(expires_days: int = 14) -> tuple[str, str, datetime]:
+    """Генерация refresh токена: (token, token_hash, expires_at)"""
     token = secrets.token_urlsafe(32)
+    expires_at = datetime.utcnow() + timedelta(days=expires_days)
+    return token, hash_refresh_token(token), expires_at
+
+def generate_dynamic_token(user_id: int, expires_minutes: int = 60) -> tuple[str, str, datetime]:
+    """Генерация подписанного динамического токена для ZTNA: (token, jti, expires_at)
+    
+    Токен проверяется в API Gateway локально по JWKS, без обращения к Auth Service.
+    """
+    jti = secrets.token_urlsafe(12)
     expires_at = datetime.utcnow() + timedelta(minutes=expires_minutes)
-    return token, expires_at
+    signing_key = key_manager.active
+    token = ztna_codec.encode(
+        {"sub": str(user_id), "jti": jti, "exp": expires_at},
+        signing_key.private_key,
+        signing_key.kid
+    )
+    return token, jti, expires_at
 
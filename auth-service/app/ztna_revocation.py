@@ -0,0 +1,106 @@
+"""Список отозванных динамических токенов ZTNA для API Gateway
+
+Токены подписаны и проверяются шлюзом локально; отзыв передаётся небольшим
+множеством jti. Запись хранится до exp токена (после него токен и так
+недействителен). Шлюз опрашивает GET /internal/ztna/revoked с If-None-Match:
+пока список не менялся, ответ - 304 без тела. Отзывы других экземпляров
+сервиса подгружаются из БД раз в ZTNA_REVOKED_RELOAD_SECONDS.
+"""
+import asyncio
+import json
+import logging
+import os
+import secrets
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import jwt
+from sqlalchemy import select
+
+from .database import async_session
+from .models import DynamicToken
+from .tokens import ztna_codec
+
+ZTNA_REVOKED_RELOAD_SECONDS = float(os.getenv("ZTNA_REVOKED_RELOAD_SECONDS", "30"))
+
+logger = logging.getLogger(__name__)
+
+
+class RevokedTokens:
+    """jti -> exp (unix time); версия меняется при каждом изменении"""
+
+    def __init__(self, reload_interval: float = ZTNA_REVOKED_RELOAD_SECONDS):
+        self.reload_interval = reload_interval
+        self._task: Optional[asyncio.Task] = None
+        self._revoked: Dict[str, float] = {}
+        self._version = 0
+        self._snapshot: Tuple[int, str, bytes] = (-1, "", b"")
+        # Версия начинается заново при перезапуске - ETag включает идентификатор экземпляра
+        self._instance = secrets.token_hex(4)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.load()
+            except Exception:
+                logger.exception("revoked dynamic tokens reload failed")
+
+    async def load(self):
+        """Неактивные, но ещё не истёкшие токены: после перезапуска и отзывы других экземпляров"""
+        added = False
+        async with async_session() as session:
+            result = await session.execute(
+                select(DynamicToken.token, DynamicToken.expires_at).where(
+                    DynamicToken.is_active == False,
+                    DynamicToken.expires_at > datetime.utcnow()
+                )
+            )
+            for token, expires_at in result:
+                try:
+                    jti = ztna_codec.get_unverified_claims(token).get("jti")
+                except jwt.PyJWTError:
+                    continue  # Непрозрачный токен старого формата
+                if jti and jti not in self._revoked:
+                    self._revoked[jti] = (expires_at - datetime(1970, 1, 1)).total_seconds()
+                    added = True
+        if added or self._version == 0:
+            self._version += 1
+
+    def add(self, jti: str, expires_at: datetime):
+        self._revoked[jti] = (expires_at - datetime(1970, 1, 1)).total_seconds()
+        self._version += 1
+
+    def _prune(self):
+        now = time.time()
+        expired = [jti for jti, exp in self._revoked.items() if exp <= now]
+        for jti in expired:
+            del self._revoked[jti]
+        if expired:
+            self._version += 1
+
+    def snapshot(self) -> Tuple[str, bytes]:
+        """(ETag, JSON) текущего списка; сериализуется только при изменении"""
+        self._prune()
+        if self._snapshot[0] != self._version:
+            body = json.dumps({"revoked": self._revoked, "version": self._version}).encode()
+            self._snapshot = (self._version, f'"{self._instance}-{self._version}"', body)
+        return self._snapshot[1], self._snapshot[2]
+
+    def __contains__(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def stats(self) -> Dict[str, int]:
+        return {"revoked": len(self._revoked), "version": self._version}
+
+
+revoked_tokens = RevokedTokens()
@@ -0,0 +1,196 @@
+"""Клиент Auth Service: пул соединений, кеш проверок токенов, single-flight, пакетирование"""
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import httpx
+
+from .token_batcher import TokenBatcher, BatchVerificationError
+
+AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8001")
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+AUTH_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_NEGATIVE_TTL_SECONDS", "5"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+AUTH_POOL_MAX_CONNECTIONS = int(os.getenv("AUTH_POOL_MAX_CONNECTIONS", "50"))
+AUTH_REQUEST_TIMEOUT_SECONDS = float(os.getenv("AUTH_REQUEST_TIMEOUT_SECONDS", "5"))
+# closed - при недоступности Auth Service запрос отклоняется;
+# stale - используется последний успешный результат в пределах grace периода (но не после exp)
+AUTH_FAILURE_POLICY = os.getenv("AUTH_FAILURE_POLICY", "closed")
+AUTH_STALE_GRACE_SECONDS = float(os.getenv("AUTH_STALE_GRACE_SECONDS", "300"))
+# Промахи кеша копятся до AUTH_BATCH_MAX_DELAY_MS и проверяются одним POST /verify-tokens
+AUTH_BATCH_MAX_SIZE = int(os.getenv("AUTH_BATCH_MAX_SIZE", "100"))
+AUTH_BATCH_MAX_DELAY_MS = float(os.getenv("AUTH_BATCH_MAX_DELAY_MS", "5"))
+
+
+class InvalidTokenError(Exception):
+    """Токен отклонён Auth Service"""
+
+
+class AuthServiceUnavailableError(Exception):
+    """Auth Service недоступен или вернул ошибку"""
+
+
+class _CachedVerdict:
+    __slots__ = ("user", "error", "expires_at", "token_exp", "jti")
+
+    def __init__(self, user: Optional[dict], error: Optional[str], expires_at: float, token_exp: float,
+                 jti: Optional[str] = None):
+        self.user = user
+        self.error = error
+        self.expires_at = expires_at
+        self.token_exp = token_exp
+        self.jti = jti
+
+
+class AuthClient:
+    """Проверка JWT через Auth Service с переиспользованием соединений и кешем
+
+    revocations - фильтр отозванных jti (RevocationFilter): положительный
+    результат из кеша принимается, только пока jti не отозван.
+    """
+
+    def __init__(self, revocations=None):
+        self.revocations = revocations
+        self._client: Optional[httpx.AsyncClient] = None
+        self._cache: "OrderedDict[str, _CachedVerdict]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.coalesced = 0
+        self.revoked = 0
+        self.batcher = TokenBatcher(
+            lambda: self.client,
+            max_batch_size=AUTH_BATCH_MAX_SIZE,
+            max_delay=AUTH_BATCH_MAX_DELAY_MS / 1000
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=AUTH_SERVICE_URL,
+                timeout=AUTH_REQUEST_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=AUTH_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=AUTH_POOL_MAX_CONNECTIONS
+                )
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        # В кеше хранится только хеш токена
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    async def verify(self, token: str) -> dict:
+        """Данные пользователя из токена (InvalidTokenError / AuthServiceUnavailableError)"""
+        key = self._token_key(token)
+        now = time.time()
+
+        cached = self._cache.get(key)
+        if cached is not None and now < cached.expires_at:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return await self._accept(key, cached)
+
+        # Один запрос к Auth Service на токен, остальные ожидают его результат
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            return await self._accept(key, await asyncio.shield(in_flight))
+
+        self.misses += 1
+        task = asyncio.ensure_future(self._fetch(token, cached))
+        self._in_flight[key] = task
+
+        def finish(done: asyncio.Future):
+            self._in_flight.pop(key, None)
+            if not done.cancelled():
+                done.exception()  # Исключение получат ожидающие
+
+        task.add_done_callback(finish)
+        # shield: отмена запроса инициатора не прерывает остальных ожидающих
+        return await self._accept(key, await asyncio.shield(task))
+
+    async def _accept(self, key: str, verdict: _CachedVerdict) -> dict:
+        """Результат проверки; токен, отозванный после кеширования, отклоняется"""
+        user = self._unwrap(verdict)
+        if verdict.jti and self.revocations is not None and await self.revocations.is_revoked(verdict.jti):
+            self._cache.pop(key, None)
+            self.revoked += 1
+            raise InvalidTokenError("Token has been revoked")
+        return user
+
+    @staticmethod
+    def _unwrap(verdict: _CachedVerdict) -> dict:
+        if verdict.error is not None:
+            raise InvalidTokenError(verdict.error)
+        return verdict.user
+
+    async def _fetch(self, token: str, previous: Optional[_CachedVerdict]) -> _CachedVerdict:
+        key = self._token_key(token)
+        try:
+            data = await self.batcher.verify(token)
+        except BatchVerificationError as e:
+            return self._on_failure(key, previous, str(e))
+
+        now = time.time()
+        if not data.get("valid"):
+            verdict = _CachedVerdict(None, "Invalid token", now + AUTH_CACHE_NEGATIVE_TTL_SECONDS, now)
+            self._store(key, verdict)
+            return verdict
+
+        payload = data.get("payload", {})
+        token_exp = float(payload.get("exp") or now + AUTH_CACHE_TTL_SECONDS)
+        user = {
+            "username": payload.get("sub"),
+            "role": payload.get("role"),
+            "user_id": payload.get("sub")  # Используем username как user_id для упрощения
+        }
+        verdict = _CachedVerdict(
+            user, None, min(now + AUTH_CACHE_TTL_SECONDS, token_exp), token_exp, payload.get("jti")
+        )
+        self._store(key, verdict)
+        return verdict
+
+    def _on_failure(self, key: str, previous: Optional[_CachedVerdict], message: str) -> _CachedVerdict:
+        now = time.time()
+        if (
+            AUTH_FAILURE_POLICY == "stale"
+            and previous is not None
+            and previous.error is None
+            and now < previous.token_exp
+            and now < previous.expires_at + AUTH_STALE_GRACE_SECONDS
+        ):
+            self.stale_hits += 1
+            return previous
+        raise AuthServiceUnavailableError(message)
+
+    def _store(self, key: str, verdict: _CachedVerdict):
+        self._cache[key] = verdict
+        self._cache.move_to_end(key)
+        while len(self._cache) > AUTH_CACHE_MAX_ENTRIES:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "coalesced": self.coalesced,
+            "revoked": self.revoked,
+            "batching": self.batcher.stats(),
+        }
+
+
+auth_client = AuthClient()
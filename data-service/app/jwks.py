@@ -0,0 +1,99 @@
+# Общий модуль: правится в shared/, копии в сервисах обновляет scripts/sync_shared.py
+"""Локальная проверка JWT по ключам JWKS из Auth Service"""
+import asyncio
+import json
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+import jwt
+
+from .tokens import TokenCodec, codec, ztna_codec
+
+
+class JWKSUnavailableError(Exception):
+    """Ключи проверки ещё не получены и Auth Service недоступен"""
+
+
+class JWKSClient:
+    """Кеш ключей JWKS с фоновым обновлением и дозагрузкой при неизвестном kid"""
+
+    def __init__(self, jwks_url: str, refresh_interval: float = 300.0, min_refresh_interval: float = 10.0):
+        self.jwks_url = jwks_url
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, Any] = {}
+        self._jwks: Dict[str, str] = {}  # kid -> сериализованный JWK
+        self._last_fetch = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> bool:
+        """Загрузка JWKS; при ошибке сохраняются ранее полученные ключи"""
+        self._last_fetch = time.time()
+        try:
+            async with httpx.AsyncClient(timeout=5.0) as client:
+                response = await client.get(self.jwks_url)
+                response.raise_for_status()
+                jwks = response.json()
+        except (httpx.HTTPError, ValueError):
+            return False
+
+        keys = {}
+        serialized = {}
+        for jwk in jwks.get("keys", []):
+            try:
+                kid = jwk["kid"]
+                serialized[kid] = json.dumps(jwk, sort_keys=True)
+                # Прежний объект для неизменного ключа: кеш проверенных токенов остаётся действительным
+                if self._jwks.get(kid) == serialized[kid]:
+                    keys[kid] = self._keys[kid]
+                else:
+                    keys[kid] = jwt.PyJWK(jwk).key
+            except (KeyError, TypeError, jwt.PyJWTError):
+                continue
+        removed = any(keys.get(kid) is not key for kid, key in self._keys.items())
+        # Замена целиком: читатели всегда видят согласованный набор
+        self._keys = keys
+        self._jwks = {kid: serialized[kid] for kid in keys}
+        if removed:
+            # Токены удалённых ключей не должны проверяться по кешу
+            codec.clear_cache()
+            ztna_codec.clear_cache()
+        return True
+
+    async def start(self):
+        await self.refresh()
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    async def get_key(self, kid: Optional[str]) -> Optional[Any]:
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        # Неизвестный kid (например, после ротации) - внеплановое обновление с ограничением частоты
+        async with self._lock:
+            key = self._keys.get(kid)
+            if key is None and time.time() - self._last_fetch >= self.min_refresh_interval:
+                await self.refresh()
+                key = self._keys.get(kid)
+        return key
+
+    async def decode(self, token: str, token_codec: TokenCodec = codec) -> Dict[str, Any]:
+        """Проверка подписи и срока действия токена, возвращает payload (jwt.PyJWTError при ошибке)"""
+        kid = token_codec.get_header(token).get("kid")
+        key = await self.get_key(kid)
+        if key is None:
+            if not self._keys:
+                raise JWKSUnavailableError("Signing keys are not available")
+            raise jwt.InvalidTokenError("Unknown signing key")
+        return token_codec.decode(token, key)
@@ -2,18 +2,28 @@
 Data Service - Микросервис для хранения и управления данными
 Проверяет права доступа через JWT токены от Auth Service
 """
-from fastapi import FastAPI, Depends, HTTPException, status, Header
+from fastapi import FastAPI, Depends, HTTPException, status, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 from typing import Optional, List
 import httpx
+import jwt
 import os
 
 from .models import DataItem, Base
 from .schemas import DataItemCreate, DataItemResponse, DataItemUpdate
 from .database import get_db, init_db
-from .utils import verify_jwt_token_from_auth_service
+from .identity import verify_gateway_identity, require_signing_key
+from .auth_client import auth_client, AuthServiceUnavailableError
+from .jwks import JWKSClient, JWKSUnavailableError
+from .token_revocation import RevocationFilter
+from .policy import policy
+from .utils import (
+    verify_jwt_token_from_auth_service,
+    item_etag, collection_etag,
+    if_none_match_satisfied, if_match_satisfied
+)
 
 app = FastAPI(
     title="Data Service",
@@ -30,25 +40,83 @@ app.add_middleware(
 )
 
 AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8001")
+JWKS_REFRESH_INTERVAL_SECONDS = float(os.getenv("JWKS_REFRESH_INTERVAL_SECONDS", "300"))
+TOKEN_REVOCATION_REFRESH_SECONDS = float(os.getenv("TOKEN_REVOCATION_REFRESH_SECONDS", "5"))
+# Фильтр отзыва старше этого срока - каждый jti проверяется через Auth Service
+TOKEN_REVOCATION_MAX_AGE_SECONDS = float(os.getenv("TOKEN_REVOCATION_MAX_AGE_SECONDS", "30"))
+
+jwks_client = JWKSClient(
+    f"{AUTH_SERVICE_URL}/.well-known/jwks.json",
+    refresh_interval=JWKS_REFRESH_INTERVAL_SECONDS
+)
+token_revocations = RevocationFilter(
+    AUTH_SERVICE_URL,
+    refresh_interval=TOKEN_REVOCATION_REFRESH_SECONDS,
+    max_age=TOKEN_REVOCATION_MAX_AGE_SECONDS
+)
+# Кеш проверок через Auth Service тоже сверяется со списком отзыва
+auth_client.revocations = token_revocations
 
 @app.on_event("startup")
 async def startup():
+    require_signing_key()
     await init_db()
+    await jwks_client.start()
+    await token_revocations.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await jwks_client.stop()
+    await token_revocations.stop()
+    await auth_client.close()
 
 async def get_current_user_from_token(
+    request: Request,
     authorization: Optional[str] = Header(None)
 ):
-    """Проверка JWT токена через Auth Service"""
+    """Проверка JWT токена: идентичность от API Gateway, JWKS или Auth Service"""
+    # Запрос через API Gateway: токен уже проверен, доверяем подписанной идентичности
+    identity = verify_gateway_identity(request)
+    if identity is not None:
+        return identity
+    
     if not authorization:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Authorization header missing"
         )
     
+    token = authorization.replace("Bearer ", "")
+    
+    # Локальная проверка по JWKS; Auth Service вызывается, только если ключи недоступны
+    try:
+        payload = await jwks_client.decode(token)
+        if await token_revocations.is_revoked(payload.get("jti")):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked"
+            )
+        return {
+            "username": payload.get("sub"),
+            "role": payload.get("role"),
+            "user_id": payload.get("sub")  # Используем username как user_id для упрощения
+        }
+    except JWKSUnavailableError:
+        pass
+    except jwt.PyJWTError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Invalid token: {str(e)}"
+        )
+    
     try:
-        token = authorization.replace("Bearer ", "")
         token_data = await verify_jwt_token_from_auth_service(token)
         return token_data
+    except AuthServiceUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -60,22 +128,47 @@ async def health():
     """Health check endpoint"""
     return {"status": "healthy", "service": "data-service"}
 
+@app.get("/metrics")
+async def metrics():
+    """Метрики сервиса: кеш проверок токенов, отзыв токенов, политика доступа"""
+    return {
+        "auth_cache": auth_client.stats(),
+        "token_revocation": token_revocations.stats(),
+        "policy": policy.stats()
+    }
+
 @app.get("/data", response_model=List[DataItemResponse])
 async def get_all_data(
+    response: Response,
     current_user: dict = Depends(get_current_user_from_token),
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    if_none_match: Optional[str] = Header(None)
 ):
     """Получение всех данных (только для авторизованных пользователей)"""
     from sqlalchemy import select
+    
+    # ETag страницы считается по (id, updated_at) без загрузки содержимого
+    versions = await db.execute(
+        select(DataItem.id, DataItem.updated_at)
+        .order_by(DataItem.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    etag = collection_etag(versions.all(), skip, limit)
+    if if_none_match_satisfied(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
     result = await db.execute(
         select(DataItem)
+        .order_by(DataItem.id)
         .offset(skip)
         .limit(limit)
     )
     items = result.scalars().all()
     
+    response.headers["ETag"] = etag
     return [DataItemResponse(
         id=item.id,
         title=item.title,
@@ -88,8 +181,10 @@ async def get_all_data(
 @app.get("/data/{item_id}", response_model=DataItemResponse)
 async def get_data_item(
     item_id: int,
+    response: Response,
     current_user: dict = Depends(get_current_user_from_token),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    if_none_match: Optional[str] = Header(None)
 ):
     """Получение конкретного элемента данных"""
     from sqlalchemy import select
@@ -104,12 +199,20 @@ async def get_data_item(
     
     # Проверка прав доступа: пользователь может видеть только свои данные, админ - все
     # owner_id хранится как username (для упрощения)
-    if current_user.get("role") != "admin" and str(item.owner_id) != current_user.get("username"):
+    if not policy.allows(
+        "data", "GET", "/data/{item_id}",
+        current_user.get("role"), current_user.get("username"), owner=item.owner_id
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
     
+    etag = item_etag(item.id, item.updated_at)
+    if if_none_match_satisfied(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    response.headers["ETag"] = etag
     return DataItemResponse(
         id=item.id,
         title=item.title,
@@ -122,6 +225,7 @@ async def get_data_item(
 @app.post("/data", response_model=DataItemResponse, status_code=status.HTTP_201_CREATED)
 async def create_data_item(
     item: DataItemCreate,
+    response: Response,
     current_user: dict = Depends(get_current_user_from_token),
     db: AsyncSession = Depends(get_db)
 ):
@@ -136,6 +240,7 @@ async def create_data_item(
     await db.commit()
     await db.refresh(new_item)
     
+    response.headers["ETag"] = item_etag(new_item.id, new_item.updated_at)
     return DataItemResponse(
         id=new_item.id,
         title=new_item.title,
@@ -149,8 +254,10 @@ async def create_data_item(
 async def update_data_item(
     item_id: int,
     item_update: DataItemUpdate,
+    response: Response,
     current_user: dict = Depends(get_current_user_from_token),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    if_match: Optional[str] = Header(None)
 ):
     """Обновление элемента данных"""
     from sqlalchemy import select
@@ -164,12 +271,22 @@ async def update_data_item(
         )
     
     # Проверка прав доступа
-    if current_user.get("role") != "admin" and str(item.owner_id) != current_user.get("username"):
+    if not policy.allows(
+        "data", "PUT", "/data/{item_id}",
+        current_user.get("role"), current_user.get("username"), owner=item.owner_id
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
     
+    # Условное обновление: клиент изменяет только ту версию, которую видел
+    if not if_match_satisfied(if_match, item_etag(item.id, item.updated_at)):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Item has been modified"
+        )
+    
     if item_update.title is not None:
         item.title = item_update.title
     if item_update.content is not None:
@@ -180,6 +297,7 @@ async def update_data_item(
     await db.commit()
     await db.refresh(item)
     
+    response.headers["ETag"] = item_etag(item.id, item.updated_at)
     return DataItemResponse(
         id=item.id,
         title=item.title,
@@ -196,7 +314,7 @@ async def delete_data_item(
     db: AsyncSession = Depends(get_db)
 ):
     """Удаление элемента данных (только для админов)"""
-    if current_user.get("role") != "admin":
+    if not policy.allows("data", "DELETE", "/data/{item_id}", current_user.get("role")):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can delete items"
@@ -0,0 +1,84 @@
+# Общий модуль: правится в shared/, копии в сервисах обновляет scripts/sync_shared.py
+"""Микро-пакетирование проверок токенов: POST /verify-tokens в Auth Service"""
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+
+class BatchVerificationError(Exception):
+    """Пакетный запрос к Auth Service не выполнен"""
+
+
+class TokenBatcher:
+    """Накопление параллельных проверок в течение max_delay и отправка одним запросом"""
+
+    def __init__(
+        self,
+        get_client: Callable[[], httpx.AsyncClient],
+        max_batch_size: int = 100,
+        max_delay: float = 0.005
+    ):
+        self._get_client = get_client
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._pending: List[Tuple[Dict[str, str], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.batches = 0
+        self.tokens = 0
+        self.failures = 0
+
+    async def verify(self, token: str, token_type: str = "jwt") -> dict:
+        """Результат проверки токена: {"valid": bool, ...} (BatchVerificationError при сбое)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(({"token": token, "type": token_type}, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[Dict[str, str], asyncio.Future]]):
+        self.batches += 1
+        self.tokens += len(batch)
+        try:
+            response = await self._get_client().post(
+                "/verify-tokens", json={"tokens": [item for item, _ in batch]}
+            )
+            response.raise_for_status()
+            results = response.json()["results"]
+            if len(results) != len(batch):
+                raise ValueError("Result count mismatch")
+        except (httpx.HTTPError, ValueError, KeyError, TypeError) as e:
+            self.failures += 1
+            error = BatchVerificationError(f"Auth service unavailable: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for (_, future), result in zip(batch, results):
+            # Ожидающий мог быть отменён
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "tokens": self.tokens,
+            "failures": self.failures,
+            "avg_batch_size": round(self.tokens / self.batches, 2) if self.batches else 0.0,
+        }
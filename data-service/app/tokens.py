@@ -0,0 +1,271 @@
+# Общий модуль: правится в shared/, копии в сервисах обновляет scripts/sync_shared.py
+"""Общий кодек JWT (EdDSA) для всех сервисов
+
+Ключи передаются уже разобранными объектами cryptography, разбор заголовков
+кешируется, проверка claims выполняется с заранее вычисленными leeway и
+правилами audience/issuer. Повторная проверка того же токена не выполняет
+проверку подписи заново (ограниченный кеш до exp, только с тем же ключом). Ошибки - подклассы jwt.PyJWTError.
+Бенчмарк: python -m app.tokens (в API Gateway - python -m app.utils.tokens)
+"""
+import base64
+import binascii
+import calendar
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import jwt
+from cryptography.exceptions import InvalidSignature
+
+ALGORITHM = "EdDSA"
+
+JWT_ISSUER = os.getenv("JWT_ISSUER", "msa-auth-service")
+JWT_AUDIENCE = os.getenv("JWT_AUDIENCE", "msa-services")
+JWT_LEEWAY_SECONDS = float(os.getenv("JWT_LEEWAY_SECONDS", "10"))
+JWT_VERIFIED_CACHE_SIZE = int(os.getenv("JWT_VERIFIED_CACHE_SIZE", "4096"))
+
+_MAX_HEADER_SEGMENT = 512
+_TIME_CLAIMS = ("exp", "nbf", "iat")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(segment: str) -> bytes:
+    try:
+        return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+    except (binascii.Error, ValueError):
+        raise jwt.DecodeError("Invalid base64 segment")
+
+
+@lru_cache(maxsize=256)
+def _parse_header(segment: str) -> Dict[str, Any]:
+    """Разбор заголовка токена; у токенов одного ключа заголовок одинаковый"""
+    try:
+        header = json.loads(_b64decode(segment))
+    except ValueError:
+        raise jwt.DecodeError("Invalid header")
+    if not isinstance(header, dict):
+        raise jwt.DecodeError("Invalid header")
+    return header
+
+
+def _numeric_date(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return calendar.timegm(value.utctimetuple())
+    return value
+
+
+class TokenCodec:
+    """Кодирование и проверка JWT с заранее подготовленными параметрами"""
+
+    def __init__(
+        self,
+        issuer: Optional[str] = JWT_ISSUER,
+        audience: Optional[str] = JWT_AUDIENCE,
+        leeway: float = JWT_LEEWAY_SECONDS,
+        required: Iterable[str] = ("exp", "sub"),
+        cache_size: int = JWT_VERIFIED_CACHE_SIZE
+    ):
+        self.issuer = issuer or None
+        self.audience = audience or None
+        self.leeway = leeway
+        self.required = tuple(required)
+        self.cache_size = cache_size
+        self._header_segments: Dict[str, str] = {}
+        # token -> (payload, exp, ключ проверки): токены уже прошедшие проверку подписи и claims
+        self._verified: "OrderedDict[str, Tuple[Dict[str, Any], float, Any]]" = OrderedDict()
+
+    def clear_cache(self):
+        """Сброс кеша проверенных токенов (вызывается при удалении ключей из набора)"""
+        self._verified.clear()
+
+    def _header_segment(self, kid: str) -> str:
+        segment = self._header_segments.get(kid)
+        if segment is None:
+            header = {"alg": ALGORITHM, "kid": kid, "typ": "JWT"}
+            segment = _b64encode(json.dumps(header, separators=(",", ":")).encode())
+            self._header_segments[kid] = segment
+        return segment
+
+    def encode(self, claims: Dict[str, Any], private_key: Any, kid: str) -> str:
+        """Подпись claims ключом Ed25519; iss/aud добавляются, если настроены"""
+        payload = {
+            key: _numeric_date(value) if key in _TIME_CLAIMS else value
+            for key, value in claims.items()
+        }
+        if self.issuer and "iss" not in payload:
+            payload["iss"] = self.issuer
+        if self.audience and "aud" not in payload:
+            payload["aud"] = self.audience
+
+        signing_input = (
+            self._header_segment(kid) + "." +
+            _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+        )
+        signature = private_key.sign(signing_input.encode("ascii"))
+        return signing_input + "." + _b64encode(signature)
+
+    @staticmethod
+    def get_header(token: str) -> Dict[str, Any]:
+        """Заголовок без проверки подписи (результат кешируется, не изменять)"""
+        header_segment, sep, _ = token.partition(".")
+        if not sep or len(header_segment) > _MAX_HEADER_SEGMENT:
+            raise jwt.DecodeError("Invalid token header")
+        return _parse_header(header_segment)
+
+    @staticmethod
+    def get_unverified_claims(token: str) -> Dict[str, Any]:
+        """Payload без проверки подписи (только для токенов из собственного хранилища)"""
+        try:
+            payload = json.loads(_b64decode(token.split(".")[1]))
+        except (IndexError, ValueError):
+            raise jwt.DecodeError("Invalid payload")
+        if not isinstance(payload, dict):
+            raise jwt.DecodeError("Invalid payload")
+        return payload
+
+    def decode(self, token: str, public_key: Any) -> Dict[str, Any]:
+        """Проверка подписи и claims, возвращает payload (не изменять)"""
+        cached = self._verified.get(token)
+        # Результат действителен только для того же ключа: другой ключ - полная проверка
+        if cached is not None and cached[2] is public_key:
+            payload, exp, _ = cached
+            if exp > time.time() - self.leeway:
+                return payload
+            self._verified.pop(token, None)
+            raise jwt.ExpiredSignatureError("Signature has expired")
+
+        try:
+            signing_input, signature_segment = token.rsplit(".", 1)
+            header_segment, payload_segment = signing_input.split(".")
+        except ValueError:
+            raise jwt.DecodeError("Not enough segments")
+
+        if len(header_segment) > _MAX_HEADER_SEGMENT:
+            raise jwt.DecodeError("Invalid token header")
+        if _parse_header(header_segment).get("alg") != ALGORITHM:
+            raise jwt.InvalidAlgorithmError("The specified alg value is not allowed")
+
+        try:
+            public_key.verify(_b64decode(signature_segment), signing_input.encode("ascii"))
+        except (InvalidSignature, UnicodeEncodeError):
+            raise jwt.InvalidSignatureError("Signature verification failed")
+
+        try:
+            payload = json.loads(_b64decode(payload_segment))
+        except ValueError:
+            raise jwt.DecodeError("Invalid payload")
+        if not isinstance(payload, dict):
+            raise jwt.DecodeError("Invalid payload")
+
+        self._validate_claims(payload)
+        if self.cache_size > 0 and isinstance(payload.get("exp"), (int, float)):
+            self._verified[token] = (payload, payload["exp"], public_key)
+            if len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return payload
+
+    def _validate_claims(self, payload: Dict[str, Any]):
+        for claim in self.required:
+            if payload.get(claim) is None:
+                raise jwt.MissingRequiredClaimError(claim)
+
+        now = time.time()
+        exp = payload.get("exp")
+        if exp is not None:
+            if not isinstance(exp, (int, float)):
+                raise jwt.DecodeError("Expiration Time claim (exp) must be a number")
+            if exp <= now - self.leeway:
+                raise jwt.ExpiredSignatureError("Signature has expired")
+        nbf = payload.get("nbf")
+        if nbf is not None:
+            if not isinstance(nbf, (int, float)):
+                raise jwt.DecodeError("Not Before claim (nbf) must be a number")
+            if nbf > now + self.leeway:
+                raise jwt.ImmatureSignatureError("The token is not yet valid (nbf)")
+
+        if self.issuer is not None and payload.get("iss") != self.issuer:
+            raise jwt.InvalidIssuerError("Invalid issuer")
+        if self.audience is not None:
+            aud = payload.get("aud")
+            if aud is None:
+                raise jwt.MissingRequiredClaimError("aud")
+            if aud != self.audience and (not isinstance(aud, list) or self.audience not in aud):
+                raise jwt.InvalidAudienceError("Invalid audience")
+
+
+codec = TokenCodec()
+
+# Динамические токены ZTNA: своя audience, поэтому не принимаются как access токены
+ZTNA_AUDIENCE = os.getenv("ZTNA_AUDIENCE", "msa-ztna")
+ztna_codec = TokenCodec(audience=ZTNA_AUDIENCE, required=("exp", "sub", "jti"))
+
+
+def benchmark(iterations: int = 20000):
+    """Сравнение пропускной способности кодека с PyJWT и прежним путём python-jose (HS256)"""
+    from datetime import timedelta
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+    private_key = Ed25519PrivateKey.generate()
+    public_key = private_key.public_key()
+    claims = {"sub": "admin", "role": "admin"}
+
+    def exp():
+        return datetime.utcnow() + timedelta(minutes=30)
+
+    def measure(name: str, encode, decode):
+        token = encode()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            encode()
+        encode_rate = iterations / (time.perf_counter() - start)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            decode(token)
+        decode_rate = iterations / (time.perf_counter() - start)
+        print(f"{name:<30} encode {encode_rate:>10.0f}/s   decode {decode_rate:>10.0f}/s")
+
+    uncached = TokenCodec(cache_size=0)
+    measure(
+        "TokenCodec EdDSA",
+        lambda: uncached.encode({**claims, "exp": exp()}, private_key, "bench"),
+        lambda token: uncached.decode(token, public_key)
+    )
+    cached = TokenCodec()
+    measure(
+        "TokenCodec EdDSA (повторный)",
+        lambda: cached.encode({**claims, "exp": exp()}, private_key, "bench"),
+        lambda token: cached.decode(token, public_key)
+    )
+    measure(
+        "PyJWT EdDSA",
+        lambda: jwt.encode(
+            {**claims, "exp": exp(), "iss": codec.issuer, "aud": codec.audience},
+            private_key, algorithm=ALGORITHM, headers={"kid": "bench"}
+        ),
+        lambda token: jwt.decode(
+            token, public_key, algorithms=[ALGORITHM],
+            audience=codec.audience, issuer=codec.issuer, leeway=codec.leeway
+        )
+    )
+    try:
+        from jose import jwt as jose_jwt
+    except ImportError:
+        print("python-jose не установлен, сравнение с прежним путём пропущено")
+        return
+    secret = "benchmark-secret"
+    measure(
+        "python-jose HS256 (прежний)",
+        lambda: jose_jwt.encode({**claims, "exp": exp()}, secret, algorithm="HS256"),
+        lambda token: jose_jwt.decode(token, secret, algorithms=["HS256"])
+    )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,32 +1,50 @@
-"""Утилиты для работы с Auth Service"""
-import httpx
-import os
+"""Утилиты для работы с Auth Service и ETag"""
+import hashlib
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Tuple
 
-AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8001")
+from .auth_client import auth_client
 
 async def verify_jwt_token_from_auth_service(token: str) -> dict:
-    """Проверка JWT токена через Auth Service"""
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{AUTH_SERVICE_URL}/verify-token",
-                json={"token": token},
-                timeout=5.0
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            if not data.get("valid"):
-                raise Exception("Invalid token")
-            
-            payload = data.get("payload", {})
-            return {
-                "username": payload.get("sub"),
-                "role": payload.get("role"),
-                "user_id": payload.get("sub")  # Используем username как user_id для упрощения
-            }
-        except httpx.RequestError as e:
-            raise Exception(f"Auth service unavailable: {str(e)}")
-        except httpx.HTTPStatusError as e:
-            raise Exception(f"Auth service error: {str(e)}")
+    """Проверка JWT токена через Auth Service (пул соединений + кеш результатов)"""
+    return await auth_client.verify(token)
 
+_EPOCH = datetime(1970, 1, 1)
+
+def _version_stamp(updated_at: Optional[datetime]) -> str:
+    """Версия записи по времени последнего изменения (микросекунды)"""
+    if updated_at is None:
+        return "0"
+    return format((updated_at.replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1), "x")
+
+def item_etag(item_id: int, updated_at: Optional[datetime]) -> str:
+    """Strong ETag элемента данных: id + updated_at"""
+    return f'"{item_id}-{_version_stamp(updated_at)}"'
+
+def collection_etag(versions: Iterable[Tuple[int, Optional[datetime]]], skip: int, limit: int) -> str:
+    """Strong ETag страницы списка по (id, updated_at) всех элементов"""
+    digest = hashlib.sha1(f"{skip}:{limit}".encode())
+    for item_id, updated_at in versions:
+        digest.update(f"|{item_id}-{_version_stamp(updated_at)}".encode())
+    return f'"{digest.hexdigest()}"'
+
+def _etag_values(header: str):
+    return [value.strip() for value in header.split(",") if value.strip()]
+
+def if_none_match_satisfied(header: Optional[str], etag: str) -> bool:
+    """If-None-Match: слабое сравнение (304, если клиент уже имеет эту версию)"""
+    if not header:
+        return False
+    for value in _etag_values(header):
+        if value == "*" or value.removeprefix("W/") == etag:
+            return True
+    return False
+
+def if_match_satisfied(header: Optional[str], etag: str) -> bool:
+    """If-Match: сильное сравнение, weak ETag никогда не совпадает"""
+    if header is None:
+        return True
+    for value in _etag_values(header):
+        if value == "*" or value == etag:
+            return True
+    return False
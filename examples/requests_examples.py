@@ -7,6 +7,7 @@ import json
 import time
 import hmac
 import hashlib
+import secrets
 import base64
 from datetime import datetime
 
@@ -94,10 +95,12 @@ secret_key = api_key_data.get("secret_key")
 print(f"\nAPI Key ID: {key_id}")
 print(f"Secret Key: {secret_key}")
 
-# Создание HMAC подписи
+# Создание HMAC подписи (протокол v2: X-API-Nonce обязателен, подписывается
+# timestamp + key_id + nonce; каждый nonce принимается один раз)
 print("\n2.2. Создание HMAC подписи для запроса")
 timestamp = str(int(time.time()))
-message = f"{timestamp}{key_id}"
+nonce = secrets.token_hex(16)
+message = f"{timestamp}{key_id}{nonce}"
 signature = hmac.new(
     secret_key.encode(),
     message.encode(),
@@ -111,7 +114,8 @@ print("\n2.3. Проверка API ключа с HMAC")
 hmac_headers = {
     "X-API-Key-ID": key_id,
     "X-API-Signature": signature,
-    "X-API-Timestamp": timestamp
+    "X-API-Timestamp": timestamp,
+    "X-API-Nonce": nonce
 }
 response = requests.post(
     f"{AUTH_URL}/verify-api-key",
@@ -119,6 +123,40 @@ response = requests.post(
 )
 print_response("Проверка API ключа", response)
 
+# Повтор того же запроса отклоняется (401 Replayed request)
+response = requests.post(
+    f"{AUTH_URL}/verify-api-key",
+    headers=hmac_headers
+)
+print_response("Повтор подписанного запроса", response)
+
+# Подпись запроса через API Gateway: производный ключ подписи, подписываются
+# метод, путь, query, timestamp, key_id, nonce и тело
+print("\n2.4. Подписанный запрос через API Gateway")
+signing_key = hmac.new(
+    secret_key.encode(),
+    b"msa-gateway-request-signing-v1",
+    hashlib.sha256
+).hexdigest()
+body = json.dumps({"title": "Signed Item", "content": "Signed content"}).encode()
+timestamp = str(int(time.time()))
+nonce = secrets.token_hex(16)
+canonical = f"POST\n/data/data\n\n{timestamp}\n{key_id}\n{nonce}\n".encode()
+signature = hmac.new(signing_key.encode(), canonical + body, hashlib.sha256).hexdigest()
+response = requests.post(
+    f"{DATA_URL}/data",
+    data=body,
+    headers={
+        **headers,
+        "Content-Type": "application/json",
+        "X-API-Key-ID": key_id,
+        "X-API-Timestamp": timestamp,
+        "X-API-Nonce": nonce,
+        "X-API-Signature": signature
+    }
+)
+print_response("Подписанный запрос через шлюз", response)
+
 # ============================================
 # 3. Динамические токены (ZTNA)
 # ============================================
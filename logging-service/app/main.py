@@ -12,6 +12,7 @@ import json
 from .models import AuditLog, Base
 from .schemas import AuditLogCreate, AuditLogResponse, LogQuery
 from .database import get_db, init_db
+from .identity import verify_gateway_identity, require_signing_key
 
 app = FastAPI(
     title="Logging Service",
@@ -29,6 +30,7 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def startup():
+    require_signing_key()
     await init_db()
 
 @app.get("/health")
@@ -39,9 +41,16 @@ async def health():
 @app.post("/logs", status_code=status.HTTP_201_CREATED)
 async def create_log(
     log_data: AuditLogCreate,
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
     """Создание новой записи аудита"""
+    # Пользователь из подписанных API Gateway заголовков имеет приоритет над телом
+    identity = verify_gateway_identity(request)
+    if identity is not None:
+        log_data.user_id = identity["user_id"]
+        log_data.user_role = identity["role"]
+    
     log = AuditLog(
         service=log_data.service,
         endpoint=log_data.endpoint,
@@ -0,0 +1,76 @@
+"""Синхронизация общих модулей из shared/ в сервисы
+
+Каждый сервис собирается из своего каталога (Docker context), поэтому общие
+модули лежат в сервисах копиями. Правится только исходник в shared/, затем:
+
+    python scripts/sync_shared.py          # обновить копии
+    python scripts/sync_shared.py --check  # проверить, что копии совпадают (CI, tests/unit)
+"""
+import os
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHARED_DIR = os.path.join(ROOT, "shared")
+
+# Каталог пакета сервиса -> общие модули в нём
+TARGETS: Dict[str, List[str]] = {
+    "api-gateway/app/utils": [
+        "bloom.py", "identity.py", "jwks.py", "nonce_store.py", "policy.py",
+        "token_batcher.py", "token_revocation.py", "tokens.py",
+    ],
+    "auth-service/app": ["bloom.py", "identity.py", "nonce_store.py", "policy.py", "tokens.py"],
+    "data-service/app": [
+        "bloom.py", "identity.py", "jwks.py", "policy.py",
+        "token_batcher.py", "token_revocation.py", "tokens.py",
+    ],
+    "logging-service/app": ["identity.py"],
+}
+
+
+def _read(path: str) -> bytes:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return b""
+
+
+def outdated_copies() -> List[str]:
+    """Копии, отличающиеся от исходника (пути относительно корня репозитория)"""
+    result = []
+    for target, modules in TARGETS.items():
+        for module in modules:
+            source = _read(os.path.join(SHARED_DIR, module))
+            copy_path = os.path.join(ROOT, target, module)
+            if _read(copy_path) != source:
+                result.append(os.path.relpath(copy_path, ROOT))
+    return result
+
+
+def sync() -> List[str]:
+    updated = outdated_copies()
+    for copy_path in updated:
+        module = os.path.basename(copy_path)
+        with open(os.path.join(SHARED_DIR, module), "rb") as f:
+            source = f.read()
+        with open(os.path.join(ROOT, copy_path), "wb") as f:
+            f.write(source)
+    return updated
+
+
+def main(argv: List[str]) -> int:
+    if "--check" in argv:
+        outdated = outdated_copies()
+        for copy_path in outdated:
+            print(f"outdated: {copy_path}")
+        if outdated:
+            print("run: python scripts/sync_shared.py")
+        return 1 if outdated else 0
+    for copy_path in sync():
+        print(f"updated: {copy_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
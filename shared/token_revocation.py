@@ -0,0 +1,150 @@
+# Общий модуль: правится в shared/, копии в сервисах обновляет scripts/sync_shared.py
+"""Проверка отзыва access токенов по фильтру Блума из Auth Service
+
+Фильтр загружается целиком один раз (и при смене поколения), затем
+опрашиваются только добавленные jti; без изменений Auth Service отвечает 304.
+jti, которого нет в фильтре, точно не отозван - проверка без запросов.
+Совпадение уточняется точным запросом; ответ запоминается до следующего
+добавления этого jti в фильтр. Пока фильтр не получен или не обновлялся
+дольше max_age, каждый jti проверяется точным запросом (недоступность
+Auth Service - отказ).
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import httpx
+
+from .bloom import BloomFilter
+
+
+class RevocationFilter:
+    def __init__(
+        self,
+        auth_service_url: str,
+        refresh_interval: float = 5.0,
+        max_age: float = 30.0,
+        checked_cache_size: int = 1024
+    ):
+        self.auth_service_url = auth_service_url
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.checked_cache_size = checked_cache_size
+        self._filter: Optional[BloomFilter] = None
+        self._generation: Optional[str] = None
+        self._version: Optional[int] = None
+        # jti -> результат точной проверки (совпадения фильтра)
+        self._checked: "OrderedDict[str, bool]" = OrderedDict()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self.last_success = 0.0
+        self.lookups = 0
+        self.filter_hits = 0
+        self.exact_checks = 0
+        self.stale_checks = 0
+        self.revoked = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.auth_service_url, timeout=5.0)
+        return self._client
+
+    async def refresh(self) -> bool:
+        params = {}
+        if self._generation is not None:
+            params = {"generation": self._generation, "since": self._version}
+        try:
+            response = await self._get_client().get("/revocations", params=params)
+        except httpx.RequestError:
+            return False
+
+        if response.status_code == 304:
+            self.last_success = time.time()
+            return True
+        if response.status_code != 200:
+            return False
+        try:
+            data = response.json()
+            if "filter" in data:
+                bloom = BloomFilter.from_dict(data["filter"])
+                self._filter = bloom
+                self._checked.clear()
+            elif data.get("generation") == self._generation and self._filter is not None:
+                for jti in data["added"]:
+                    self._filter.add(jti)
+                    self._checked.pop(jti, None)  # Прежний ответ "не отозван" устарел
+            else:
+                return False
+            self._generation = data["generation"]
+            self._version = int(data["version"])
+        except (ValueError, KeyError, TypeError):
+            return False
+        self.last_success = time.time()
+        return True
+
+    async def start(self):
+        await self.refresh()
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    def is_fresh(self) -> bool:
+        return self._filter is not None and time.time() - self.last_success <= self.max_age
+
+    async def is_revoked(self, jti: Any) -> bool:
+        """Фильтр не получен или устарел - точная проверка в Auth Service"""
+        if not jti:
+            return False
+        self.lookups += 1
+        if not self.is_fresh():
+            # Запомненные ответы не используются: добавления в фильтр не приходят
+            self.stale_checks += 1
+            revoked = await self._exact_check(jti)
+        elif jti not in self._filter:
+            return False
+        else:
+            self.filter_hits += 1
+            revoked = self._checked.get(jti)
+            if revoked is None:
+                revoked = await self._exact_check(jti)
+        if revoked:
+            self.revoked += 1
+        return revoked
+
+    async def _exact_check(self, jti: str) -> bool:
+        self.exact_checks += 1
+        try:
+            response = await self._get_client().get(f"/revocations/{jti}")
+            response.raise_for_status()
+            revoked = bool(response.json()["revoked"])
+        except (httpx.HTTPError, ValueError, KeyError):
+            return True  # Нет подтверждения, что токен не отозван - отказ
+        self._checked[jti] = revoked
+        if len(self._checked) > self.checked_cache_size:
+            self._checked.popitem(last=False)
+        return revoked
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "generation": self._generation,
+            "version": self._version,
+            "filter_entries": self._filter.count if self._filter is not None else 0,
+            "lookups": self.lookups,
+            "filter_hits": self.filter_hits,
+            "exact_checks": self.exact_checks,
+            "stale_checks": self.stale_checks,
+            "revoked": self.revoked,
+            "age_seconds": round(time.time() - self.last_success, 1) if self.last_success else -1,
+        }
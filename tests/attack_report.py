@@ -12,6 +12,9 @@
 
 import time
 import json
+import hmac
+import hashlib
+import secrets
 from statistics import mean
 from typing import Dict, List, Tuple
 
@@ -262,21 +265,33 @@ class AttackReportRunner:
         secret_key = key_data.get("secret_key")
 
         # 1) корректная подпись — не должна блокироваться
+        # (протокол v2: подписывается timestamp + key_id + X-API-Nonce)
         ts = str(int(time.time()))
-        msg = f"{ts}{key_id}"
-        sig = requests.utils.hashlib.sha256(secret_key.encode() + msg.encode()).hexdigest()
+        nonce = secrets.token_hex(16)
+        msg = f"{ts}{key_id}{nonce}"
+        sig = hmac.new(secret_key.encode(), msg.encode(), hashlib.sha256).hexdigest()
+        signed_headers = {
+            "X-API-Key-ID": key_id,
+            "X-API-Signature": sig,
+            "X-API-Timestamp": ts,
+            "X-API-Nonce": nonce,
+        }
 
         resp, t = self._timed_request(
             "POST",
             f"{AUTH_URL}/verify-api-key",
-            headers={
-                "X-API-Key-ID": key_id,
-                "X-API-Signature": sig,
-                "X-API-Timestamp": ts,
-            },
+            headers=signed_headers,
         )
         s.add(blocked=resp.status_code >= 400, elapsed_ms=t)
 
+        # 1a) повтор того же запроса — должен блокироваться
+        resp, t = self._timed_request(
+            "POST",
+            f"{AUTH_URL}/verify-api-key",
+            headers=signed_headers,
+        )
+        s.add(blocked=resp.status_code == 401, elapsed_ms=t)
+
         # 2) неправильная подпись — должна блокироваться
         resp, t = self._timed_request(
             "POST",
@@ -285,14 +300,16 @@ class AttackReportRunner:
                 "X-API-Key-ID": key_id,
                 "X-API-Signature": "wrong_signature",
                 "X-API-Timestamp": ts,
+                "X-API-Nonce": secrets.token_hex(16),
             },
         )
         s.add(blocked=resp.status_code == 401, elapsed_ms=t)
 
         # 3) устаревший timestamp — должна блокироваться
         old_ts = str(int(time.time()) - 400)
-        old_msg = f"{old_ts}{key_id}"
-        old_sig = requests.utils.hashlib.sha256(secret_key.encode() + old_msg.encode()).hexdigest()
+        old_nonce = secrets.token_hex(16)
+        old_msg = f"{old_ts}{key_id}{old_nonce}"
+        old_sig = hmac.new(secret_key.encode(), old_msg.encode(), hashlib.sha256).hexdigest()
 
         resp, t = self._timed_request(
             "POST",
@@ -301,6 +318,7 @@ class AttackReportRunner:
                 "X-API-Key-ID": key_id,
                 "X-API-Signature": old_sig,
                 "X-API-Timestamp": old_ts,
+                "X-API-Nonce": old_nonce,
             },
         )
         s.add(blocked=resp.status_code == 401, elapsed_ms=t)
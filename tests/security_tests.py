@@ -7,6 +7,7 @@ import time
 import hmac
 import hashlib
 import json
+import secrets
 from typing import Dict, List, Tuple
 
 GATEWAY_URL = "http://localhost:8000"
@@ -252,22 +253,25 @@ class SecurityTests:
                 f"Key ID: {key_id[:20]}..."
             )
             
-            # 5.2. Проверка с правильной HMAC подписью
+            # 5.2. Проверка с правильной HMAC подписью (протокол v2: с X-API-Nonce)
             timestamp = str(int(time.time()))
-            message = f"{timestamp}{key_id}"
+            nonce = secrets.token_hex(16)
+            message = f"{timestamp}{key_id}{nonce}"
             signature = hmac.new(
                 secret_key.encode(),
                 message.encode(),
                 hashlib.sha256
             ).hexdigest()
+            signed_headers = {
+                "X-API-Key-ID": key_id,
+                "X-API-Signature": signature,
+                "X-API-Timestamp": timestamp,
+                "X-API-Nonce": nonce
+            }
             
             verify_response = requests.post(
                 f"{AUTH_URL}/verify-api-key",
-                headers={
-                    "X-API-Key-ID": key_id,
-                    "X-API-Signature": signature,
-                    "X-API-Timestamp": timestamp
-                }
+                headers=signed_headers
             )
             
             self.log_test(
@@ -276,13 +280,38 @@ class SecurityTests:
                 f"Status: {verify_response.status_code}"
             )
             
+            # Повтор того же запроса
+            replay_response = requests.post(
+                f"{AUTH_URL}/verify-api-key",
+                headers=signed_headers
+            )
+            
+            self.log_test(
+                "5.2.1. Повтор подписанного запроса отклоняется",
+                replay_response.status_code == 401,
+                f"Status: {replay_response.status_code}"
+            )
+            
+            # Запрос без nonce
+            no_nonce_response = requests.post(
+                f"{AUTH_URL}/verify-api-key",
+                headers={k: v for k, v in signed_headers.items() if k != "X-API-Nonce"}
+            )
+            
+            self.log_test(
+                "5.2.2. Запрос без X-API-Nonce отклоняется",
+                no_nonce_response.status_code == 400,
+                f"Status: {no_nonce_response.status_code}"
+            )
+            
             # 5.3. Проверка с неправильной подписью
             wrong_response = requests.post(
                 f"{AUTH_URL}/verify-api-key",
                 headers={
                     "X-API-Key-ID": key_id,
                     "X-API-Signature": "wrong_signature",
-                    "X-API-Timestamp": timestamp
+                    "X-API-Timestamp": timestamp,
+                    "X-API-Nonce": secrets.token_hex(16)
                 }
             )
             
@@ -294,7 +323,8 @@ class SecurityTests:
             
             # 5.4. Проверка истёкшего timestamp
             old_timestamp = str(int(time.time()) - 400)  # 400 секунд назад
-            old_message = f"{old_timestamp}{key_id}"
+            old_nonce = secrets.token_hex(16)
+            old_message = f"{old_timestamp}{key_id}{old_nonce}"
             old_signature = hmac.new(
                 secret_key.encode(),
                 old_message.encode(),
@@ -306,7 +336,8 @@ class SecurityTests:
                 headers={
                     "X-API-Key-ID": key_id,
                     "X-API-Signature": old_signature,
-                    "X-API-Timestamp": old_timestamp
+                    "X-API-Timestamp": old_timestamp,
+                    "X-API-Nonce": old_nonce
                 }
             )
             
@@ -0,0 +1,196 @@
+"""Общие фикстуры unit тестов сервисов
+
+Каждый сервис - пакет app с относительными импортами. Чтобы загрузить все
+сервисы в один процесс, пакеты подключаются символическими ссылками под
+уникальными именами (gateway_app, auth_app, data_app, logging_app); так их
+импортируют и дочерние процессы (пул массового хеширования запускается
+через spawn). Исходящие запросы httpx.AsyncClient уходят в MockUpstream.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+WORKDIR = tempfile.mkdtemp(prefix="msa-unit-")
+
+os.environ.update({
+    "INTERNAL_SIGNING_KEY": "unit-tests-internal-signing-key-0123456789",
+    "JWT_KEYS_DIR": os.path.join(WORKDIR, "jwt_keys"),
+    "PASSWORD_HASH_ROUNDS": "4",  # Без калибровки: тесты не измеряют стоимость хеша
+    "BULK_HASH_PROCESSES": "2",
+    "CLIENT_SECRET_PEPPER": "unit-tests-client-secret-pepper-0123456789",
+})
+# Базы SQLite сервисов создаются в текущем каталоге
+os.chdir(WORKDIR)
+
+_PACKAGES = {
+    "gateway_app": "api-gateway",
+    "auth_app": "auth-service",
+    "data_app": "data-service",
+    "logging_app": "logging-service",
+}
+_packages_dir = os.path.join(WORKDIR, "packages")
+os.makedirs(_packages_dir)
+for _name, _service in _PACKAGES.items():
+    os.symlink(os.path.join(ROOT, _service, "app"), os.path.join(_packages_dir, _name))
+sys.path.insert(0, _packages_dir)
+
+AUTH_HOST = "auth-service"
+ISSUER = "msa-auth-service"
+AUDIENCE = "msa-services"
+
+Handler = Callable[[httpx.Request], httpx.Response]
+EMPTY_REVOCATIONS = {
+    "generation": "unit", "version": 0,
+    "filter": {"size": 8, "hashes": 1, "count": 0, "bits": "AA=="},
+}
+
+
+class MockUpstream:
+    """Обработчики исходящих запросов по (host, path); без обработчика - 404"""
+
+    def __init__(self):
+        self.handlers: Dict[Tuple[str, Optional[str]], Handler] = {}
+        self.requests: List[httpx.Request] = []
+        self._default()
+
+    def _default(self):
+        self.handlers.clear()
+        self.route(AUTH_HOST, "/.well-known/jwks.json", lambda request: httpx.Response(200, json=JWKS))
+        self.route("logging-service", "/logs", lambda request: httpx.Response(201, json={}))
+        # Пустой фильтр отзыва: без него сервисы проверяют каждый jti точным запросом
+        self.route(AUTH_HOST, "/revocations", lambda request: httpx.Response(200, json=EMPTY_REVOCATIONS))
+
+    def route(self, host: str, path: Optional[str], handler: Handler):
+        """path=None - все пути хоста"""
+        self.handlers[(host, path)] = handler
+
+    def reset(self):
+        self._default()
+        self.requests.clear()
+
+    def calls(self, host: str, path: Optional[str] = None) -> List[httpx.Request]:
+        return [
+            r for r in self.requests
+            if r.url.host == host and (path is None or r.url.path == path)
+        ]
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        handler = self.handlers.get((request.url.host, request.url.path))
+        if handler is None:
+            handler = self.handlers.get((request.url.host, None))
+        if handler is None:
+            return httpx.Response(404)
+        return handler(request)
+
+
+upstream = MockUpstream()
+
+
+class _MockedAsyncClient(httpx.AsyncClient):
+    def __init__(self, *args, **kwargs):
+        kwargs["transport"] = httpx.MockTransport(upstream)
+        super().__init__(*args, **kwargs)
+
+
+httpx.AsyncClient = _MockedAsyncClient
+
+# Ключ "Auth Service" для сервисов, проверяющих JWT локально по JWKS
+import jwt  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey  # noqa: E402
+from jwt.algorithms import OKPAlgorithm  # noqa: E402
+
+_SIGNING_KEY = Ed25519PrivateKey.generate()
+_jwk = json.loads(OKPAlgorithm.to_jwk(_SIGNING_KEY.public_key()))
+_jwk.update({"kid": "unit-k1", "alg": "EdDSA", "use": "sig"})
+JWKS = {"keys": [_jwk]}
+
+
+def issue_token(sub: str, role: str = "user", ttl: int = 600, **claims) -> str:
+    """Access токен, подписанный ключом из JWKS MockUpstream"""
+    payload = {
+        "sub": sub, "role": role, "iss": ISSUER, "aud": AUDIENCE,
+        "exp": int(time.time()) + ttl, "jti": os.urandom(8).hex(), **claims,
+    }
+    return jwt.encode(payload, _SIGNING_KEY, algorithm="EdDSA", headers={"kid": "unit-k1"})
+
+
+def bearer(sub: str, role: str = "user") -> Dict[str, str]:
+    return {"Authorization": f"Bearer {issue_token(sub, role)}"}
+
+
+@pytest.fixture(autouse=True)
+def _reset_upstream():
+    yield upstream
+    upstream.reset()
+
+
+@pytest.fixture
+def mock_upstream() -> MockUpstream:
+    return upstream
+
+
+def _start(app):
+    from fastapi.testclient import TestClient
+    client = TestClient(app)
+    client.__enter__()
+    return client
+
+
+@pytest.fixture(scope="session")
+def gateway():
+    import gateway_app.main as main
+    main.limiter.enabled = False  # 5 запросов в секунду на IP мешают тестам
+    client = _start(main.app)
+    yield SimpleNamespace(main=main, client=client)
+    client.__exit__(None, None, None)
+
+
+@pytest.fixture(scope="session")
+def auth():
+    import auth_app.main as main
+    client = _start(main.app)
+
+    def login(username: str = "admin", password: str = "admin123") -> dict:
+        response = client.post("/token", data={"username": username, "password": password})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    def headers(username: str = "admin", password: str = "admin123") -> Dict[str, str]:
+        return {"Authorization": f"Bearer {login(username, password)['access_token']}"}
+
+    def register(username: str, password: str = "password123", **fields) -> dict:
+        body = {"username": username, "email": f"{username}@example.com", "password": password, **fields}
+        response = client.post("/register", json=body)
+        assert response.status_code == 201, response.text
+        return response.json()
+
+    yield SimpleNamespace(
+        main=main, client=client, login=login, headers=headers, register=register,
+        run=client.portal.call  # Корутина в event loop сервиса (БД, фоновые задачи)
+    )
+    client.__exit__(None, None, None)
+
+
+@pytest.fixture(scope="session")
+def data():
+    import data_app.main as main
+    client = _start(main.app)
+    yield SimpleNamespace(main=main, client=client)
+    client.__exit__(None, None, None)
+
+
+@pytest.fixture(scope="session")
+def logging_service():
+    import logging_app.main as main
+    client = _start(main.app)
+    yield SimpleNamespace(main=main, client=client)
+    client.__exit__(None, None, None)
@@ -0,0 +1,63 @@
+"""Кеш API ключей с подготовленным HMAC контекстом (user-041)"""
+import hashlib
+import hmac
+import secrets
+import time
+from types import SimpleNamespace
+
+from auth_app.api_key_cache import APIKeyCache, CachedAPIKey
+
+
+def _verify(auth, key):
+    timestamp = str(int(time.time()))
+    nonce = secrets.token_hex(16)
+    message = f"{timestamp}{key['key_id']}{nonce}".encode()
+    return auth.client.post("/verify-api-key", headers={
+        "X-API-Key-ID": key["key_id"],
+        "X-API-Signature": hmac.new(key["secret_key"].encode(), message, hashlib.sha256).hexdigest(),
+        "X-API-Timestamp": timestamp,
+        "X-API-Nonce": nonce,
+    })
+
+
+def test_prepared_context_matches_hmac_new():
+    cached = CachedAPIKey("kid", "secret", 1, ["read"], float("inf"))
+
+    for message in (b"first", b"second", b"first"):
+        expected = hmac.new(b"secret", message, hashlib.sha256).hexdigest()
+        assert cached.signature(message) == expected
+        assert cached.verify(message, expected)
+    assert not cached.verify(b"first", "0" * 64)
+
+
+def test_invalidate_drops_entry():
+    cache = APIKeyCache(ttl=30, max_entries=10)
+    cache.put(SimpleNamespace(key_id="kid", secret_key="secret", user_id=1, permissions=["read"]))
+
+    assert cache.get("kid").user_id == 1
+    cache.invalidate("kid")
+    assert cache.get("kid") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_repeated_verification_hits_cache(auth):
+    headers = auth.headers()
+    key = auth.client.post("/api-keys", json={"name": "cache-hit"}, headers=headers).json()
+    before = auth.client.get("/metrics").json()["api_key_cache"]
+
+    assert _verify(auth, key).json()["valid"] is True
+    assert _verify(auth, key).json()["valid"] is True
+
+    after = auth.client.get("/metrics").json()["api_key_cache"]
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+
+
+def test_deleted_key_is_not_served_from_cache(auth):
+    headers = auth.headers()
+    key = auth.client.post("/api-keys", json={"name": "cache-delete"}, headers=headers).json()
+    assert _verify(auth, key).status_code == 200
+
+    assert auth.client.delete(f"/api-keys/{key['key_id']}", headers=headers).status_code == 204
+
+    assert _verify(auth, key).status_code == 401
@@ -0,0 +1,126 @@
+"""Пул соединений и кеш проверок токенов Data Service (user-032)"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from data_app import auth_client as auth_client_module
+from data_app.auth_client import AuthClient, AuthServiceUnavailableError, InvalidTokenError
+
+from conftest import AUTH_HOST
+
+
+def _verify_tokens(request):
+    tokens = json.loads(request.content)["tokens"]
+    return httpx.Response(200, json={"results": [
+        {"valid": True, "payload": {"sub": item["token"], "role": "user", "exp": time.time() + 600}}
+        if item["token"].startswith("good") else {"valid": False}
+        for item in tokens
+    ]})
+
+
+def _run(scenario):
+    async def wrapper():
+        client = AuthClient()
+        try:
+            return await scenario(client)
+        finally:
+            await client.close()
+    return asyncio.run(wrapper())
+
+
+def test_repeated_token_is_served_from_cache(mock_upstream):
+    mock_upstream.route(AUTH_HOST, "/verify-tokens", _verify_tokens)
+
+    async def scenario(client):
+        first = await client.verify("good-1")
+        second = await client.verify("good-1")
+        return first, second, client.stats()
+
+    first, second, stats = _run(scenario)
+    assert first == second == {"username": "good-1", "role": "user", "user_id": "good-1"}
+    assert len(mock_upstream.calls(AUTH_HOST, "/verify-tokens")) == 1
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_concurrent_checks_share_one_batched_request(mock_upstream):
+    mock_upstream.route(AUTH_HOST, "/verify-tokens", _verify_tokens)
+
+    async def scenario(client):
+        tokens = ["good-a", "good-a", "good-b", "good-c"]
+        return await asyncio.gather(*(client.verify(token) for token in tokens)), client.stats()
+
+    results, stats = _run(scenario)
+    assert [user["username"] for user in results] == ["good-a", "good-a", "good-b", "good-c"]
+    requests = mock_upstream.calls(AUTH_HOST, "/verify-tokens")
+    assert len(requests) == 1
+    assert len(json.loads(requests[0].content)["tokens"]) == 3
+    assert stats["coalesced"] == 1
+
+
+def test_invalid_token_is_cached_negatively(mock_upstream):
+    mock_upstream.route(AUTH_HOST, "/verify-tokens", _verify_tokens)
+
+    async def scenario(client):
+        for _ in range(2):
+            with pytest.raises(InvalidTokenError):
+                await client.verify("bad-token")
+
+    _run(scenario)
+    assert len(mock_upstream.calls(AUTH_HOST, "/verify-tokens")) == 1
+
+
+def test_outage_fails_closed_by_default(mock_upstream):
+    mock_upstream.route(AUTH_HOST, "/verify-tokens", lambda request: httpx.Response(503))
+
+    async def scenario(client):
+        with pytest.raises(AuthServiceUnavailableError):
+            await client.verify("good-outage")
+
+    _run(scenario)
+
+
+def test_stale_policy_uses_last_verdict_during_outage(mock_upstream, monkeypatch):
+    monkeypatch.setattr(auth_client_module, "AUTH_FAILURE_POLICY", "stale")
+    mock_upstream.route(AUTH_HOST, "/verify-tokens", _verify_tokens)
+
+    async def scenario(client):
+        await client.verify("good-stale")
+        for verdict in client._cache.values():
+            verdict.expires_at = time.time() - 1
+        mock_upstream.route(AUTH_HOST, "/verify-tokens", lambda request: httpx.Response(503))
+        return await client.verify("good-stale"), client.stats()
+
+    user, stats = _run(scenario)
+    assert user["username"] == "good-stale"
+    assert stats["stale_hits"] == 1
+
+
+def test_cached_token_is_rejected_after_revocation(mock_upstream):
+    def verify_tokens(request):
+        item = json.loads(request.content)["tokens"][0]
+        return httpx.Response(200, json={"results": [
+            {"valid": True, "payload": {"sub": "alice", "role": "user", "jti": item["token"], "exp": time.time() + 600}}
+        ]})
+
+    mock_upstream.route(AUTH_HOST, "/verify-tokens", verify_tokens)
+
+    class Revocations:
+        revoked = set()
+
+        async def is_revoked(self, jti):
+            return jti in self.revoked
+
+    async def scenario(client):
+        client.revocations = Revocations()
+        await client.verify("jti-1")
+        client.revocations.revoked.add("jti-1")
+        with pytest.raises(InvalidTokenError):
+            await client.verify("jti-1")
+        return client.stats()
+
+    stats = _run(scenario)
+    assert stats["revoked"] == 1
+    assert stats["entries"] == 0
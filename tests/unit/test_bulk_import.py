@@ -0,0 +1,67 @@
+"""Массовый импорт пользователей с параллельным хешированием (user-050)"""
+import asyncio
+import json
+
+from auth_app.bulk_import import iter_json_array
+
+
+def _import(auth, body, content_type, headers=None):
+    return auth.client.post(
+        "/users/bulk", content=body, headers={**(headers or auth.headers()), "Content-Type": content_type}
+    )
+
+
+def _user(name, **fields):
+    return {"username": name, "email": f"{name}@example.com", "password": f"{name}-password", **fields}
+
+
+def test_ndjson_report_has_row_per_input(auth):
+    rows = [
+        json.dumps(_user("bulk-a")),
+        json.dumps({"username": "bulk-incomplete"}),
+        json.dumps(_user("bulk-a", email="other@example.com")),
+        json.dumps(_user("admin", email="bulk-admin@example.com")),
+        "{broken",
+        "",
+        json.dumps(_user("bulk-service", role="service")),
+        json.dumps(_user("bulk-b")),
+    ]
+
+    response = _import(auth, "\n".join(rows).encode(), "application/x-ndjson")
+
+    assert response.status_code == 200
+    report = response.json()
+    statuses = {result["row"]: result["status"] for result in report["results"]}
+    assert statuses == {1: "created", 2: "invalid", 3: "duplicate", 4: "exists", 5: "invalid", 7: "invalid", 8: "created"}
+    assert (report["created"], report["failed"], report["aborted"]) == (2, 5, None)
+    # Пароли захешированы в пуле процессов и принимаются при входе
+    auth.login("bulk-b", "bulk-b-password")
+
+
+def test_json_array_keeps_rows_before_syntax_error(auth):
+    body = json.dumps([_user("bulk-json-a"), _user("bulk-json-b")])[:-1] + ", {bad"
+
+    report = _import(auth, body.encode(), "application/json").json()
+
+    assert report["created"] == 2
+    assert report["aborted"].startswith("Malformed JSON")
+    auth.login("bulk-json-a", "bulk-json-a-password")
+
+
+def test_json_array_is_parsed_incrementally():
+    items = [{"n": i, "text": "ä" * i} for i in range(5)]
+    body = json.dumps(items).encode()
+
+    async def chunks():
+        for start in range(0, len(body), 3):
+            yield body[start:start + 3]
+
+    async def collect():
+        return [item async for item in iter_json_array(chunks())]
+
+    assert asyncio.run(collect()) == list(enumerate(items, start=1))
+
+
+def test_only_admins_with_supported_body_import(auth):
+    assert _import(auth, b"[]", "application/json", auth.headers("user", "user123")).status_code == 403
+    assert _import(auth, b"[]", "text/csv").status_code == 415
@@ -0,0 +1,75 @@
+"""Client credentials grant для сервисных аккаунтов (user-039)"""
+import jwt
+import pytest
+
+from auth_app import utils
+
+
+def _client(auth, scopes=("data:read", "data:write")):
+    response = auth.client.post(
+        "/service-clients", json={"name": "reporting", "scopes": list(scopes)}, headers=auth.headers()
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def _token(auth, client, **form):
+    return auth.client.post("/token/client", data={
+        "grant_type": "client_credentials",
+        "client_id": client["client_id"],
+        "client_secret": client["client_secret"],
+        **form,
+    })
+
+
+def test_client_gets_service_token_with_scope(auth):
+    client = _client(auth)
+
+    response = _token(auth, client, scope="data:read")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["scope"] == "data:read"
+    claims = jwt.decode(body["access_token"], options={"verify_signature": False})
+    assert claims["sub"] == f"service:{client['client_id']}"
+    assert claims["role"] == "service"
+
+
+def test_wrong_secret_scope_or_grant_is_rejected(auth):
+    client = _client(auth)
+
+    assert _token(auth, {**client, "client_secret": "wrong"}).status_code == 401
+    assert _token(auth, client, scope="admin").status_code == 400
+    assert _token(auth, client, grant_type="password").status_code == 400
+
+
+def test_only_admins_register_clients(auth):
+    response = auth.client.post(
+        "/service-clients", json={"name": "x", "scopes": []}, headers=auth.headers("user", "user123")
+    )
+    assert response.status_code == 403
+
+
+def test_service_token_is_not_a_user_session(auth):
+    token = _token(auth, _client(auth)).json()["access_token"]
+
+    response = auth.client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 401
+
+
+def test_usernames_cannot_impersonate_service_subjects(auth):
+    client_id = _client(auth)["client_id"]
+    for username in (client_id, f"service:{client_id}"):
+        response = auth.client.post(
+            "/register", json={"username": username, "email": "svc@example.com", "password": "password123"}
+        )
+        assert response.status_code == 422
+
+
+@pytest.mark.parametrize("value", ["", "short", "client-secret-pepper-change-in-production"])
+def test_auth_service_refuses_default_pepper(monkeypatch, value):
+    monkeypatch.setattr(utils, "CLIENT_SECRET_PEPPER", value)
+
+    with pytest.raises(RuntimeError):
+        utils.require_client_secret_pepper()
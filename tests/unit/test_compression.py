@@ -0,0 +1,76 @@
+"""Согласованное сжатие ответов в API Gateway (user-029)"""
+import json
+
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from gateway_app.middleware.compression import CompressionMiddleware, negotiate_encoding
+
+PAYLOAD = json.dumps([{"id": i, "title": "item"} for i in range(200)]).encode()
+
+_app = FastAPI()
+_app.add_middleware(CompressionMiddleware)
+
+
+@_app.get("/json")
+async def json_body():
+    return Response(PAYLOAD, media_type="application/json", headers={"ETag": '"v1"'})
+
+
+@_app.get("/small")
+async def small_body():
+    return Response(b'{"ok": true}', media_type="application/json")
+
+
+@_app.get("/image")
+async def image_body():
+    return Response(b"\x89PNG" + b"\x00" * 4096, media_type="image/png")
+
+
+@_app.get("/stream")
+async def stream_body():
+    async def chunks():
+        for start in range(0, len(PAYLOAD), 512):
+            yield PAYLOAD[start:start + 512]
+    return StreamingResponse(chunks(), media_type="application/json")
+
+
+client = TestClient(_app)
+
+
+def test_negotiation_respects_q_values_and_server_order():
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0.5, deflate") == "deflate"
+    assert negotiate_encoding("gzip;q=0, br") is None
+    assert negotiate_encoding("*") in ("zstd", "gzip")
+    assert negotiate_encoding("") is None
+
+
+def test_json_is_compressed_and_etag_weakened():
+    response = client.get("/json", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.content == PAYLOAD
+    assert response.num_bytes_downloaded < len(PAYLOAD) / 2
+
+
+def test_streamed_body_is_compressed_incrementally():
+    response = client.get("/stream", headers={"Accept-Encoding": "deflate"})
+
+    assert response.headers["content-encoding"] == "deflate"
+    assert "content-length" not in response.headers
+    assert response.content == PAYLOAD
+
+
+def test_small_and_precompressed_bodies_pass_through():
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    image = client.get("/image", headers={"Accept-Encoding": "gzip"})
+    plain = client.get("/json", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in image.headers
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] == '"v1"'
@@ -0,0 +1,50 @@
+"""ETag и условные запросы в Data Service (user-030)"""
+from conftest import bearer
+
+
+def _create(data, headers, title="etag item"):
+    response = data.client.post("/data", json={"title": title, "content": "v1"}, headers=headers)
+    assert response.status_code in (200, 201), response.text
+    return response.json()["id"], response.headers["etag"]
+
+
+def test_get_item_with_current_etag_returns_304(data):
+    headers = bearer("etag-owner")
+    item_id, etag = _create(data, headers)
+
+    response = data.client.get(f"/data/{item_id}", headers=headers)
+    assert response.headers["etag"] == etag
+
+    not_modified = data.client.get(f"/data/{item_id}", headers={**headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+
+def test_update_requires_matching_if_match(data):
+    headers = bearer("etag-writer")
+    item_id, etag = _create(data, headers)
+
+    updated = data.client.put(
+        f"/data/{item_id}", json={"content": "v2"}, headers={**headers, "If-Match": etag}
+    )
+    assert updated.status_code == 200
+    assert updated.headers["etag"] != etag
+
+    # Вторая запись по устаревшей версии не затирает первую
+    lost_update = data.client.put(
+        f"/data/{item_id}", json={"content": "v3"}, headers={**headers, "If-Match": etag}
+    )
+    assert lost_update.status_code == 412
+    assert data.client.get(f"/data/{item_id}", headers=headers).json()["content"] == "v2"
+
+
+def test_collection_etag_changes_with_contents(data):
+    headers = bearer("etag-admin", "admin")
+    etag = data.client.get("/data", headers=headers).headers["etag"]
+
+    assert data.client.get("/data", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    _create(data, headers, title="another")
+    changed = data.client.get("/data", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
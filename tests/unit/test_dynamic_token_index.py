@@ -0,0 +1,91 @@
+"""Индекс динамических ZTNA токенов в памяти (user-045)"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from auth_app.database import async_session
+from auth_app.dynamic_token_index import DynamicTokenIndex, IndexedToken, dynamic_token_index
+from auth_app.models import DynamicToken
+from auth_app.tokens import ztna_codec
+from auth_app.ztna_revocation import revoked_tokens
+
+
+def _create(auth):
+    return auth.client.post("/dynamic-tokens", headers=auth.headers()).json()["token"]
+
+
+def _verify(auth, token):
+    return auth.client.post("/verify-dynamic-token", json={"token": token})
+
+
+def _set_active(auth, token, is_active):
+    async def query():
+        async with async_session() as session:
+            await session.execute(update(DynamicToken).where(DynamicToken.token == token).values(is_active=is_active))
+            await session.commit()
+    auth.run(query)
+
+
+def _row(auth, token):
+    async def query():
+        async with async_session() as session:
+            result = await session.execute(select(DynamicToken.id, DynamicToken.is_active).where(DynamicToken.token == token))
+            return result.one()
+    return auth.run(query)
+
+
+def test_new_token_is_verified_from_index(auth):
+    token = _create(auth)
+    before = dynamic_token_index.stats()
+
+    assert _verify(auth, token).json()["valid"] is True
+
+    after = dynamic_token_index.stats()
+    assert after["hits"] - before["hits"] == 1
+    assert after["db_fallbacks"] == before["db_fallbacks"]
+
+
+def test_unknown_token_is_rejected_without_db(auth):
+    before = dynamic_token_index.stats()
+
+    assert _verify(auth, "unknown-dynamic-token").status_code == 401
+    assert dynamic_token_index.stats()["db_fallbacks"] == before["db_fallbacks"]
+
+
+def test_expired_tokens_are_deactivated_in_bulk(auth):
+    token = _create(auth)
+    token_id, _ = _row(auth, token)
+    index = DynamicTokenIndex()
+    index._loaded = True
+    index._add(IndexedToken(token_id, token, 1, datetime.utcnow() - timedelta(seconds=1)))
+    index._add(IndexedToken(-1, "future", 1, datetime.utcnow() + timedelta(hours=1)))
+
+    index._expire_due(datetime.utcnow())
+    auth.run(index.flush_expired)
+
+    assert index.stats()["expired"] == 1
+    assert index.stats()["tokens"] == 1
+    assert _row(auth, token).is_active is False
+
+
+def test_revocation_on_other_instance_is_picked_up_by_sync(auth):
+    token = _create(auth)
+    assert _verify(auth, token).status_code == 200
+    _set_active(auth, token, False)
+
+    # До синхронизации индекс доверяет себе
+    assert _verify(auth, token).status_code == 200
+    auth.run(dynamic_token_index.sync)
+
+    assert _verify(auth, token).status_code == 401
+    assert ztna_codec.get_unverified_claims(token)["jti"] in revoked_tokens
+
+
+def test_token_created_on_other_instance_is_picked_up_by_sync(auth):
+    token = _create(auth)
+    dynamic_token_index.remove(token)  # Как если бы токен создал другой экземпляр
+    assert _verify(auth, token).status_code == 401
+
+    auth.run(dynamic_token_index.sync)
+
+    assert _verify(auth, token).status_code == 200
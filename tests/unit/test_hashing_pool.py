@@ -0,0 +1,57 @@
+"""Неблокирующий пул хеширования паролей (user-036)"""
+import asyncio
+import time
+
+import pytest
+
+from auth_app import hashing
+from auth_app.hashing import HashingOverloadedError, HashingPool
+
+
+def test_hashing_does_not_block_event_loop():
+    async def scenario():
+        pool = HashingPool(workers=2, max_queue=4)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        await asyncio.gather(pool.run(time.sleep, 0.2), pool.run(time.sleep, 0.2))
+        task.cancel()
+        pool.shutdown()
+        return ticks, pool.stats()
+
+    ticks, stats = asyncio.run(scenario())
+    assert ticks >= 10
+    assert stats["completed"] == 2
+    assert stats["hash_latency"]["max_ms"] >= 200
+
+
+def test_full_queue_fails_fast():
+    async def scenario():
+        pool = HashingPool(workers=1, max_queue=1)
+        running = [asyncio.ensure_future(pool.run(time.sleep, 0.1)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(HashingOverloadedError):
+            await pool.run(time.sleep, 0.1)
+        await asyncio.gather(*running)
+        pool.shutdown()
+        return pool.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+
+
+def test_login_returns_503_with_retry_after_when_overloaded(auth, monkeypatch):
+    pool = auth.main.hashing_pool
+    monkeypatch.setattr(pool, "max_queue", -pool.workers)
+
+    response = auth.client.post("/token", data={"username": "user", "password": "user123"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(hashing.HASH_RETRY_AFTER_SECONDS)
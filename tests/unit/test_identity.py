@@ -0,0 +1,51 @@
+"""Подписанная передача идентичности от шлюза во внутренние сервисы (user-031)"""
+import time
+
+import httpx
+
+from data_app.identity import identity_signature, sign_identity_headers
+
+from conftest import bearer
+
+
+def test_service_trusts_signed_identity_without_jwt(data):
+    headers = sign_identity_headers("identity-alice", "user", "POST", "/data")
+
+    response = data.client.post("/data", json={"title": "t", "content": "c"}, headers=headers)
+
+    assert response.status_code in (200, 201)
+    assert response.json()["owner_id"] == "identity-alice"
+
+
+def test_tampered_or_replayed_identity_is_rejected(data):
+    headers = sign_identity_headers("identity-bob", "user", "GET", "/data")
+
+    escalated = {**headers, "x-identity-role": "admin"}
+    assert data.client.get("/data", headers=escalated).status_code == 401
+
+    # Подпись привязана к методу и пути
+    assert data.client.delete("/data/1", headers=headers).status_code == 401
+
+    old = str(int(time.time()) - 3600)
+    stale = {
+        **headers,
+        "x-identity-timestamp": old,
+        "x-identity-signature": identity_signature("identity-bob", "user", old, "GET", "/data"),
+    }
+    assert data.client.get("/data", headers=stale).status_code == 401
+
+
+def test_gateway_replaces_client_identity_headers(gateway, mock_upstream):
+    mock_upstream.route("data-service", "/profile", lambda request: httpx.Response(200, json={}))
+    forged = sign_identity_headers("admin", "admin", "GET", "/profile")
+    forged["x-identity-signature"] = "0" * 64
+
+    response = gateway.client.get("/data/profile", headers={**bearer("identity-carol"), **forged})
+
+    assert response.status_code == 200
+    sent = mock_upstream.calls("data-service", "/profile")[-1].headers
+    assert sent["x-identity-subject"] == "identity-carol"
+    assert sent["x-identity-role"] == "user"
+    assert sent["x-identity-signature"] == identity_signature(
+        "identity-carol", "user", sent["x-identity-timestamp"], "GET", "/profile"
+    )
@@ -0,0 +1,86 @@
+"""Асимметричная подпись JWT, JWKS и ротация ключей (user-033)"""
+import asyncio
+import json
+import time
+
+import httpx
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from jwt.algorithms import OKPAlgorithm
+
+from auth_app import keys as keys_module
+from auth_app.keys import KeyManager
+from gateway_app.utils.jwks import JWKSClient
+from gateway_app.utils.tokens import codec
+
+from conftest import AUTH_HOST
+
+JWKS_URL = f"http://{AUTH_HOST}:8001/.well-known/jwks.json"
+
+
+def _jwk(kid, private_key):
+    jwk = json.loads(OKPAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({"kid": kid, "alg": "EdDSA", "use": "sig"})
+    return jwk
+
+
+def test_services_verify_auth_tokens_with_published_jwks(auth, mock_upstream):
+    mock_upstream.route(
+        AUTH_HOST, "/.well-known/jwks.json",
+        lambda request: httpx.Response(200, content=auth.client.get("/.well-known/jwks.json").content)
+    )
+    token = auth.login()["access_token"]
+
+    async def scenario():
+        client = JWKSClient(JWKS_URL)
+        await client.refresh()
+        return await client.decode(token)
+
+    payload = asyncio.run(scenario())
+    assert payload["sub"] == "admin"
+    assert payload["role"] == "admin"
+    # Закрытого ключа в JWKS нет
+    assert all("d" not in jwk for jwk in auth.client.get("/.well-known/jwks.json").json()["keys"])
+
+
+def test_rotation_keeps_previous_key_for_retention_period(tmp_path, monkeypatch):
+    manager = KeyManager(str(tmp_path))
+    manager.load()
+    old = manager.active
+    new = manager.rotate()
+
+    assert manager.active is new
+    assert [k.kid for k in manager.published()] == [old.kid, new.kid]
+
+    monkeypatch.setattr(keys_module, "JWT_KEY_RETENTION_MINUTES", 0)
+    manager._prune()
+    assert [k.kid for k in manager.published()] == [new.kid]
+    assert manager.get_public_key(old.kid) is None
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f"{new.kid}.pem"]
+
+
+def test_client_picks_up_new_key_and_drops_removed_one(mock_upstream):
+    first, second = Ed25519PrivateKey.generate(), Ed25519PrivateKey.generate()
+    published = {"keys": [_jwk("first", first)]}
+    mock_upstream.route(AUTH_HOST, "/.well-known/jwks.json", lambda request: httpx.Response(200, json=published))
+    claims = {"sub": "rotating", "exp": int(time.time()) + 600}
+    old_token = codec.encode(claims, first, "first")
+    new_token = codec.encode(claims, second, "second")
+
+    async def scenario():
+        client = JWKSClient(JWKS_URL, min_refresh_interval=0)
+        await client.refresh()
+        assert (await client.decode(old_token))["sub"] == "rotating"
+
+        # Неизвестный kid - внеплановая загрузка JWKS
+        published["keys"].append(_jwk("second", second))
+        assert (await client.decode(new_token))["sub"] == "rotating"
+
+        # Ключ удалён из JWKS - токены, проверенные им ранее, больше не принимаются
+        published["keys"] = [_jwk("second", second)]
+        await client.refresh()
+        with pytest.raises(jwt.InvalidTokenError):
+            await client.decode(old_token)
+
+    asyncio.run(scenario())
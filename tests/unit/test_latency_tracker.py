@@ -0,0 +1,85 @@
+"""Адаптивные таймауты проксирования (user-026)"""
+import random
+
+import httpx
+import pytest
+
+from gateway_app.utils.latency_tracker import LatencyTracker, P2Quantile, route_template
+
+from conftest import bearer
+
+
+def test_p2_quantile_tracks_exact_percentiles():
+    rng = random.Random(26)
+    samples = [rng.lognormvariate(-3, 0.6) for _ in range(20000)]
+    ordered = sorted(samples)
+    for p in (0.5, 0.99):
+        estimator = P2Quantile(p)
+        for x in samples:
+            estimator.add(x)
+        exact = ordered[int(p * len(ordered))]
+        assert abs(estimator.value() - exact) / exact < 0.05
+
+
+def test_route_template_collapses_identifiers():
+    assert route_template("data/42") == "/data/{id}"
+    assert route_template("/users/6f1c2a7e-0b5d-4c1e-9a55-1f2e3d4c5b6a/keys") == "/users/{id}/keys"
+    assert route_template("users/me") == "/users/me"
+
+
+def test_timeout_follows_p99_per_method_and_route():
+    tracker = LatencyTracker(default_timeout=30.0, min_timeout=0.5, multiplier=3.0, min_samples=50)
+    assert tracker.get_timeout("data", "GET", "data/1") == 30.0
+
+    for i in range(200):
+        tracker.record("data", "GET", f"data/{i}", 0.2)
+    assert tracker.get_timeout("data", "GET", "data/7") == pytest.approx(0.6)
+    # Другой метод того же маршрута - своя статистика
+    assert tracker.get_timeout("data", "PUT", "data/7") == 30.0
+
+
+def test_timeouts_beyond_one_percent_restore_default():
+    tracker = LatencyTracker(default_timeout=30.0, min_timeout=0.5, min_samples=50)
+    for _ in range(100):
+        tracker.record("data", "GET", "data", 0.2)
+    tracker.record_timeout("data", "GET", "data")
+    assert tracker.get_timeout("data", "GET", "data") == pytest.approx(0.6)
+
+    for _ in range(5):
+        tracker.record_timeout("data", "GET", "data")
+    assert tracker.get_timeout("data", "GET", "data") == 30.0
+    assert tracker.snapshot("data")["GET /data"]["timeouts"] == 6
+
+
+def test_override_wins_over_statistics():
+    tracker = LatencyTracker(overrides={"data:POST /data": 7.0}, min_samples=1)
+    tracker.record("data", "POST", "data", 0.01)
+    assert tracker.get_timeout("data", "POST", "data") == 7.0
+
+
+def test_route_count_is_bounded():
+    tracker = LatencyTracker(min_samples=1, max_routes=3)
+    tracker.record("auth", "GET", "users/me", 0.1)
+    for name in ("alice", "bob", "carol", "dave"):
+        tracker.record("auth", "GET", "users/me", 0.1)  # Используемый маршрут не вытесняется
+        tracker.record("auth", "GET", f"users/{name}", 0.1)
+
+    routes = tracker.snapshot("auth")
+    assert len(routes) == 3
+    assert set(routes) == {"GET /users/me", "GET /users/carol", "GET /users/dave"}
+    assert tracker.evicted == 2
+
+
+def test_gateway_records_upstream_latency_and_timeouts(gateway, mock_upstream):
+    tracker = gateway.main.latency_tracker
+    mock_upstream.route("data-service", "/reports/1", lambda request: httpx.Response(200, json={}))
+
+    assert gateway.client.get("/data/reports/1", headers=bearer("alice")).status_code == 200
+    assert tracker.snapshot("data")["GET /reports/{id}"]["samples"] == 1
+
+    def timeout(request):
+        raise httpx.ReadTimeout("upstream too slow", request=request)
+
+    mock_upstream.route("data-service", "/reports/2", timeout)
+    assert gateway.client.get("/data/reports/2", headers=bearer("alice")).status_code == 504
+    assert tracker.snapshot("data")["GET /reports/{id}"]["timeouts"] == 1
@@ -0,0 +1,85 @@
+"""Хранилище nonce для защиты от повторов подписанных запросов (user-043)"""
+import asyncio
+import hashlib
+import hmac
+import secrets
+import time
+
+import pytest
+
+from auth_app import nonce_store as nonce_store_module
+from auth_app.nonce_store import BucketedNonceStore, create_nonce_store
+
+
+def _check(store, nonce, timestamp):
+    return asyncio.run(store.check_and_add(nonce, timestamp))
+
+
+@pytest.mark.parametrize("bloom_capacity", [None, 1000])
+def test_replay_is_detected(bloom_capacity):
+    store = BucketedNonceStore(window=300, bucket_seconds=30, bloom_capacity=bloom_capacity)
+    now = int(time.time())
+
+    assert _check(store, "key:nonce-1", now)
+    assert not _check(store, "key:nonce-1", now)
+    assert _check(store, "key:nonce-2", now)
+    assert store.stats()["accepted"] == 2 and store.stats()["replays"] == 1
+
+
+def test_timestamp_outside_window_is_rejected():
+    store = BucketedNonceStore(window=300, bucket_seconds=30)
+
+    assert not _check(store, "key:old", int(time.time()) - 301)
+    assert store.stats()["buckets"] == 0
+
+
+def test_expired_buckets_are_dropped(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(nonce_store_module.time, "time", lambda: now[0])
+    store = BucketedNonceStore(window=300, bucket_seconds=30)
+    _check(store, "key:a", int(now[0]))
+
+    now[0] += 400
+    _check(store, "key:b", int(now[0]))
+
+    assert store.stats()["buckets"] == 1
+    assert store.stats()["entries"] == 1
+
+
+def test_bloom_memory_does_not_grow_with_traffic():
+    store = BucketedNonceStore(window=300, bucket_seconds=30, bloom_capacity=10_000)
+    now = int(time.time())
+    _check(store, "key:first", now)
+    size = store.stats()["memory_bytes"]
+
+    for i in range(500):
+        _check(store, f"key:{i}", now)
+
+    assert store.stats()["memory_bytes"] == size
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_nonce_store("sqlite")
+
+
+def _verify(auth, key, nonce):
+    timestamp = str(int(time.time()))
+    message = f"{timestamp}{key['key_id']}{nonce}".encode()
+    return auth.client.post("/verify-api-key", headers={
+        "X-API-Key-ID": key["key_id"],
+        "X-API-Signature": hmac.new(key["secret_key"].encode(), message, hashlib.sha256).hexdigest(),
+        "X-API-Timestamp": timestamp,
+        "X-API-Nonce": nonce,
+    })
+
+
+def test_verify_api_key_requires_unique_nonce(auth):
+    key = auth.client.post("/api-keys", json={"name": "nonce"}, headers=auth.headers()).json()
+    nonce = secrets.token_hex(16)
+
+    assert _verify(auth, key, "").status_code == 400
+    assert _verify(auth, key, nonce).status_code == 200
+    replay = _verify(auth, key, nonce)
+    assert replay.status_code == 401
+    assert replay.json()["detail"] == "Replayed request"
@@ -0,0 +1,61 @@
+"""Схемы хеширования с калиброванной стоимостью и прозрачным пересчётом (user-037)"""
+from passlib.hash import bcrypt
+from sqlalchemy import select
+
+from auth_app import hashing
+from auth_app.database import async_session
+from auth_app.hashing import PasswordPolicy
+from auth_app.models import User
+
+
+def _bcrypt(password, rounds):
+    return bcrypt.using(rounds=rounds).hash(password)
+
+
+def test_configured_rounds_are_a_floor():
+    policy = PasswordPolicy(["bcrypt"], rounds=5)
+
+    assert policy.accepted_rounds() == (5, None)
+    verified, new_hash = policy.verify_and_update("secret", _bcrypt("secret", 4))
+    assert verified and new_hash.startswith("$2b$05$")
+    # Более дорогой хеш не ослабляется
+    assert policy.verify_and_update("secret", _bcrypt("secret", 6)) == (True, None)
+
+
+def test_calibrated_rounds_accept_a_band():
+    policy = PasswordPolicy(["bcrypt"], rounds=6)
+    policy.calibrated = True
+    policy.context = policy._build_context()
+
+    assert policy.accepted_rounds() == (5, 7)
+    for rounds in (5, 7):
+        assert policy.verify_and_update("secret", _bcrypt("secret", rounds)) == (True, None)
+    assert policy.verify_and_update("secret", _bcrypt("secret", 8))[1].startswith("$2b$06$")
+    assert policy.verify_and_update("secret", _bcrypt("secret", 4))[1].startswith("$2b$06$")
+
+
+def test_hash_of_deprecated_scheme_is_migrated():
+    policy = PasswordPolicy(["scrypt", "bcrypt"], rounds=10)
+
+    verified, new_hash = policy.verify_and_update("secret", _bcrypt("secret", 4))
+
+    assert verified
+    assert new_hash.startswith("$scrypt$")
+    assert policy.verify("secret", new_hash)
+    assert policy.verify_and_update("wrong", _bcrypt("secret", 4)) == (False, None)
+
+
+def test_login_stores_rehashed_password(auth, monkeypatch):
+    auth.register("rehash-user", "rehash-password")
+    monkeypatch.setattr(hashing, "password_policy", PasswordPolicy(["bcrypt"], rounds=5))
+
+    auth.login("rehash-user", "rehash-password")
+
+    async def stored_hash():
+        async with async_session() as session:
+            result = await session.execute(select(User.hashed_password).where(User.username == "rehash-user"))
+            return result.scalar_one()
+
+    assert auth.run(stored_hash).startswith("$2b$05$")
+    # Новый хеш принимается при следующем входе
+    auth.login("rehash-user", "rehash-password")
@@ -0,0 +1,72 @@
+"""Скомпилированная политика доступа (user-049)"""
+import httpx
+
+from gateway_app.utils.policy import RESOURCE_OWNER, CompiledPolicy, Rule, policy
+from data_app.identity import sign_identity_headers
+
+from conftest import AUTH_HOST, bearer
+
+
+def test_role_and_owner_decisions():
+    assert policy.allows("data", "DELETE", "/data/7", "admin")
+    assert not policy.allows("data", "DELETE", "/data/7", "user", "alice")
+    assert policy.allows("data", "PUT", "/data/7", "user", "alice", owner="alice")
+    assert not policy.allows("data", "PUT", "/data/7", "user", "alice", owner="bob")
+    assert not policy.allows("data", "PUT", "/data/7", "user", "alice")
+    # Маршрут без правила политикой не ограничивается
+    assert policy.allows("data", "GET", "/health", None)
+
+
+def test_static_route_wins_over_template():
+    assert policy.allows("auth", "GET", "/users/me", "user")
+    assert not policy.allows("auth", "GET", "/users/alice", "user", "alice")
+
+
+def test_precheck_leaves_resource_owner_to_service():
+    compiled = CompiledPolicy({"svc": [
+        Rule("GET", "/items/{item_id}", roles=("admin",), owner=RESOURCE_OWNER),
+        Rule("GET", "/users/{username}/keys", roles=("admin",), owner="username"),
+    ]})
+
+    assert compiled.precheck("svc", "GET", "/items/1", "user", "alice")
+    # Владелец в пути проверяется уже на шлюзе
+    assert compiled.precheck("svc", "GET", "/users/alice/keys", "user", "alice")
+    assert not compiled.precheck("svc", "GET", "/users/bob/keys", "user", "alice")
+
+
+def test_route_matches_are_cached():
+    compiled = CompiledPolicy({"svc": [Rule("GET", "/items/{item_id}", roles=("admin",))]})
+
+    for _ in range(3):
+        compiled.allows("svc", "GET", "/items/1", "user")
+
+    assert compiled.stats()["match_cache_misses"] == 1
+    assert compiled.stats()["match_cache_hits"] == 2
+
+
+def test_gateway_rejects_forbidden_request_at_edge(gateway, mock_upstream):
+    mock_upstream.route("data-service", None, lambda request: httpx.Response(204))
+
+    assert gateway.client.delete("/data/data/5", headers=bearer("policy-user")).status_code == 403
+    assert mock_upstream.calls("data-service") == []
+    assert gateway.client.delete("/data/data/5", headers=bearer("policy-admin", "admin")).status_code == 204
+    assert len(mock_upstream.calls("data-service")) == 1
+
+    mock_upstream.route(AUTH_HOST, "/keys/rotate", lambda request: httpx.Response(200, json={}))
+    assert gateway.client.post("/auth/keys/rotate", headers=bearer("policy-user")).status_code == 403
+    assert mock_upstream.calls(AUTH_HOST, "/keys/rotate") == []
+
+
+def test_service_enforces_resource_owner(data):
+    created = data.client.post(
+        "/data", json={"title": "mine", "content": "c"},
+        headers=sign_identity_headers("policy-alice", "user", "POST", "/data")
+    ).json()
+    path = f"/data/{created['id']}"
+
+    def get(subject, role="user"):
+        return data.client.get(path, headers=sign_identity_headers(subject, role, "GET", path))
+
+    assert get("policy-alice").status_code == 200
+    assert get("policy-bob").status_code == 403
+    assert get("policy-admin", "admin").status_code == 200
@@ -0,0 +1,43 @@
+"""Ротация refresh токенов с обнаружением повторного использования (user-038)"""
+
+
+def _refresh(auth, refresh_token):
+    return auth.client.post("/token/refresh", json={"refresh_token": refresh_token})
+
+
+def test_refresh_rotates_token(auth):
+    auth.register("refresh-rotate")
+    tokens = auth.login("refresh-rotate", "password123")
+
+    response = _refresh(auth, tokens["refresh_token"])
+
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    me = auth.client.get("/users/me", headers={"Authorization": f"Bearer {rotated['access_token']}"})
+    assert me.json()["username"] == "refresh-rotate"
+
+
+def test_reuse_revokes_whole_family(auth):
+    auth.register("refresh-reuse")
+    first = auth.login("refresh-reuse", "password123")["refresh_token"]
+    second = _refresh(auth, first).json()["refresh_token"]
+
+    # Повтор уже обменянного токена - признак кражи
+    assert _refresh(auth, first).status_code == 401
+    # Цепочка отозвана: и легитимный наследник больше не принимается
+    assert _refresh(auth, second).status_code == 401
+
+
+def test_other_families_are_not_affected(auth):
+    auth.register("refresh-families")
+    stolen = auth.login("refresh-families", "password123")["refresh_token"]
+    other = auth.login("refresh-families", "password123")["refresh_token"]
+    _refresh(auth, stolen)
+    _refresh(auth, stolen)
+
+    assert _refresh(auth, other).status_code == 200
+
+
+def test_unknown_token_is_rejected(auth):
+    assert _refresh(auth, "not-a-refresh-token").status_code == 401
@@ -0,0 +1,96 @@
+"""Объединение одинаковых параллельных GET запросов (user-028)"""
+import asyncio
+
+import pytest
+
+from gateway_app.utils.request_coalescer import RequestCoalescer
+
+
+def test_identical_concurrent_calls_run_once():
+    async def scenario():
+        coalescer = RequestCoalescer()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"calls": calls}
+
+        results = await asyncio.gather(*(coalescer.run("k", fetch) for _ in range(10)))
+        return coalescer, calls, results
+
+    coalescer, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(result == {"calls": 1} for result in results)
+    assert coalescer.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 9, "overflow": 0}
+
+
+def test_different_keys_and_later_calls_are_not_merged():
+    async def scenario():
+        coalescer = RequestCoalescer()
+        calls = []
+
+        async def fetch(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return key
+
+        await asyncio.gather(coalescer.run("a", lambda: fetch("a")), coalescer.run("b", lambda: fetch("b")))
+        await coalescer.run("a", lambda: fetch("a"))
+        return calls
+
+    assert asyncio.run(scenario()) == ["a", "b", "a"]
+
+
+def test_error_is_shared_by_all_waiters():
+    async def scenario():
+        coalescer = RequestCoalescer()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        return await asyncio.gather(*(coalescer.run("k", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_waiters_over_limit_run_separately():
+    async def scenario():
+        coalescer = RequestCoalescer(max_waiters=2)
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+
+        await asyncio.gather(*(coalescer.run("k", fetch) for _ in range(5)))
+        return coalescer, calls
+
+    coalescer, calls = asyncio.run(scenario())
+    assert calls == 3
+    assert coalescer.overflow == 2
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def scenario():
+        coalescer = RequestCoalescer()
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.ensure_future(coalescer.run("k", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(coalescer.run("k", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower, leader
+
+    result, leader = asyncio.run(scenario())
+    assert result == "done"
+    with pytest.raises(asyncio.CancelledError):
+        leader.result()
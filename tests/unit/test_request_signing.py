@@ -0,0 +1,209 @@
+"""Подпись запросов API ключами в API Gateway (user-042)"""
+import asyncio
+import hashlib
+import hmac
+import json
+import secrets
+import time
+
+import httpx
+import pytest
+
+from auth_app import identity as auth_identity
+from auth_app.identity import GATEWAY_SUBJECT, sign_identity_headers
+from gateway_app.middleware.waf import BodyBlockedError, scan_body_stream
+from gateway_app.utils.request_signing import APIKeyStore
+
+from conftest import AUTH_HOST, bearer
+
+BODY = json.dumps({"title": "signed", "content": "body"}).encode()
+
+
+def _key(mock_upstream, owner="alice"):
+    """Ключ, который Auth Service отдаёт шлюзу; key_id уникален - APIKeyStore кеширует ключи"""
+    key_id = secrets.token_hex(8)
+    signing_key = secrets.token_hex(32)
+    mock_upstream.route(AUTH_HOST, f"/internal/api-keys/{key_id}", lambda request: httpx.Response(200, json={
+        "key_id": key_id, "signing_key": signing_key, "username": owner, "user_id": 1, "permissions": ["read"],
+    }))
+    return key_id, signing_key
+
+
+def _signed(key, method="POST", path="/data/data", body=BODY, nonce=None, sub="alice"):
+    key_id, signing_key = key
+    timestamp = str(int(time.time()))
+    nonce = secrets.token_hex(16) if nonce is None else nonce
+    prefix = f"{method}\n{path}\n\n{timestamp}\n{key_id}\n{nonce}\n".encode()
+    headers = {
+        "X-API-Key-ID": key_id,
+        "X-API-Timestamp": timestamp,
+        "X-API-Nonce": nonce,
+        "X-API-Signature": hmac.new(signing_key.encode(), prefix + body, hashlib.sha256).hexdigest(),
+    }
+    if sub:
+        headers.update(bearer(sub))
+    return headers
+
+
+@pytest.fixture
+def data_upstream(mock_upstream):
+    mock_upstream.route("data-service", None, lambda request: httpx.Response(200, json={}))
+    return lambda: mock_upstream.calls("data-service")
+
+
+def test_signed_request_is_forwarded_once(gateway, mock_upstream, data_upstream):
+    key = _key(mock_upstream)
+    headers = _signed(key)
+
+    assert gateway.client.post("/data/data", content=BODY, headers=headers).status_code == 200
+    replay = gateway.client.post("/data/data", content=BODY, headers=headers)
+
+    assert replay.status_code == 401
+    assert replay.json()["detail"] == "Replayed request"
+    assert len(data_upstream()) == 1
+
+
+def test_bad_signature_never_reaches_upstream(gateway, mock_upstream, data_upstream):
+    key = _key(mock_upstream)
+    headers = _signed(key)
+
+    response = gateway.client.post("/data/data", content=BODY + b" ", headers=headers)
+
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Invalid request signature"
+    assert data_upstream() == []
+    # Nonce не израсходован неверной подписью
+    assert gateway.client.post("/data/data", content=BODY, headers=headers).status_code == 200
+
+
+def test_nonce_is_required(gateway, mock_upstream, data_upstream):
+    headers = _signed(_key(mock_upstream), nonce="")
+
+    assert gateway.client.post("/data/data", content=BODY, headers=headers).status_code == 400
+    assert data_upstream() == []
+
+
+def test_streamed_get_is_replay_protected(gateway, mock_upstream, data_upstream):
+    headers = _signed(_key(mock_upstream), method="GET", body=b"")
+
+    assert gateway.client.get("/data/data", headers=headers).status_code == 200
+    assert gateway.client.get("/data/data", headers=headers).status_code == 401
+
+
+def test_service_auth_requires_key_owner(gateway, mock_upstream):
+    mock_upstream.route(AUTH_HOST, "/api-keys", lambda request: httpx.Response(201, json={}))
+    key = _key(mock_upstream, owner="alice")
+
+    anonymous = _signed(key, path="/auth/api-keys", sub=None)
+    response = gateway.client.post("/auth/api-keys", content=BODY, headers=anonymous)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Authorization header required for signed requests"
+
+    foreign = _signed(key, path="/auth/api-keys", sub="bob")
+    assert gateway.client.post("/auth/api-keys", content=BODY, headers=foreign).status_code == 403
+    assert mock_upstream.calls(AUTH_HOST, "/api-keys") == []
+
+
+def test_oversized_signed_body_is_rejected(gateway, mock_upstream, data_upstream, monkeypatch):
+    monkeypatch.setattr(gateway.main.settings, "request_signing_max_body", len(BODY) - 1)
+
+    response = gateway.client.post("/data/data", content=BODY, headers=_signed(_key(mock_upstream)))
+
+    assert response.status_code == 413
+    assert data_upstream() == []
+
+
+def test_large_signed_upload_is_spooled_and_forwarded(gateway, mock_upstream, data_upstream, monkeypatch):
+    monkeypatch.setattr(gateway.main.settings, "request_signing_spool_memory", 64 * 1024)
+    body = b"0123456789abcdef" * (12 * 1024 * 1024 // 16)  # Больше прежнего предела 10 МиБ
+
+    response = gateway.client.post("/data/data", content=body, headers=_signed(_key(mock_upstream), body=body))
+
+    assert response.status_code == 200
+    assert data_upstream()[0].content == body
+
+
+def test_signed_upload_is_scanned_by_waf(gateway, mock_upstream, data_upstream):
+    body = b"x" * 100_000 + b"<script>alert(1)</script>"
+
+    response = gateway.client.post("/data/data", content=body, headers=_signed(_key(mock_upstream), body=body))
+
+    assert response.status_code == 403
+    assert data_upstream() == []
+
+
+def test_waf_scan_finds_pattern_split_between_chunks():
+    async def chunks():
+        yield b"a" * 1000 + b"<scr"
+        yield b"ipt>" + b"b" * 1000
+
+    async def consume():
+        return [chunk async for chunk in scan_body_stream(chunks())]
+
+    with pytest.raises(BodyBlockedError):
+        asyncio.run(consume())
+
+
+def test_auth_service_shares_only_derived_signing_key(auth):
+    headers = auth.headers()
+    key = auth.client.post("/api-keys", json={"name": "gateway"}, headers=headers).json()
+    path = f"/internal/api-keys/{key['key_id']}"
+
+    assert auth.client.get(path, headers=headers).status_code == 403
+    body = auth.client.get(path, headers=sign_identity_headers(GATEWAY_SUBJECT, "service", "GET", path)).json()
+
+    assert "secret_key" not in body
+    expected = hmac.new(key["secret_key"].encode(), b"msa-gateway-request-signing-v1", hashlib.sha256).hexdigest()
+    assert body["signing_key"] == expected
+
+
+def test_deleted_api_key_leaves_gateway_cache(auth, mock_upstream):
+    def forward(request):
+        response = auth.client.get(request.url.path, params=dict(request.url.params), headers=dict(request.headers))
+        return httpx.Response(response.status_code, content=response.content)
+
+    mock_upstream.route(AUTH_HOST, None, forward)
+    headers = auth.headers()
+    key_id = auth.client.post("/api-keys", json={"name": "deleted"}, headers=headers).json()["key_id"]
+
+    async def scenario():
+        store = APIKeyStore(f"http://{AUTH_HOST}", ttl=300.0)
+        try:
+            assert await store.refresh()
+            assert await store.get(key_id) is not None
+            assert await store.get(key_id) is not None
+            assert store.hits == 1
+
+            assert auth.client.delete(f"/api-keys/{key_id}", headers=headers).status_code in (200, 204)
+            assert await store.refresh()
+            assert store.deleted == 1
+            assert await store.get(key_id) is None
+        finally:
+            await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_stale_deletion_journal_bypasses_key_cache(mock_upstream):
+    key_id, _ = _key(mock_upstream)
+
+    async def scenario():
+        store = APIKeyStore(f"http://{AUTH_HOST}", ttl=300.0)
+        try:
+            assert not store.is_fresh()
+            await store.get(key_id)
+            await store.get(key_id)
+            assert store.hits == 0
+            assert len(mock_upstream.calls(AUTH_HOST, f"/internal/api-keys/{key_id}")) == 2
+        finally:
+            await store.close()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("value", ["", "short", "internal-signing-key-change-in-production"])
+def test_services_refuse_default_internal_key(monkeypatch, value):
+    monkeypatch.setattr(auth_identity, "INTERNAL_SIGNING_KEY", value)
+
+    with pytest.raises(RuntimeError):
+        auth_identity.require_signing_key()
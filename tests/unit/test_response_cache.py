@@ -0,0 +1,132 @@
+"""Кеш ответов GET маршрутов в API Gateway (user-027)"""
+import time
+
+import httpx
+
+from gateway_app.utils.response_cache import ResponseCache
+
+from conftest import bearer
+
+
+def _items(cache_control="max-age=60", etag='"v1"'):
+    def handler(request):
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"etag": etag, "cache-control": cache_control})
+        return httpx.Response(200, json=[{"id": 1}], headers={"etag": etag, "cache-control": cache_control})
+    return handler
+
+
+def _entry(gateway, subject):
+    key = ResponseCache.make_key("data", "GET", "data", "", subject, "user")
+    return gateway.main.response_cache.get(key)
+
+
+def _wait_background(gateway):
+    deadline = time.time() + 5
+    while gateway.main._background_tasks and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_fresh_entry_is_served_without_upstream(gateway, mock_upstream):
+    mock_upstream.route("data-service", "/data", _items())
+    headers = bearer("cache-fresh")
+
+    first = gateway.client.get("/data/data", headers=headers)
+    second = gateway.client.get("/data/data", headers=headers)
+
+    assert first.headers.get("x-cache") is None
+    assert second.headers["x-cache"] == "HIT"
+    assert second.json() == [{"id": 1}]
+    assert len(mock_upstream.calls("data-service", "/data")) == 1
+
+
+def test_cache_key_includes_subject(gateway, mock_upstream):
+    mock_upstream.route("data-service", "/data", _items())
+    gateway.client.get("/data/data", headers=bearer("cache-owner"))
+
+    response = gateway.client.get("/data/data", headers=bearer("cache-other"))
+
+    assert response.headers.get("x-cache") is None
+    assert len(mock_upstream.calls("data-service", "/data")) == 2
+
+
+def test_client_etag_gets_304_from_cache(gateway, mock_upstream):
+    mock_upstream.route("data-service", "/data", _items())
+    headers = bearer("cache-etag")
+    gateway.client.get("/data/data", headers=headers)
+
+    response = gateway.client.get("/data/data", headers={**headers, "If-None-Match": '"v1"'})
+
+    assert response.status_code == 304
+    assert response.headers["x-cache"] == "HIT"
+
+
+def test_stale_entry_is_served_and_revalidated_in_background(gateway, mock_upstream):
+    mock_upstream.route("data-service", "/data", _items())
+    headers = bearer("cache-swr")
+    gateway.client.get("/data/data", headers=headers)
+    entry = _entry(gateway, "cache-swr")
+    entry.stored_at -= entry.ttl + 1
+
+    response = gateway.client.get("/data/data", headers=headers)
+    _wait_background(gateway)
+
+    assert response.headers["x-cache"] == "STALE"
+    revalidation = mock_upstream.calls("data-service", "/data")[-1]
+    assert revalidation.headers["if-none-match"] == '"v1"'
+    assert _entry(gateway, "cache-swr").is_fresh(time.time())
+
+
+def test_stale_if_error_on_upstream_failure(gateway, mock_upstream):
+    mock_upstream.route("data-service", "/data", _items())
+    headers = bearer("cache-sie")
+    gateway.client.get("/data/data", headers=headers)
+    entry = _entry(gateway, "cache-sie")
+    entry.stored_at -= entry.ttl + entry.stale_while_revalidate + 1
+
+    mock_upstream.route("data-service", "/data", lambda request: httpx.Response(503))
+    response = gateway.client.get("/data/data", headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["x-cache"] == "STALE"
+
+
+def test_write_invalidates_resource(gateway, mock_upstream):
+    mock_upstream.route("data-service", "/data", _items())
+    headers = bearer("cache-write")
+    gateway.client.get("/data/data", headers=headers)
+
+    mock_upstream.route("data-service", "/data/1", lambda request: httpx.Response(200, json={"id": 1}))
+    assert gateway.client.put("/data/data/1", json={"title": "t"}, headers=headers).status_code == 200
+
+    assert _entry(gateway, "cache-write") is None
+
+
+def test_no_store_is_not_cached():
+    cache = ResponseCache(routes=["data:/data"])
+    key = cache.make_key("data", "GET", "data", "b=2&a=1", "alice", "user")
+    assert cache.store(key, 200, {"cache-control": "no-store"}, b"[]") is None
+    assert cache.make_key("data", "GET", "/data/", "a=1&b=2", "alice", "user") == key
+
+
+def test_entry_evicted_during_revalidation_is_refetched(gateway, mock_upstream):
+    headers = bearer("cache-evicted")
+    mock_upstream.route("data-service", "/data", _items())
+    gateway.client.get("/data/data", headers=headers)
+    entry = _entry(gateway, "cache-evicted")
+    entry.stored_at -= entry.ttl + entry.stale_while_revalidate + 1
+    revalidate = _items()
+
+    def evict_then_revalidate(request):
+        # Запись инвалидирована, пока шлюз ждал ответа на свой If-None-Match
+        gateway.main.response_cache.invalidate("data", "data")
+        return revalidate(request)
+
+    mock_upstream.route("data-service", "/data", evict_then_revalidate)
+    response = gateway.client.get("/data/data", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json() == [{"id": 1}]
+    calls = mock_upstream.calls("data-service", "/data")
+    assert calls[-2].headers["if-none-match"] == '"v1"'
+    assert "if-none-match" not in calls[-1].headers
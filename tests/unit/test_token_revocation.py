@@ -0,0 +1,99 @@
+"""Отзыв access токенов и синхронизация фильтра Блума (user-048)"""
+import asyncio
+
+import httpx
+import jwt
+
+from gateway_app.utils.token_revocation import RevocationFilter
+
+from conftest import AUTH_HOST
+
+
+def _jti(token):
+    return jwt.decode(token, options={"verify_signature": False})["jti"]
+
+
+def _revoke(auth, token, headers):
+    return auth.client.post("/token/revoke", json={"token": token}, headers=headers)
+
+
+def test_revoked_token_is_rejected_immediately(auth):
+    victim = auth.login()["access_token"]
+    session = auth.headers()
+
+    assert _revoke(auth, victim, auth.headers("user", "user123")).status_code == 403
+    assert _revoke(auth, victim, session).status_code == 204
+
+    assert auth.client.get("/users/me", headers={"Authorization": f"Bearer {victim}"}).status_code == 401
+    assert auth.client.get("/users/me", headers=session).status_code == 200
+
+
+def test_verifier_syncs_filter_by_delta(auth, mock_upstream):
+    responses = []
+
+    def forward(request):
+        response = auth.client.get(request.url.path, params=dict(request.url.params))
+        responses.append(response)
+        return httpx.Response(response.status_code, content=response.content)
+
+    mock_upstream.route(AUTH_HOST, None, forward)
+    mock_upstream.route(AUTH_HOST, "/revocations", forward)
+    first = auth.login()["access_token"]
+    second = auth.login()["access_token"]
+    session = auth.headers()
+    _revoke(auth, first, session)
+
+    async def scenario():
+        revocations = RevocationFilter(f"http://{AUTH_HOST}")
+        assert await revocations.refresh()
+        assert "filter" in responses[-1].json()
+        assert await revocations.is_revoked(_jti(first))
+        assert not await revocations.is_revoked(_jti(second))
+
+        # Без изменений - 304
+        assert await revocations.refresh()
+        assert responses[-1].status_code == 304
+
+        # Новый отзыв приходит только добавленным jti
+        _revoke(auth, second, session)
+        assert await revocations.refresh()
+        assert responses[-1].json()["added"] == [_jti(second)]
+        assert await revocations.is_revoked(_jti(second))
+        await revocations.stop()
+        return revocations.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["exact_checks"] == 2
+
+
+def test_stale_filter_checks_every_jti(auth, mock_upstream):
+    def forward(request):
+        response = auth.client.get(request.url.path, params=dict(request.url.params))
+        return httpx.Response(response.status_code, content=response.content)
+
+    mock_upstream.route(AUTH_HOST, None, forward)
+    mock_upstream.route(AUTH_HOST, "/revocations", forward)
+    revoked = auth.login()["access_token"]
+    active = auth.login()["access_token"]
+    _revoke(auth, revoked, auth.headers())
+
+    async def scenario():
+        revocations = RevocationFilter(f"http://{AUTH_HOST}", max_age=30.0)
+        try:
+            # Фильтр ещё не получен - отозванный токен всё равно отклоняется
+            assert await revocations.is_revoked(_jti(revoked))
+            assert not await revocations.is_revoked(_jti(active))
+
+            assert await revocations.refresh()
+            revocations.last_success -= 60
+            assert not revocations.is_fresh()
+            assert await revocations.is_revoked(_jti(revoked))
+
+            # Auth Service недоступен, фильтр устарел - отказ
+            mock_upstream.route(AUTH_HOST, None, lambda request: httpx.Response(503))
+            assert await revocations.is_revoked(_jti(active))
+        finally:
+            await revocations.stop()
+        return revocations.stats()
+
+    assert asyncio.run(scenario())["stale_checks"] == 4
@@ -0,0 +1,60 @@
+"""Фоновая очистка истёкших динамических токенов (user-047)"""
+import secrets
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select, text
+
+from auth_app.database import async_session, engine
+from auth_app.models import DynamicToken
+from auth_app.token_sweeper import ExpiredTokenSweeper
+
+
+def _insert(auth, *expires_at):
+    """Токены первого пользователя; возвращает их строки для проверки"""
+    tokens = [f"sweep-{secrets.token_hex(8)}" for _ in expires_at]
+
+    async def query():
+        async with async_session() as session:
+            await session.execute(insert(DynamicToken), [
+                {"token": token, "user_id": 1, "expires_at": exp, "is_active": False}
+                for token, exp in zip(tokens, expires_at)
+            ])
+            await session.commit()
+    auth.run(query)
+    return tokens
+
+
+def _remaining(auth, tokens):
+    async def query():
+        async with async_session() as session:
+            result = await session.execute(select(func.count()).where(DynamicToken.token.in_(tokens)))
+            return result.scalar_one()
+    return auth.run(query)
+
+
+def test_sweep_deletes_in_bounded_batches(auth):
+    now = datetime.utcnow()
+    expired = _insert(auth, *[now - timedelta(days=2)] * 5)
+    retained = _insert(auth, now - timedelta(hours=1), now + timedelta(hours=1))
+    sweeper = ExpiredTokenSweeper(batch_size=2, max_batches=2, retention_hours=24)
+
+    assert auth.run(sweeper.sweep, now) == 4
+    assert _remaining(auth, expired) == 1
+    assert auth.run(sweeper.sweep, now) == 1
+    assert _remaining(auth, expired) == 0
+    # Недавно истёкшие хранятся для аудита, действующие не трогаются
+    assert _remaining(auth, retained) == 2
+    assert sweeper.stats() == {"runs": 2, "deleted": 5, "last_run_deleted": 1}
+
+
+def test_expiry_and_partial_active_indexes_exist(auth):
+    async def query():
+        async with engine.connect() as connection:
+            result = await connection.execute(text(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'dynamic_tokens'"
+            ))
+            return dict(result.all())
+    indexes = auth.run(query)
+
+    assert "ix_dynamic_tokens_expires_at" in indexes
+    assert "WHERE" in indexes["ix_dynamic_tokens_active"]
@@ -0,0 +1,66 @@
+"""Общий кодек JWT и единый источник общих модулей (user-034)"""
+import os
+import subprocess
+import sys
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+from gateway_app.utils.tokens import TokenCodec
+
+from conftest import ROOT
+
+KEY = Ed25519PrivateKey.generate()
+
+
+def _token(codec, **claims):
+    return codec.encode({"sub": "alice", "exp": int(time.time()) + 600, **claims}, KEY, "k1")
+
+
+def test_roundtrip_is_compatible_with_pyjwt():
+    codec = TokenCodec()
+    token = _token(codec, role="user")
+
+    assert codec.decode(token, KEY.public_key())["role"] == "user"
+    assert jwt.decode(token, KEY.public_key(), algorithms=["EdDSA"], audience="msa-services")["sub"] == "alice"
+
+
+@pytest.mark.parametrize("claims, error", [
+    ({"exp": int(time.time()) - 3600}, jwt.ExpiredSignatureError),
+    ({"aud": "msa-ztna"}, jwt.InvalidAudienceError),
+    ({"iss": "someone-else"}, jwt.InvalidIssuerError),
+])
+def test_invalid_claims_are_rejected(claims, error):
+    codec = TokenCodec()
+    with pytest.raises(error):
+        codec.decode(_token(codec, **claims), KEY.public_key())
+
+
+def test_tampered_signature_and_foreign_alg_are_rejected():
+    codec = TokenCodec()
+    header, payload, signature = _token(codec).split(".")
+    with pytest.raises(jwt.InvalidSignatureError):
+        codec.decode(f"{header}.{payload}.{signature[::-1]}", KEY.public_key())
+
+    hs256 = jwt.encode({"sub": "alice", "exp": int(time.time()) + 600}, "secret", algorithm="HS256")
+    with pytest.raises(jwt.InvalidAlgorithmError):
+        codec.decode(hs256, KEY.public_key())
+
+
+def test_cached_result_is_bound_to_verifying_key():
+    codec = TokenCodec()
+    token = _token(codec)
+    codec.decode(token, KEY.public_key())
+
+    with pytest.raises(jwt.InvalidSignatureError):
+        codec.decode(token, Ed25519PrivateKey.generate().public_key())
+
+
+def test_service_copies_match_shared_sources():
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "scripts", "sync_shared.py"), "--check"],
+        capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stdout
@@ -0,0 +1,75 @@
+"""Отложенная пакетная запись last_used (user-044)"""
+import asyncio
+import hashlib
+import hmac
+import secrets
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from auth_app import usage_tracker as usage_tracker_module
+from auth_app.database import async_session
+from auth_app.models import APIKey
+from auth_app.usage_tracker import UsageTracker, usage_tracker
+
+
+def _verify(auth, key):
+    timestamp = str(int(time.time()))
+    nonce = secrets.token_hex(16)
+    message = f"{timestamp}{key['key_id']}{nonce}".encode()
+    response = auth.client.post("/verify-api-key", headers={
+        "X-API-Key-ID": key["key_id"],
+        "X-API-Signature": hmac.new(key["secret_key"].encode(), message, hashlib.sha256).hexdigest(),
+        "X-API-Timestamp": timestamp,
+        "X-API-Nonce": nonce,
+    })
+    assert response.status_code == 200, response.text
+
+
+def _last_used(auth, key_id):
+    async def query():
+        async with async_session() as session:
+            result = await session.execute(select(APIKey.last_used).where(APIKey.key_id == key_id))
+            return result.scalar_one()
+    return auth.run(query)
+
+
+def test_last_used_is_written_on_flush(auth):
+    key = auth.client.post("/api-keys", json={"name": "usage"}, headers=auth.headers()).json()
+    auth.run(usage_tracker.flush)
+    rows_before = usage_tracker.stats()["rows_written"]
+
+    for _ in range(3):
+        _verify(auth, key)
+
+    # Проверка не пишет в БД; повторы схлопываются в одну отметку
+    assert _last_used(auth, key["key_id"]) is None
+    assert usage_tracker.stats()["pending"] == 1
+    auth.run(usage_tracker.flush)
+    assert _last_used(auth, key["key_id"]) is not None
+    assert usage_tracker.stats()["rows_written"] - rows_before == 1
+
+
+def test_failed_flush_keeps_newer_marks(monkeypatch):
+    tracker = UsageTracker()
+    tracker.touch_api_key("kid")
+    newer = datetime(2100, 1, 1)
+
+    class FailingSession:
+        async def __aenter__(self):
+            tracker._api_keys["kid"] = newer  # Обращение во время записи
+            raise RuntimeError("database is locked")
+
+        async def __aexit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(usage_tracker_module, "async_session", FailingSession)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(tracker.flush())
+
+    assert tracker.stats()["pending"] == 1
+    assert tracker._api_keys["kid"] == newer
+    assert tracker.stats()["flushes"] == 0
@@ -0,0 +1,60 @@
+"""Кеш пользователей для get_current_user (user-040)"""
+from types import SimpleNamespace
+
+from auth_app import user_cache as user_cache_module
+from auth_app.user_cache import UserCache
+
+
+def _user(username):
+    return SimpleNamespace(username=username)
+
+
+def test_entry_expires_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(user_cache_module.time, "monotonic", lambda: now[0])
+    cache = UserCache(ttl=30, max_entries=10)
+    cache.put(_user("alice"))
+
+    assert cache.get("alice").username == "alice"
+    now[0] += 31
+    assert cache.get("alice") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = UserCache(ttl=30, max_entries=2)
+    cache.put(_user("alice"))
+    cache.put(_user("bob"))
+    cache.get("alice")
+
+    cache.put(_user("carol"))
+
+    assert cache.get("bob") is None
+    assert cache.get("alice") is not None and cache.get("carol") is not None
+
+
+def test_invalidate_and_disabled_cache():
+    cache = UserCache(ttl=30, max_entries=10)
+    cache.put(_user("alice"))
+    cache.invalidate("alice")
+    cache.invalidate("alice")
+
+    assert cache.get("alice") is None
+    assert cache.stats()["invalidations"] == 1
+
+    disabled = UserCache(ttl=0)
+    disabled.put(_user("alice"))
+    assert disabled.get("alice") is None
+
+
+def test_repeated_requests_are_served_from_cache(auth):
+    headers = auth.headers()
+    user_cache_module.user_cache.invalidate("admin")
+    before = auth.client.get("/metrics").json()["user_cache"]
+
+    for _ in range(3):
+        assert auth.client.get("/users/me", headers=headers).json()["username"] == "admin"
+
+    after = auth.client.get("/metrics").json()["user_cache"]
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 2
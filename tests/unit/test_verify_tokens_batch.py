@@ -0,0 +1,28 @@
+"""Пакетная проверка токенов в Auth Service (user-035)"""
+
+
+def test_results_follow_request_order(auth):
+    headers = auth.headers()
+    access_token = headers["Authorization"].split()[1]
+    dynamic_token = auth.client.post("/dynamic-tokens", headers=headers).json()["token"]
+
+    response = auth.client.post("/verify-tokens", json={"tokens": [
+        {"token": access_token, "type": "jwt"},
+        {"token": "not-a-jwt", "type": "jwt"},
+        {"token": dynamic_token, "type": "dynamic"},
+        {"token": "unknown-dynamic-token", "type": "dynamic"},
+        {"token": dynamic_token, "type": "dynamic"},
+    ]})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["valid"] for result in results] == [True, False, True, False, True]
+    assert results[0]["payload"]["sub"] == "admin"
+    assert results[2] == results[4]
+
+
+def test_batch_size_is_limited(auth, monkeypatch):
+    monkeypatch.setattr(auth.main, "VERIFY_BATCH_MAX_TOKENS", 2)
+    tokens = [{"token": f"t{i}", "type": "jwt"} for i in range(3)]
+
+    assert auth.client.post("/verify-tokens", json={"tokens": tokens}).status_code == 413
@@ -0,0 +1,72 @@
+"""Подписанные динамические ZTNA токены и список отзыва на шлюзе (user-046)"""
+import time
+
+import httpx
+import jwt
+import pytest
+
+from auth_app.identity import GATEWAY_SUBJECT, sign_identity_headers
+
+from conftest import AUTH_HOST, bearer, issue_token
+
+REVOKED_PATH = "/internal/ztna/revoked"
+
+
+def _ztna(jti):
+    return issue_token("1", aud="msa-ztna", jti=jti)
+
+
+@pytest.fixture
+def revocation_list(gateway, mock_upstream, monkeypatch):
+    mock_upstream.route("data-service", None, lambda request: httpx.Response(200, json={}))
+    revocation_list = gateway.main.ztna_revocation_list
+    monkeypatch.setattr(revocation_list, "_revoked", {"revoked-jti": time.time() + 600})
+    monkeypatch.setattr(revocation_list, "last_success", time.time())
+    return revocation_list
+
+
+def _get(gateway, token):
+    return gateway.client.get("/data/items", headers={**bearer("ztna-user"), "X-ZTNA-Token": token})
+
+
+def test_signed_token_is_verified_locally(gateway, mock_upstream, revocation_list):
+    assert _get(gateway, _ztna("fresh-jti")).status_code == 200
+    assert mock_upstream.calls(AUTH_HOST, "/verify-tokens") == []
+
+
+def test_revoked_or_foreign_token_is_rejected(gateway, mock_upstream, revocation_list):
+    assert _get(gateway, _ztna("revoked-jti")).status_code == 401
+    # Access токен сервисов не подходит как ZTNA токен
+    assert _get(gateway, issue_token("1", jti="access-jti")).status_code == 401
+    assert mock_upstream.calls(AUTH_HOST, "/verify-tokens") == []
+
+
+def test_stale_revocation_list_falls_back_to_auth_service(gateway, mock_upstream, revocation_list, monkeypatch):
+    monkeypatch.setattr(revocation_list, "last_success", time.time() - revocation_list.max_age - 1)
+    mock_upstream.route(AUTH_HOST, "/verify-tokens", lambda request: httpx.Response(
+        200, json={"results": [{"valid": True, "payload": {"user_id": 1}}]}
+    ))
+
+    assert _get(gateway, _ztna("stale-jti")).status_code == 200
+    assert len(mock_upstream.calls(AUTH_HOST, "/verify-tokens")) == 1
+
+    # Отзыв не проверить ни локально, ни в Auth Service - запрос не пропускается
+    mock_upstream.route(AUTH_HOST, "/verify-tokens", lambda request: httpx.Response(503))
+    assert _get(gateway, _ztna("stale-jti")).status_code == 503
+
+
+def test_revoked_dynamic_token_is_published_to_gateways(auth):
+    headers = auth.headers()
+    created = auth.client.post("/dynamic-tokens", headers=headers).json()
+    jti = jwt.decode(created["token"], options={"verify_signature": False})["jti"]
+    internal = sign_identity_headers(GATEWAY_SUBJECT, "service", "GET", REVOKED_PATH)
+    etag = auth.client.get(REVOKED_PATH, headers=internal).headers["etag"]
+
+    assert auth.client.delete(f"/dynamic-tokens/{created['id']}", headers=headers).status_code == 204
+
+    response = auth.client.get(REVOKED_PATH, headers={**internal, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert jti in response.json()["revoked"]
+    unchanged = auth.client.get(REVOKED_PATH, headers={**internal, "If-None-Match": response.headers["etag"]})
+    assert unchanged.status_code == 304
+    assert auth.client.get(REVOKED_PATH, headers=headers).status_code == 403